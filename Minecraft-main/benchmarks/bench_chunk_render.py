@@ -0,0 +1,172 @@
+"""
+Tiempo de CPU por frame al dibujar los chunks del mundo por defecto: el bucle anterior (un VBO,
+un VAO y un m_model por chunk, una llamada por chunk visible) frente al ChunkArena
+(un VBO para todos, draws indirectos o tramos seguidos del arena en OpenGL 3.3).
+
+Con una sola cara por chunk se mide el tiempo de enviar las llamadas, que es lo que cuesta en la
+CPU con una GPU real; con las mallas completas, el frame entero hasta ctx.finish(). Con un driver
+por software (llvmpipe) los vértices se procesan dentro de las llamadas: dominan el frame y, con una
+cara por chunk, los tramos pagan los 1020 vértices a cero de cada página.
+Necesita un contexto de OpenGL sin ventana (EGL).
+"""
+from common import *
+import moderngl as mgl
+from camera import Camera
+from meshes.chunk_arena import ChunkArena, MAX_CHUNK_FACES
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_padded_voxels, QUAD_INDICES
+from voxel_store import VoxelStore
+
+# minimal versions of chunk.vert, before the arena (origin in m_model) and with it (origin per arena page)
+LEGACY_VERTEX_SHADER = '''
+#version 330 core
+layout (location = 0) in uint packed_data;
+uniform mat4 m_proj;
+uniform mat4 m_view;
+uniform mat4 m_model;
+flat out int face_id;
+void main() {
+    vec3 local_pos = vec3(packed_data >> 26u, (packed_data >> 20u) & 63u, (packed_data >> 14u) & 63u);
+    face_id = int((packed_data >> 3u) & 7u);
+    gl_Position = m_proj * m_view * m_model * vec4(local_pos, 1.0);
+}
+'''
+ARENA_VERTEX_SHADER = '''
+#version 330 core
+layout (location = 0) in uint packed_data;
+uniform mat4 m_proj;
+uniform mat4 m_view;
+uniform isampler2D u_chunk_origins;
+flat out int face_id;
+void main() {
+    vec3 local_pos = vec3(packed_data >> 26u, (packed_data >> 20u) & 63u, (packed_data >> 14u) & 63u);
+    face_id = int((packed_data >> 3u) & 7u);
+    int page = gl_VertexID >> 10;
+    vec3 chunk_origin = vec3(texelFetch(u_chunk_origins, ivec2(page & 1023, page >> 10), 0).xyz);
+    gl_Position = m_proj * m_view * vec4(chunk_origin + local_pos, 1.0);
+}
+'''
+FRAGMENT_SHADER = '''
+#version 330 core
+flat in int face_id;
+out vec4 frag_color;
+void main() { frag_color = vec4(vec3(0.2 + 0.1 * face_id), 1.0); }
+'''
+VIEWS = (
+    ((CENTER_XZ, CHUNK_SIZE * 1.5, CENTER_XZ), -90, 0),
+    ((100, 90, 100), 45, -20),
+    ((CENTER_XZ, 200, CENTER_XZ), 0, -89),
+)
+# frames per view when measuring only the calls and with the whole meshes
+CALL_FRAMES, FULL_FRAMES = 100, 5
+
+
+class Chunk:
+    def __init__(self, position, slot, vertex_data):
+        self.position = position
+        self.slot = slot
+        self.vertex_data = vertex_data
+        self.center = (glm.vec3(position) + 0.5) * CHUNK_SIZE
+        self.m_model = glm.translate(glm.mat4(), glm.vec3(position) * CHUNK_SIZE)
+
+
+def build_chunks():
+    voxels = generate_world_voxels()
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(WORLD_VOL), voxels)
+    slot_coords = chunk_position_array()
+    chunks = []
+    for position, chunk_index in chunk_positions():
+        padded_voxels = build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords)
+        chunks.append(Chunk(position, chunk_index, build_chunk_mesh(padded_voxels)))
+    return chunks
+
+
+def render_legacy(program, camera, chunks, vaos):
+    num_draws = 0
+    for chunk in chunks:
+        if chunk.slot in vaos and camera.frustum.is_on_frustum(chunk):
+            program['m_model'].write(chunk.m_model)
+            vaos[chunk.slot].render(vertices=len(chunk.vertex_data) // 4 * 6)
+            num_draws += 1
+    return num_draws
+
+
+def render_arena(arena, camera, chunks):
+    arena.render([chunk.slot for chunk in chunks if camera.frustum.is_on_frustum(chunk)])
+    return arena.num_draws
+
+
+def get_backends(ctx, programs, camera, chunks, quad_indices):
+    """Sube las mallas a cada backend: un VAO por chunk y el arena (también indirecto si hay OpenGL 4.3)."""
+    legacy_program, arena_program = programs
+    vaos = {}
+    for chunk in chunks:
+        if len(chunk.vertex_data):
+            vbo = ctx.buffer(chunk.vertex_data)
+            vaos[chunk.slot] = ctx.vertex_array(legacy_program, [(vbo, '1u4', 'packed_data')],
+                                                index_buffer=quad_indices, index_element_size=4)
+    backends = {'VAO por chunk': (render_legacy, legacy_program, camera, chunks, vaos)}
+
+    for use_indirect in (True, False) if ctx.version_code >= 430 else (False,):
+        arena = ChunkArena(ctx, arena_program, WORLD_VOL, use_indirect=use_indirect)
+        for chunk in chunks:
+            if len(chunk.vertex_data):
+                arena.allocate(chunk.slot, len(chunk.vertex_data), np.array(chunk.position) * CHUNK_SIZE)
+                arena.write(chunk.slot, chunk.vertex_data)
+        name = 'arena indirecto' if use_indirect else 'arena por tramos'
+        backends[name] = (render_arena, arena, camera, chunks)
+    return backends
+
+
+def measure(ctx, programs, camera, frames, render, *args):
+    call_times, frame_times, draws = [], [], []
+    for position, yaw, pitch in VIEWS:
+        camera.position, camera.yaw, camera.pitch = glm.vec3(position), glm.radians(yaw), glm.radians(pitch)
+        camera.update()
+        for program in programs:
+            program['m_proj'].write(camera.m_proj)
+            program['m_view'].write(camera.m_view)
+        for _ in range(frames):
+            ctx.finish()
+            with Timer() as frame:
+                ctx.clear()
+                with Timer() as calls:
+                    num_draws = render(*args)
+                ctx.finish()
+            call_times.append(calls.elapsed)
+            frame_times.append(frame.elapsed)
+        draws.append(num_draws)
+    return np.array(call_times) * 1000, np.array(frame_times) * 1000, draws
+
+
+def main():
+    ctx = mgl.create_standalone_context(require=330, backend='egl')
+    ctx.enable(mgl.DEPTH_TEST | mgl.CULL_FACE)
+    fbo = ctx.simple_framebuffer((320, 180))
+    fbo.use()
+    camera = Camera(PLAYER_POS, -90, 0)
+    programs = (
+        ctx.program(vertex_shader=LEGACY_VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER),
+        ctx.program(vertex_shader=ARENA_VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER),
+    )
+    quad_indices = ctx.buffer(np.arange(MAX_CHUNK_FACES, dtype='uint32')[:, np.newaxis] * 4 + QUAD_INDICES)
+
+    chunks = build_chunks()
+    # same chunks and visibility but a single face each, so the frame costs only the calls
+    one_face_chunks = [Chunk(chunk.position, chunk.slot, chunk.vertex_data[:4]) for chunk in chunks]
+    call_backends = get_backends(ctx, programs, camera, one_face_chunks, quad_indices)
+    full_backends = get_backends(ctx, programs, camera, chunks, quad_indices)
+
+    print(f'{"backend":<18}{"llamadas ms":>12}{"p99":>8}{"frame ms":>10}   mediana por vista (ms)   draws por vista')
+    for name in call_backends:
+        # the first frames compile the shaders and warm up the driver
+        measure(ctx, programs, camera, 1, *call_backends[name])
+        call_times, _, draws = measure(ctx, programs, camera, CALL_FRAMES, *call_backends[name])
+        _, frame_times, _ = measure(ctx, programs, camera, FULL_FRAMES, *full_backends[name])
+        view_medians = np.median(call_times.reshape(len(VIEWS), CALL_FRAMES), axis=1).round(3).tolist()
+        print(f'{name:<18}{call_times.mean():>12.3f}{np.percentile(call_times, 99):>8.3f}{frame_times.mean():>10.1f}'
+              f'   {str(view_medians):<24} {draws}')
+
+
+if __name__ == '__main__':
+    main()
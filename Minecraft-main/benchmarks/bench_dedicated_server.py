@@ -0,0 +1,83 @@
+"""
+Arranque y memoria del servidor: el modo 's' de main.py (un VoxelEngine completo con el servidor) frente
+al servidor dedicado (dedicated_server.py), en procesos nuevos con la caché de numba ya caliente, RUNS
+veces cada uno (mediana). Listo: desde que se lanza el proceso hasta que el servidor escucha. La memoria
+(RSS y su pico) se mide cuando ya no queda trabajo de arranque: en el modo 's', con todas las mallas hechas.
+
+El modo 's' necesita ventana; aquí es el VoxelEngine del modo sin ventana (headless.py) a la resolución
+de la ventana, con el mismo servidor y NetworkManager que crea main.py.
+"""
+from common import *
+import json
+import subprocess
+from warmup import warmup
+
+RUNS = 3
+MODES = ('modo s', 'dedicado')
+
+
+def get_memory():
+    """RSS y pico de RSS del proceso, en MB."""
+    with open('/proc/self/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return {key: int(status[key].split()[0]) / 1024 for key in ('VmRSS', 'VmHWM')}
+
+
+def child(mode):
+    if mode == 'dedicado':
+        from dedicated_server import DedicatedServer
+        DedicatedServer(host='127.0.0.1', port=0)
+    else:
+        from headless import HeadlessEngine
+        from network_manager import NetworkManager
+        from server import Server, DummySocket
+        engine = HeadlessEngine(num_frames=1, scale=1.0)
+        server = Server(host='127.0.0.1', port=0)
+        NetworkManager(is_server=True, sock=DummySocket(), world=engine.scene.world, connections=server.connections)
+    print('listo', flush=True)
+    if mode != 'dedicado':
+        # the meshes are built in the background once the engine is up
+        while not engine.scene.world.mesh_pool.is_idle:
+            engine.update()
+            engine.render()
+        engine.ctx.finish()
+        engine.scene.world.mesh_pool.shutdown()
+    memory = get_memory()
+    memory['modules'] = [name for name in ('pygame', 'moderngl') if name in sys.modules]
+    print(json.dumps(memory))
+
+
+def run_child(mode):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--child', mode], stdout=subprocess.PIPE, text=True
+    )
+    ready = None
+    lines = []
+    for line in process.stdout:
+        if ready is None and line.startswith('listo'):
+            ready = time.perf_counter() - start
+        lines.append(line)
+    if process.wait():
+        raise RuntimeError(f'{mode} terminó con el código {process.returncode}')
+    result = json.loads(lines[-1])
+    result['ready'] = ready
+    return result
+
+
+def main():
+    # fill the numba cache, so no run pays the compilation
+    warmup()
+    print(f'{"servidor (mediana)":<20}{"listo s":>9}{"RSS MB":>9}{"pico MB":>9}  módulos')
+    for mode in MODES:
+        runs = [run_child(mode) for _ in range(RUNS)]
+        print(f'{mode:<20}{np.median([run["ready"] for run in runs]):>9.2f}'
+              f'{np.median([run["VmRSS"] for run in runs]):>9.0f}{np.median([run["VmHWM"] for run in runs]):>9.0f}'
+              f'  {", ".join(runs[0]["modules"]) or "-"}')
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child(sys.argv[-1])
+    else:
+        main()
@@ -0,0 +1,56 @@
+"""
+Tiempo hasta el primer frame con el arranque en serie (STARTUP_WORKERS = 0) y con los hilos de arranque,
+en procesos nuevos con la caché de numba ya caliente, RUNS veces cada uno (mediana). Usa el modo sin
+ventana (headless.py), así que necesita un contexto de OpenGL sin ventana (EGL).
+"""
+from common import *
+import json
+import subprocess
+from warmup import warmup
+
+RUNS = 3
+
+
+def child(num_workers):
+    from headless import HeadlessEngine
+    engine = HeadlessEngine(num_frames=1, scale=0.25, startup_workers=num_workers)
+    engine.update()
+    engine.render()
+    engine.ctx.finish()
+    engine.startup.finish()
+    engine.scene.world.mesh_pool.shutdown()
+    phases = {}
+    for name, _, elapsed, _ in engine.startup.phases:
+        phases[name] = phases.get(name, 0.0) + elapsed
+    print(json.dumps({'total': engine.startup.total, 'phases': phases}))
+
+
+def run_child(num_workers):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', str(num_workers)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    # fill the numba cache, so no run pays the compilation
+    warmup()
+    results = {}
+    for num_workers in (0, STARTUP_WORKERS):
+        results[num_workers] = [run_child(num_workers) for _ in range(RUNS)]
+
+    names = list(results[0][0]['phases'])
+    print(f'{"fase (mediana, ms)":<26}' + ''.join(f'{f"{n} hilos":>12}' for n in results))
+    for name in names:
+        values = [np.median([run['phases'].get(name, 0.0) for run in runs]) * 1000 for runs in results.values()]
+        print(f'{name:<26}' + ''.join(f'{value:>12.0f}' for value in values))
+    totals = [np.median([run['total'] for run in runs]) for runs in results.values()]
+    print(f'{"primer frame (s)":<26}' + ''.join(f'{total:>12.2f}' for total in totals))
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child(int(sys.argv[-1]))
+    else:
+        main()
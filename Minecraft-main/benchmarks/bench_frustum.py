@@ -0,0 +1,84 @@
+"""
+Tiempo por frame del frustum culling de los chunks del mundo por defecto a lo largo de un recorrido
+de la cámara (quieta, andando y girando): el bucle anterior con Frustum.is_on_frustum por chunk,
+Frustum.get_visible sobre el array de centros en cada frame y World.get_visible_slots, que además
+reutiliza el resultado mientras la cámara no pase de los umbrales.
+"""
+from common import *
+from camera import Camera
+from world import World
+from occlusion import ALL_FACES
+
+# (frames, voxels moved and radians turned per frame): about a 60 fps walk with the mouse
+SEGMENTS = {
+    'quieta': (300, 0.0, 0.0),
+    'andando': (300, 0.08, 0.0),
+    'girando': (300, 0.0, 0.004),
+    'andando y girando': (300, 0.08, 0.004),
+}
+
+
+class Chunk:
+    def __init__(self, position, is_empty):
+        self.position = position
+        self.is_empty = is_empty
+        self.center = (glm.vec3(position) + 0.5) * CHUNK_SIZE
+
+
+class CullingWorld:
+    """Lo justo de World para llamar a get_visible_slots sin contexto de OpenGL."""
+    get_visible_slots = World.get_visible_slots
+    is_culling_valid = World.is_culling_valid
+    get_camera_chunk = staticmethod(World.get_camera_chunk)
+
+    def __init__(self, camera, chunk_centers):
+        self.app = type('App', (), {'player': camera})
+        self.chunk_centers = chunk_centers
+        # every chunk open, so the occlusion culling (if enabled) walks the whole frustum
+        self.slot_coords = chunk_position_array()
+        self.chunk_connectivity = np.full([len(chunk_centers), 6], ALL_FACES, dtype='uint8')
+        self.visible_slots = None
+        self.culling_camera = None
+
+
+def cull_loop(camera, chunks):
+    return [slot for slot, chunk in enumerate(chunks) if not chunk.is_empty and camera.frustum.is_on_frustum(chunk)]
+
+
+def cull_vectorized(camera, chunk_centers):
+    return np.flatnonzero(camera.frustum.get_visible(chunk_centers))
+
+
+def main():
+    voxels = generate_world_voxels()
+    chunks = [None] * WORLD_VOL
+    chunk_centers = np.empty([WORLD_VOL, 3], dtype='float32')
+    for position, chunk_index in chunk_positions():
+        chunks[chunk_index] = Chunk(position, not voxels[chunk_index].any())
+        chunk_centers[chunk_index] = chunks[chunk_index].center
+
+    camera = Camera(PLAYER_POS, -90, 0)
+    methods = {
+        'bucle is_on_frustum': (cull_loop, chunks),
+        'get_visible': (cull_vectorized, chunk_centers),
+        'get_visible_slots': (lambda camera, world: world.get_visible_slots(), CullingWorld(camera, chunk_centers)),
+    }
+    print(f'{"recorrido":<20}' + ''.join(f'{name:>22}' for name in methods) + '   (us por frame)')
+    for segment, (frames, speed, turn_speed) in SEGMENTS.items():
+        times = []
+        for cull, arg in methods.values():
+            camera.position, camera.yaw, camera.pitch = glm.vec3(PLAYER_POS), glm.radians(-90), glm.radians(-10)
+            camera.update()
+            cull(camera, arg)
+            with Timer() as timer:
+                for _ in range(frames):
+                    camera.move_forward(speed)
+                    camera.rotate_yaw(turn_speed)
+                    camera.update()
+                    cull(camera, arg)
+            times.append(timer.elapsed / frames * 1e6)
+        print(f'{segment:<20}' + ''.join(f'{time:>22.1f}' for time in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Unión de un cliente al servidor por loopback, con el mundo por defecto: tiempo hasta el primer frame
+jugable (las columnas a JOIN_RADIUS o menos de la del jugador recibidas y malladas), hasta tener todo el
+mundo mallado y bytes recibidos. Antes el servidor enviaba el mundo completo sin comprimir en un solo
+mensaje world_update; ahora envía los chunks uno a uno, comprimidos y empezando por los más cercanos.
+
+El servidor y el cliente son procesos del modo sin ventana (headless.py), con la caché de numba ya caliente.
+El cliente empieza con el mundo vacío en los dos casos (antes también generaba el suyo, eso no se cuenta).
+"""
+from common import *
+import json
+import socket
+import subprocess
+import threading
+from headless import HeadlessEngine
+from server import DummySocket
+from network_manager import NetworkManager
+from protocol import StreamDecoder, encode_world_update, MSG_CHUNK_DATA, MSG_WORLD_UPDATE, RECV_SIZE
+from warmup import warmup
+
+MODES = ('antes', 'ahora')
+JOIN_RADIUS = 2
+
+
+class WorldUpdateNetworkManager(NetworkManager):
+    """La unión de antes: el mundo completo sin comprimir, en un solo mensaje."""
+    def send_join_chunks(self, conn, versions):
+        with self.lock:
+            join = self.joins.pop(conn, None)
+        if join is None:
+            return
+        version = join[0]
+        self.send_to(conn, encode_world_update(version, self.world.voxel_store.get_chunks(range(STORE_VOL))))
+        with self.lock:
+            versions[0] = versions[1] = version
+
+
+class CountingSocket:
+    """Socket del cliente que cuenta los bytes recibidos."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.num_bytes = 0
+
+    def recv(self, size):
+        data = self.sock.recv(size)
+        self.num_bytes += len(data)
+        return data
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class TimedNetworkManager(NetworkManager):
+    """NetworkManager del cliente que apunta los chunks que ya han llegado y se han aplicado al mundo."""
+    def __init__(self, *args, **kwargs):
+        self.arrived = set()
+        super().__init__(*args, **kwargs)
+
+    def apply_message(self, msg_type, message):
+        super().apply_message(msg_type, message)
+        if msg_type == MSG_CHUNK_DATA:
+            self.arrived.add(message[1])
+        elif msg_type == MSG_WORLD_UPDATE:
+            self.arrived.update(range(STORE_VOL))
+
+
+def serve(mode):
+    engine = HeadlessEngine(num_frames=1, scale=0.25)
+    manager_class = WorldUpdateNetworkManager if mode == 'antes' else NetworkManager
+    net_manager = manager_class(is_server=True, sock=DummySocket(), world=engine.scene.world)
+    listener = socket.create_server(('127.0.0.1', 0))
+    print(f'puerto {listener.getsockname()[1]}', flush=True)
+
+    def sync_loop():
+        while True:
+            net_manager.send_updates()
+            time.sleep(SYNC_INTERVAL)
+    threading.Thread(target=sync_loop, daemon=True).start()
+
+    # like Server.handle_client, for a single client
+    conn, _ = listener.accept()
+    net_manager.connections.append(conn)
+    net_manager.add_client(conn)
+    decoder = StreamDecoder()
+    while data := conn.recv(RECV_SIZE):
+        for msg_type, message in decoder.feed(data):
+            net_manager.process_client_message(conn, msg_type, message)
+
+
+def get_nearby_slots(world, position):
+    cx, cz = int(position.x) // CHUNK_SIZE, int(position.z) // CHUNK_SIZE
+    return [
+        world.get_slot(x, y, z)
+        for x in range(cx - JOIN_RADIUS, cx + JOIN_RADIUS + 1)
+        for z in range(cz - JOIN_RADIUS, cz + JOIN_RADIUS + 1)
+        for y in range(WORLD_H)
+        if world.get_chunk(x, y, z)
+    ]
+
+
+def is_playable(world, arrived, nearby_slots):
+    # every nearby chunk is here and has a mesh, unless it is only air
+    return all(
+        slot in arrived and (world.chunks[slot].is_empty or world.chunks[slot].mesh.is_built)
+        for slot in nearby_slots
+    )
+
+
+def connect(port):
+    engine = HeadlessEngine(num_frames=1, scale=0.25, remote_world=True)
+    world = engine.scene.world
+    sock = CountingSocket(socket.create_connection(('127.0.0.1', port)))
+    net_manager = TimedNetworkManager(is_server=False, sock=sock, world=world)
+    # the world applies what arrives in engine.update, like in main.py
+    engine.net_manager = net_manager
+    nearby_slots = get_nearby_slots(world, engine.player.position)
+    num_chunks = np.count_nonzero(~np.isnan(world.chunk_centers[:, 0]))
+
+    start = time.perf_counter()
+    net_manager.join(engine.player.position)
+    result = {}
+    while True:
+        engine.update()
+        engine.render()
+        engine.ctx.finish()
+        elapsed = time.perf_counter() - start
+        if 'playable' not in result and is_playable(world, net_manager.arrived, nearby_slots):
+            result['playable'] = elapsed
+            result['playable_bytes'] = sock.num_bytes
+        if len(net_manager.arrived) == num_chunks and world.mesh_pool.is_idle:
+            result['done'] = elapsed
+            result['bytes'] = sock.num_bytes
+            break
+    world.mesh_pool.shutdown()
+    print(json.dumps(result))
+
+
+def run(mode):
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--server', mode], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        # the server prints its port once it is listening, after the startup report
+        line = ''
+        while not line.startswith('puerto'):
+            line = server.stdout.readline()
+            if not line:
+                raise RuntimeError('el servidor terminó sin escuchar')
+        port = int(line.split()[1])
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--client', str(port)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        server.kill()
+        server.wait()
+
+
+def main():
+    # fill the numba cache, so no process pays the compilation
+    warmup()
+    print(f'{"unión":<8}{"jugable s":>11}{"MB hasta jugable":>18}{"todo s":>9}{"MB en total":>13}')
+    for mode in MODES:
+        result = run(mode)
+        print(f'{mode:<8}{result["playable"]:>11.2f}{result["playable_bytes"] / 2 ** 20:>18.2f}'
+              f'{result["done"]:>9.2f}{result["bytes"] / 2 ** 20:>13.2f}')
+
+
+if __name__ == '__main__':
+    if '--server' in sys.argv:
+        serve(sys.argv[-1])
+    elif '--client' in sys.argv:
+        connect(int(sys.argv[-1]))
+    else:
+        main()
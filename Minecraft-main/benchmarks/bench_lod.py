@@ -0,0 +1,63 @@
+"""
+Niveles de detalle en el mundo por defecto: vértices de los chunks dentro del frustum con la malla
+completa y con el nivel que da World.get_lods por distancia (LOD_DISTANCES), desde varias vistas,
+y lo que tarda en generarse la malla de cada nivel.
+"""
+from common import *
+from camera import Camera
+from world import World
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_chunk_mesh_lod, build_padded_voxels
+from voxel_store import VoxelStore
+
+VIEWS = {
+    'suelo': ((CENTER_XZ, CHUNK_SIZE, CENTER_XZ), -90, 0),
+    'horizonte': ((100, 90, 100), 45, -10),
+    'desde arriba': ((CENTER_XZ, 200, CENTER_XZ), 0, -50),
+}
+
+
+def main():
+    voxels = generate_world_voxels()
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(WORLD_VOL), voxels)
+    slot_coords = chunk_position_array()
+    chunk_centers = ((slot_coords + 0.5) * CHUNK_SIZE).astype('float32')
+
+    # vertices of every chunk at every level
+    num_lods = len(LOD_DISTANCES) + 1
+    num_vertices = np.zeros([num_lods, WORLD_VOL], dtype='int64')
+    build_times = np.zeros(num_lods)
+    # compile the mesh builders first
+    padded_voxels = build_padded_voxels(voxels[0], (0, 0, 0), store.refs, store.pool, slot_coords)
+    build_chunk_mesh(padded_voxels)
+    build_chunk_mesh_lod(padded_voxels, 2)
+    for position, chunk_index in chunk_positions():
+        padded_voxels = build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords)
+        for lod in range(num_lods):
+            with Timer() as timer:
+                if lod == 0:
+                    vertex_data = build_chunk_mesh(padded_voxels)
+                else:
+                    vertex_data = build_chunk_mesh_lod(padded_voxels, 1 << lod)
+            build_times[lod] += timer.elapsed
+            num_vertices[lod, chunk_index] = len(vertex_data)
+
+    for lod in range(num_lods):
+        print(f'nivel {lod} (bloques de {1 << lod}): {num_vertices[lod].sum():>10} vértices en el mundo, '
+              f'{build_times[lod] / WORLD_VOL * 1000:.2f} ms por chunk')
+
+    print(f'\n{"vista":<14}{"vértices completos":>20}{"vértices con LOD":>18}{"chunks por nivel":>20}')
+    for name, (position, yaw, pitch) in VIEWS.items():
+        camera = Camera(position, yaw, pitch)
+        camera.update()
+        visible = np.flatnonzero(camera.frustum.get_visible(chunk_centers))
+        distances = np.linalg.norm(chunk_centers[visible] - np.array(camera.position), axis=1)
+        lods = World.get_lods(distances)
+        full = num_vertices[0, visible].sum()
+        with_lod = num_vertices[lods, visible].sum()
+        per_level = np.bincount(lods, minlength=num_lods).tolist()
+        print(f'{name:<14}{full:>20}{with_lod:>18}{str(per_level):>20}   ({with_lod / full:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Cave culling en el mundo por defecto: coste de calcular la conectividad de las caras de cada chunk
+y, desde varias vistas (en la superficie, dentro de una cueva y desde el aire), llamadas de dibujo
+(chunks visibles con malla, un draw indirecto por chunk) y triángulos con solo el frustum y con el
+frustum más la búsqueda de chunks alcanzables (get_reachable_chunks), y lo que tarda esa búsqueda.
+"""
+from common import *
+from camera import Camera
+from world import World
+from occlusion import get_face_connectivity, get_reachable_chunks
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_padded_voxels
+from voxel_store import VoxelStore
+
+BFS_RUNS = 200
+
+
+def find_cave(voxels, heightmap):
+    """Un voxel de aire al menos 15 bloques por debajo de la superficie, con aire a 2 bloques en cada dirección."""
+    for (cx, cy, cz), chunk_index in chunk_positions():
+        chunk = voxels[chunk_index].reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+        heights = heightmap[cx + WORLD_W * cz]
+        for y, z, x in np.argwhere(chunk[2:-2, 2:-2, 2:-2] == 0) + 2:
+            if cy * CHUNK_SIZE + y > heights[x, z] - 15:
+                continue
+            if not any(chunk[y + dy, z + dz, x + dx] for dx, dy, dz in
+                       ((2, 0, 0), (-2, 0, 0), (0, 2, 0), (0, -2, 0), (0, 0, 2), (0, 0, -2))):
+                return glm.vec3(cx, cy, cz) * CHUNK_SIZE + glm.vec3(x, y, z) + 0.5
+    return None
+
+
+def main():
+    heightmap = generate_world_heightmap()
+    voxels = generate_world_voxels(heightmap)
+    slot_coords = chunk_position_array()
+
+    connectivity = np.empty([WORLD_VOL, 6], dtype='uint8')
+    get_face_connectivity(voxels[0])
+    with Timer() as timer:
+        for chunk_index in range(WORLD_VOL):
+            connectivity[chunk_index] = get_face_connectivity(voxels[chunk_index])
+    print(f'conectividad: {timer.elapsed / WORLD_VOL * 1000:.2f} ms por chunk')
+
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(WORLD_VOL), voxels)
+    num_triangles = np.zeros(WORLD_VOL, dtype='int64')
+    for position, chunk_index in chunk_positions():
+        padded_voxels = build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords)
+        num_triangles[chunk_index] = len(build_chunk_mesh(padded_voxels)) // 4 * 2
+    has_mesh = num_triangles > 0
+    chunk_centers = ((slot_coords + 0.5) * CHUNK_SIZE).astype('float32')
+
+    spawn = glm.vec3(CENTER_XZ, heightmap[WORLD_W // 2 + WORLD_W * (WORLD_D // 2), 0, 0] + 2, CENTER_XZ)
+    views = {
+        'superficie': (spawn, -90, -10),
+        'cueva': (find_cave(voxels, heightmap), -90, 0),
+        'aire': (glm.vec3(CENTER_XZ, 90, CENTER_XZ), 45, -60),
+    }
+    print(f'{"vista":<12}{"draws frustum":>15}{"draws cave":>12}{"triángulos frustum":>20}{"triángulos cave":>17}{"BFS us":>9}')
+    for name, (position, yaw, pitch) in views.items():
+        if position is None:
+            print(f'{name:<12} no encontrada')
+            continue
+        camera = Camera(position, yaw, pitch)
+        camera.update()
+        camera_chunk = World.get_camera_chunk(camera)
+        visible = camera.frustum.get_visible(chunk_centers)
+        get_reachable_chunks(visible, camera_chunk, slot_coords, connectivity)
+        with Timer() as timer:
+            for _ in range(BFS_RUNS):
+                reachable = get_reachable_chunks(visible, camera_chunk, slot_coords, connectivity)
+        visible, reachable = visible & has_mesh, reachable & has_mesh
+        print(f'{name:<12}{np.count_nonzero(visible):>15}{np.count_nonzero(reachable):>12}'
+              f'{num_triangles[visible].sum():>20}{num_triangles[reachable].sum():>17}'
+              f'{timer.elapsed / BFS_RUNS * 1e6:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Coste del profiler: un scope de CPU apagado y encendido, end_frame con el historial lleno (con los
+scopes que se miden en un frame del juego) y get_summary, que el overlay llama cada OVERLAY_REFRESH s.
+Los timer queries de la GPU no se miden aquí: necesitan un contexto de OpenGL (ver headless.py --profile).
+"""
+from common import *
+from profiler import Profiler
+
+SCOPE_RUNS = 200_000
+FRAME_SCOPES = ('player.update', 'ray_cast', 'scene.update', 'mesh.upload', 'world.render')
+FRAMES = 5000
+SUMMARY_RUNS = 50
+
+
+def time_scopes(profiler):
+    with Timer() as timer:
+        for _ in range(SCOPE_RUNS):
+            with profiler.scope('scope'):
+                pass
+    return timer.elapsed / SCOPE_RUNS * 1e9
+
+
+def main():
+    with Timer() as timer:
+        for _ in range(SCOPE_RUNS):
+            pass
+    empty_ns = timer.elapsed / SCOPE_RUNS * 1e9
+    print(f'bucle vacío:        {empty_ns:8.0f} ns')
+    print(f'scope apagado:      {time_scopes(Profiler(None, enabled=False)) - empty_ns:8.0f} ns')
+    print(f'scope encendido:    {time_scopes(Profiler(None, enabled=True)) - empty_ns:8.0f} ns')
+
+    for enabled in (False, True):
+        profiler = Profiler(None, enabled=enabled)
+        with Timer() as timer:
+            for _ in range(FRAMES):
+                for name in FRAME_SCOPES:
+                    with profiler.scope(name):
+                        pass
+                profiler.end_frame()
+        state = 'encendido' if enabled else 'apagado'
+        print(f'frame {state + ":":<13}{timer.elapsed / FRAMES * 1e6:8.1f} us '
+              f'({len(FRAME_SCOPES)} scopes y end_frame, historial de {PROFILER_HISTORY} frames)')
+
+    with Timer() as timer:
+        for _ in range(SUMMARY_RUNS):
+            profiler.get_summary()
+    print(f'get_summary:        {timer.elapsed / SUMMARY_RUNS * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Mensajes de red con pickle (el formato anterior) frente al protocolo binario de protocol.py: bytes por
+mensaje y tiempo medio de codificar y decodificar cada tipo. Los mensajes binarios se decodifican como en
+el juego: todos seguidos en un flujo que un StreamDecoder recibe en trozos de RECV_SIZE bytes.
+Con pickle cada mensaje se decodifica por separado, porque su formato no dice dónde acaba.
+"""
+from common import *
+import pickle
+from protocol import (
+    StreamDecoder, encode_direction, encode_positions, encode_voxel_update, encode_world_update, RECV_SIZE
+)
+
+
+def make_players(count):
+    return {(f'10.0.{i // 256}.{i % 256}', 5000 + i): [i, -i] for i in range(count)}
+
+
+def decode_stream(data):
+    decoder = StreamDecoder()
+    messages = []
+    with memoryview(data) as view:
+        for start in range(0, len(view), RECV_SIZE):
+            messages += decoder.feed(view[start:start + RECV_SIZE])
+    return messages
+
+
+def measure_pickle(message, repeat):
+    with Timer() as encode_timer:
+        encoded = [pickle.dumps(message) for _ in range(repeat)]
+    with Timer() as decode_timer:
+        for data in encoded:
+            pickle.loads(data)
+    return len(encoded[0]), encode_timer.elapsed, decode_timer.elapsed
+
+
+def measure_binary(encode, repeat):
+    with Timer() as encode_timer:
+        encoded = [encode() for _ in range(repeat)]
+    stream = b''.join(encoded)
+    with Timer() as decode_timer:
+        messages = decode_stream(stream)
+    assert len(messages) == repeat
+    return len(encoded[0]), encode_timer.elapsed, decode_timer.elapsed
+
+
+def main():
+    rng = np.random.default_rng(0)
+    voxels = rng.integers(0, 8, (STORE_VOL, CHUNK_VOL), dtype='uint8')
+    players = make_players(16)
+
+    cases = (
+        # name, old pickled dict, binary encoder, repetitions
+        ('voxel_update', lambda: {'type': 'voxel_update', 'data': (1234, 5678, 3)},
+         lambda: encode_voxel_update(1234, 5678, 3), 20000),
+        ('direction', lambda: 'LEFT', lambda: encode_direction('LEFT'), 20000),
+        ('positions (16)', lambda: players, lambda: encode_positions(players), 5000),
+        (f'world_update ({STORE_VOL})', lambda: {'type': 'world_update', 'data': voxels},
+         lambda: encode_world_update(0, voxels), 3),
+    )
+
+    print(f'{"mensaje":<20}{"formato":<9}{"bytes":>12}{"codificar µs":>15}{"decodificar µs":>17}')
+    for name, make_message, encode, repeat in cases:
+        message = make_message()
+        for format_name, (size, encode_time, decode_time) in (
+            ('pickle', measure_pickle(message, repeat)),
+            ('binario', measure_binary(encode, repeat)),
+        ):
+            print(f'{name:<20}{format_name:<9}{size:>12}'
+                  f'{encode_time / repeat * 1e6:>15.1f}{decode_time / repeat * 1e6:>17.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Escala del servidor con 50 a 200 clientes simulados por loopback que se mueven MOVES_PER_SECOND veces por
+segundo: latencia desde que un cliente envía un movimiento hasta que recibe las posiciones que lo
+incluyen, movimientos que llegan a verse, bytes recibidos por cliente y CPU del proceso del servidor.
+Antes el servidor tenía un hilo por cliente y, tras cada movimiento, enviaba las posiciones a todos los
+clientes con un lock global (ThreadedServer); ahora (server.py) un bucle de asyncio las envía juntas
+TICK_RATE veces por segundo. Con 'lento' hay además un cliente que nunca lee lo que recibe.
+
+El servidor es otro proceso; los clientes son tareas de asyncio de este y comparten la CPU con él. Cada
+cliente solo busca su posición en el último mensaje de cada lectura, para gastar lo mínimo.
+"""
+from common import *
+import asyncio
+import socket
+import struct
+import subprocess
+import threading
+from protocol import FRAME_HEADER, MSG_DIRECTION, MSG_POSITIONS, POSITION, POSITIONS, RECV_SIZE
+from protocol import StreamDecoder, encode_direction, encode_positions
+from server import Server, WIDTH, HEIGHT
+
+# (server, clients, with a client that never reads)
+RUNS = (
+    ('antes', 50, False), ('ahora', 50, False),
+    ('antes', 100, False), ('ahora', 100, False),
+    ('antes', 200, False), ('ahora', 200, False),
+    ('antes', 100, True), ('ahora', 100, True),
+)
+MOVES_PER_SECOND = 10
+DURATION = 5.0
+# time after the last move for its positions to arrive
+GRACE = 1.0
+STEP = 5
+
+
+class ThreadedServer(Server):
+    """El servidor de antes: un hilo por cliente y las posiciones a todos tras cada movimiento, con un lock."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+
+    def broadcast_positions(self):
+        with self.lock:
+            data = encode_positions(self.players)
+            for conn in self.connections:
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+
+    def handle_connection(self, conn, addr):
+        with self.lock:
+            self.players[addr] = [WIDTH // 2, HEIGHT // 2]
+            self.connections.append(conn)
+        self.broadcast_positions()
+        decoder = StreamDecoder()
+        try:
+            while data := conn.recv(RECV_SIZE):
+                directions = [message for msg_type, message in decoder.feed(data) if msg_type == MSG_DIRECTION]
+                if directions:
+                    with self.lock:
+                        for direction in directions:
+                            self.move_player(addr, direction)
+                    self.broadcast_positions()
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                del self.players[addr]
+                self.connections.remove(conn)
+            conn.close()
+
+    def start(self):
+        while True:
+            conn, addr = self.server.accept()
+            threading.Thread(target=self.handle_connection, args=(conn, addr), daemon=True).start()
+
+
+class SimulatedClient:
+    """Se mueve a la derecha cada 1 / MOVES_PER_SECOND s y apunta cuándo ve cada movimiento en las posiciones."""
+    def __init__(self):
+        self.sent_times = []
+        self.latencies = []
+        self.num_bytes = 0
+
+    async def run(self, port, start, reads=True):
+        reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+        host, local_port = self.writer.get_extra_info('sockname')[:2]
+        # own entry in the positions, as the server sees this socket
+        self.key = socket.inet_aton(host) + struct.pack('<H', local_port)
+        if not reads:
+            await asyncio.sleep(start + DURATION + GRACE - time.perf_counter())
+            return
+        read_task = asyncio.create_task(self.read_loop(reader))
+        await self.move_loop(start)
+        await asyncio.sleep(GRACE)
+        read_task.cancel()
+        self.writer.close()
+
+    async def move_loop(self, start):
+        # spread the clients over the first interval
+        next_move = start + np.random.random() / MOVES_PER_SECOND
+        while next_move < start + DURATION:
+            await asyncio.sleep(max(0.0, next_move - time.perf_counter()))
+            self.sent_times.append(time.perf_counter())
+            self.writer.write(encode_direction('RIGHT'))
+            next_move += 1 / MOVES_PER_SECOND
+
+    async def read_loop(self, reader):
+        buffer = bytearray()
+        while data := await reader.read(RECV_SIZE):
+            self.num_bytes += len(data)
+            buffer += data
+            start = 0
+            last = None
+            while len(buffer) - start >= FRAME_HEADER.size:
+                length, msg_type = FRAME_HEADER.unpack_from(buffer, start)
+                end = start + FRAME_HEADER.size + length
+                if len(buffer) < end:
+                    break
+                if msg_type == MSG_POSITIONS:
+                    last = (start + FRAME_HEADER.size, end)
+                start = end
+            if last is not None:
+                self.see(buffer, *last)
+            del buffer[:start]
+
+    def see(self, buffer, begin, end):
+        entry = buffer.find(self.key, begin + POSITIONS.size, end)
+        if entry < 0 or (entry - begin - POSITIONS.size) % POSITION.size:
+            return
+        x = POSITION.unpack_from(buffer, entry)[2]
+        now = time.perf_counter()
+        # the x only grows, one STEP per move
+        for sent in self.sent_times[len(self.latencies):(x - WIDTH // 2) // STEP]:
+            self.latencies.append(now - sent)
+
+
+async def run_clients(port, num_clients, slow):
+    clients = [SimulatedClient() for _ in range(num_clients)]
+    start = time.perf_counter() + 1.0
+    tasks = [client.run(port, start) for client in clients]
+    if slow:
+        tasks.append(SimulatedClient().run(port, start, reads=False))
+    await asyncio.gather(*tasks)
+    return clients
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    # utime and stime, fields 14 and 15
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def serve(mode):
+    server_class = ThreadedServer if mode == 'antes' else Server
+    server = server_class(host='127.0.0.1', port=0)
+    print(f'puerto {server.port}', flush=True)
+    # one line per connection, nobody reads them
+    sys.stdout = open(os.devnull, 'w')
+    server.start()
+
+
+def run(mode, num_clients, slow):
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--server', mode], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        line = ''
+        while not line.startswith('puerto'):
+            line = server.stdout.readline()
+            if not line:
+                raise RuntimeError('el servidor terminó sin escuchar')
+        port = int(line.split()[1])
+        cpu_start = cpu_seconds(server.pid)
+        with Timer() as timer:
+            clients = asyncio.run(run_clients(port, num_clients, slow))
+        cpu = cpu_seconds(server.pid) - cpu_start
+    finally:
+        server.kill()
+        server.wait()
+    latencies = np.concatenate([client.latencies for client in clients]) * 1000
+    num_moves = sum(len(client.sent_times) for client in clients)
+    return {
+        'p50': np.percentile(latencies, 50) if len(latencies) else float('nan'),
+        'p95': np.percentile(latencies, 95) if len(latencies) else float('nan'),
+        'seen': len(latencies) / num_moves,
+        'rate': np.mean([client.num_bytes for client in clients]) / DURATION,
+        'cpu': cpu / timer.elapsed,
+    }
+
+
+def main():
+    print(f'{"servidor":<10}{"clientes":>9}{"lento":>7}{"p50 ms":>9}{"p95 ms":>9}{"vistos":>8}'
+          f'{"KB/s por cliente":>18}{"CPU servidor":>14}')
+    for mode, num_clients, slow in RUNS:
+        result = run(mode, num_clients, slow)
+        print(f'{mode:<10}{num_clients:>9}{"sí" if slow else "no":>7}{result["p50"]:>9.1f}{result["p95"]:>9.1f}'
+              f'{result["seen"]:>8.0%}{result["rate"] / 1024:>18.1f}{result["cpu"]:>14.0%}')
+
+
+if __name__ == '__main__':
+    if '--server' in sys.argv:
+        serve(sys.argv[-1])
+    else:
+        main()
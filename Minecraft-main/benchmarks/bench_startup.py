@@ -0,0 +1,49 @@
+"""
+Arranque en frío y en caliente: lanza dos veces un proceso que ejecuta warmup() y después el trabajo
+real del arranque (generar el terreno del mundo por defecto, comprimirlo y mallar todos los chunks),
+la primera con la caché de numba vacía y la segunda con la que dejó la primera.
+"""
+from common import *
+import json
+import subprocess
+import tempfile
+from warmup import warmup, get_summary
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_padded_voxels
+from voxel_store import VoxelStore
+
+
+def child():
+    start = time.perf_counter()
+    report = warmup()
+    jit_time = time.perf_counter() - start
+
+    with Timer() as timer:
+        voxels = generate_world_voxels()
+        store = VoxelStore(WORLD_VOL)
+        store.set_chunks(range(WORLD_VOL), voxels)
+        slot_coords = chunk_position_array()
+        for position, chunk_index in chunk_positions():
+            padded_voxels = build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords)
+            build_chunk_mesh(padded_voxels, y_min=0, y_max=CHUNK_SIZE)
+    print(json.dumps({'jit': jit_time, 'work': timer.elapsed, 'summary': get_summary(report)}))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+        print(f'{"arranque":<10}{"proceso s":>11}{"JIT s":>9}{"trabajo s":>11}')
+        for name in ('en frío', 'en caliente'):
+            with Timer() as timer:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child'],
+                    env=env, capture_output=True, text=True, check=True
+                ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f'{name:<10}{timer.elapsed:>11.2f}{result["jit"]:>9.2f}{result["work"]:>11.2f}   {result["summary"]}')
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child()
+    else:
+        main()
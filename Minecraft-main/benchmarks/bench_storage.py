@@ -0,0 +1,55 @@
+"""
+Compara generar el mundo por defecto desde el ruido con cargarlo desde archivos de región.
+Usa una carpeta temporal, no toca la partida guardada.
+"""
+from common import *
+import shutil
+import tempfile
+from world_storage import WorldStorage
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    positions = chunk_position_array()
+    # compile before timing
+    generate_world_voxels()
+
+    with Timer() as generate_timer:
+        heightmap = generate_world_heightmap()
+        voxels = generate_world_voxels(heightmap)
+
+    path = tempfile.mkdtemp(prefix='world_')
+    try:
+        storage = WorldStorage(path)
+        with Timer() as save_timer:
+            storage.save_chunks(positions, voxels)
+
+        # the heightmap is not saved, World computes it again when loading
+        loaded = np.empty_like(voxels)
+        with Timer() as load_timer:
+            generate_world_heightmap()
+            found = storage.load_chunks(positions, loaded)
+
+        assert found.all() and np.array_equal(loaded, voxels)
+
+        # rewrite a single modified chunk
+        with Timer() as update_timer:
+            storage.save_chunks(positions[:1], voxels[:1])
+
+        size = folder_size(path)
+    finally:
+        shutil.rmtree(path)
+
+    print(f'{WORLD_VOL} chunks, {voxels.nbytes / 2 ** 20:.1f} MB sin comprimir, '
+          f'{size / 2 ** 20:.2f} MB en disco ({voxels.nbytes / size:.0f}x)')
+    print(f'generar:          {generate_timer.elapsed:.2f} s')
+    print(f'guardar:          {save_timer.elapsed:.2f} s')
+    print(f'cargar:           {load_timer.elapsed:.2f} s ({generate_timer.elapsed / load_timer.elapsed:.1f}x más rápido)')
+    print(f'guardar 1 chunk:  {update_timer.elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Ancho de banda por cliente de la sincronización del mundo, con el jugador quieto y con ediciones:
+antes, el servidor enviaba el mundo completo con pickle cada 0.1 s; ahora (NetworkManager.send_updates)
+envía el mundo al unirse el cliente y después solo los cambios que el cliente no ha confirmado.
+El cliente es un hilo al otro lado de un socketpair que decodifica los mensajes y los confirma.
+Usa el mundo real del modo sin ventana (headless.py), así que necesita un contexto de OpenGL sin ventana.
+"""
+from common import *
+import pickle
+import socket
+import threading
+from headless import HeadlessEngine
+from server import DummySocket
+from network_manager import NetworkManager
+from protocol import (
+    StreamDecoder, encode_ack, encode_join, MSG_CHUNK_DATA, MSG_CHUNKS, MSG_VOXEL_EDITS, MSG_WORLD_UPDATE,
+    MAX_CLIENT_PAYLOAD, RECV_SIZE
+)
+
+TICKS = 30
+# (name, voxel edits per tick)
+LOADS = (('quieto', 0), ('10 ediciones/tick', 10), ('200 ediciones/tick', 200))
+
+
+class SyncClient:
+    """Cliente mínimo: cuenta los bytes recibidos y confirma la versión de cada mensaje del mundo."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.num_bytes = 0
+        self.version = None
+        self.thread = threading.Thread(target=self.receive_loop, daemon=True)
+        self.thread.start()
+
+    def receive_loop(self):
+        decoder = StreamDecoder()
+        self.sock.sendall(encode_join(CENTER_XZ, CENTER_XZ))
+        while data := self.sock.recv(RECV_SIZE):
+            self.num_bytes += len(data)
+            for msg_type, message in decoder.feed(data):
+                # the chunks of the join are acknowledged with the last one
+                if msg_type == MSG_CHUNK_DATA and message[2]:
+                    continue
+                if msg_type in (MSG_WORLD_UPDATE, MSG_VOXEL_EDITS, MSG_CHUNKS, MSG_CHUNK_DATA):
+                    self.version = message[0]
+                    self.sock.sendall(encode_ack(self.version))
+
+
+class AckReader:
+    """Lado del servidor del socketpair: pasa las confirmaciones al NetworkManager, como Server.handle_client."""
+    def __init__(self, net_manager, conn):
+        self.thread = threading.Thread(target=self.receive_loop, args=(net_manager, conn), daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def receive_loop(net_manager, conn):
+        decoder = StreamDecoder(MAX_CLIENT_PAYLOAD)
+        while data := conn.recv(RECV_SIZE):
+            for msg_type, message in decoder.feed(data):
+                net_manager.process_client_message(conn, msg_type, message)
+
+
+def edit_random_voxels(world, rng, count):
+    # like VoxelHandler: the voxel in the store and the edit in the world log
+    for slot, voxel_index in zip(rng.integers(0, STORE_VOL, count), rng.integers(0, CHUNK_VOL, count)):
+        chunk = world.chunks[slot]
+        chunk.set_voxel(int(voxel_index), int(rng.integers(0, 8)))
+        world.mark_modified(chunk, int(voxel_index))
+
+
+def main():
+    engine = HeadlessEngine(num_frames=1, scale=0.25)
+    world = engine.scene.world
+    rng = np.random.default_rng(0)
+
+    # the old broadcast: the pickled world, every SYNC_INTERVAL, edits or not
+    old_message = pickle.dumps({'type': 'world_update', 'data': world.voxel_store.get_chunks(range(STORE_VOL))})
+    old_rate = len(old_message) / SYNC_INTERVAL
+
+    server_sock, client_sock = socket.socketpair()
+    net_manager = NetworkManager(is_server=True, sock=DummySocket(), world=world, connections=[server_sock])
+
+    net_manager.add_client(server_sock)
+    AckReader(net_manager, server_sock)
+    client = SyncClient(client_sock)
+    with Timer() as join:
+        while client.version is None:
+            net_manager.send_updates()
+            time.sleep(SYNC_INTERVAL)
+    print(f'unión: {client.num_bytes / 2 ** 20:.1f} MB en {join.elapsed:.2f} s')
+
+    print(f'{"carga":<22}{"antes KB/s":>14}{"ahora KB/s":>14}{"envío ms/tick":>15}')
+    for name, edits_per_tick in LOADS:
+        start_bytes = client.num_bytes
+        send_time = 0.0
+        with Timer() as timer:
+            for _ in range(TICKS):
+                edit_random_voxels(world, rng, edits_per_tick)
+                with Timer() as send:
+                    net_manager.send_updates()
+                send_time += send.elapsed
+                time.sleep(SYNC_INTERVAL)
+        rate = (client.num_bytes - start_bytes) / timer.elapsed
+        print(f'{name:<22}{old_rate / 1024:>14.0f}{rate / 1024:>14.1f}{send_time / TICKS * 1000:>15.2f}')
+
+    server_sock.close()
+    client_sock.close()
+    engine.scene.world.mesh_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
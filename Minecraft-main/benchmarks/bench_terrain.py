@@ -0,0 +1,45 @@
+"""
+Tiempo de generación del terreno del mundo por defecto (WORLD_VOL chunks) con 1, 2, 4 y N hilos.
+El máximo de hilos lo fija Numba (NUMBA_NUM_THREADS, por defecto el número de núcleos).
+"""
+from common import *
+import numba
+
+
+# noise2 calls made by get_height for every column
+HEIGHT_NOISE_CALLS = 6
+
+
+def main():
+    positions = chunk_position_array()
+    column_ids = positions[:, 0] + WORLD_W * positions[:, 2]
+    voxels = np.zeros([WORLD_VOL, CHUNK_VOL], dtype='uint8')
+    is_empty = np.empty(WORLD_VOL, dtype=np.bool_)
+
+    # compile before timing
+    heightmap = generate_world_heightmap()
+    generate_chunks(voxels[:1], positions[:1], heightmap, column_ids[:1], is_empty[:1])
+
+    with Timer() as timer:
+        heightmap = generate_world_heightmap()
+    print(f'heightmap: {timer.elapsed:.2f} s, {heightmap.nbytes / 2 ** 20:.1f} MB, '
+          f'{WORLD_AREA * CHUNK_AREA * HEIGHT_NOISE_CALLS} llamadas a noise2 '
+          f'(antes {WORLD_VOL * CHUNK_AREA * HEIGHT_NOISE_CALLS})')
+
+    max_threads = numba.config.NUMBA_NUM_THREADS
+    thread_counts = sorted({n for n in (1, 2, 4, max_threads) if n <= max_threads})
+
+    print(f'{WORLD_VOL} chunks, {max_threads} hilos disponibles')
+    print(f'{"hilos":>6}{"tiempo s":>10}{"speedup":>9}')
+    base = None
+    for num_threads in thread_counts:
+        numba.set_num_threads(num_threads)
+        voxels[:] = 0
+        with Timer() as timer:
+            generate_chunks(voxels, positions, heightmap, column_ids, is_empty)
+        base = base or timer.elapsed
+        print(f'{num_threads:>6}{timer.elapsed:>10.2f}{base / timer.elapsed:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
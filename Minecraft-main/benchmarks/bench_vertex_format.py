@@ -0,0 +1,67 @@
+"""
+Compara el formato de vértice anterior de las mallas de chunks ('1u4 2f', 6 vértices por cara,
+72 bytes) con el actual ('1u4' con índices compartidos, 4 vértices por cara, 16 bytes):
+bytes de VBO del mundo por defecto y tiempo de subida a la GPU.
+Necesita un contexto de OpenGL sin ventana (EGL).
+"""
+from common import *
+import moderngl as mgl
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_padded_voxels, QUAD_INDICES
+from voxel_store import VoxelStore
+
+
+def build_meshes(voxels):
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(WORLD_VOL), voxels)
+    slot_coords = chunk_position_array()
+    return [build_chunk_mesh(build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords))
+            for position, chunk_index in chunk_positions()]
+
+
+def to_old_format(vertex_data):
+    # one (packed_data, u, v) triple per vertex of both triangles; the uv words do not change the upload cost
+    num_faces = len(vertex_data) // 4
+    corners = (np.arange(num_faces, dtype='uint32')[:, np.newaxis] * 4 + QUAD_INDICES).ravel()
+    old = np.zeros([len(corners), 3], dtype='uint32')
+    old[:, 0] = vertex_data[corners]
+    return old
+
+
+def measure_upload(ctx, meshes):
+    elapsed = 0.0
+    buffers = []
+    for vertex_data in meshes:
+        if not vertex_data.nbytes:
+            continue
+        with Timer() as timer:
+            buffers.append(ctx.buffer(vertex_data))
+            ctx.finish()
+        elapsed += timer.elapsed
+    for buffer in buffers:
+        buffer.release()
+    return elapsed
+
+
+def main():
+    ctx = mgl.create_standalone_context(require=330, backend='egl')
+    meshes = build_meshes(generate_world_voxels())
+    old_meshes = [to_old_format(vertex_data) for vertex_data in meshes]
+
+    # warm up the driver before timing
+    measure_upload(ctx, meshes[:50])
+    results = {
+        "'1u4 2f' x6": (sum(mesh.nbytes for mesh in old_meshes), measure_upload(ctx, old_meshes)),
+        "'1u4' x4 + ibo": (sum(mesh.nbytes for mesh in meshes), measure_upload(ctx, meshes)),
+    }
+    index_bytes = CHUNK_VOL * 3 * len(QUAD_INDICES) * 4
+
+    print(f'{"format":<16}{"VBO MB":>10}{"upload ms":>12}')
+    for name, (vbo_bytes, elapsed) in results.items():
+        print(f'{name:<16}{vbo_bytes / 2 ** 20:>10.1f}{elapsed * 1000:>12.1f}')
+    (old_bytes, old_time), (new_bytes, new_time) = results.values()
+    print(f'{old_bytes / new_bytes:.1f}x menos bytes, subida {old_time / new_time:.1f}x más rápida '
+          f'(más {index_bytes / 2 ** 20:.1f} MB de índices compartidos por todos los chunks)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Memoria de los voxeles del mundo por defecto: arrays densos de un byte por voxel
+frente al VoxelStore (chunks uniformes, paleta de 4 bits o densos).
+"""
+from common import *
+from voxel_store import VoxelStore, UNIFORM, PALETTE, DENSE, get_voxel
+
+
+@njit
+def read_random(voxel_refs, voxel_pool, slots, indices):
+    total = 0
+    for i in range(len(slots)):
+        total += get_voxel(voxel_refs, voxel_pool, slots[i], indices[i])
+    return total
+
+
+@njit
+def read_random_dense(voxels, slots, indices):
+    total = 0
+    for i in range(len(slots)):
+        total += voxels[slots[i], indices[i]]
+    return total
+
+
+def main():
+    voxels = generate_world_voxels()
+
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(1), voxels[:1])  # compile before timing
+    with Timer() as compress:
+        store.set_chunks(range(WORLD_VOL), voxels)
+    with Timer() as decompress:
+        decoded = store.get_chunks(range(WORLD_VOL))
+    assert np.array_equal(decoded, voxels)
+
+    kinds = np.bincount(store.refs & 3, minlength=3)
+    print(f'{WORLD_VOL} chunks: {kinds[UNIFORM]} uniformes, {kinds[PALETTE]} con paleta, {kinds[DENSE]} densos')
+    print(f'denso: {voxels.nbytes / 2 ** 20:.1f} MB, VoxelStore: {store.nbytes / 2 ** 20:.1f} MB '
+          f'({voxels.nbytes / store.nbytes:.1f}x menos)')
+    print(f'comprimir {compress.elapsed:.2f} s, descomprimir {decompress.elapsed:.2f} s')
+
+    rng = np.random.default_rng(0)
+    slots = rng.integers(0, WORLD_VOL, 10 ** 6)
+    indices = rng.integers(0, CHUNK_VOL, 10 ** 6)
+    for name, read, args in (
+        ('denso', read_random_dense, (voxels,)),
+        ('VoxelStore', read_random, (store.refs, store.pool)),
+    ):
+        read(*args, slots, indices)
+        with Timer() as timer:
+            read(*args, slots, indices)
+        print(f'lectura aleatoria {name}: {timer.elapsed * 1000:.1f} ns por voxel')
+
+
+if __name__ == '__main__':
+    main()
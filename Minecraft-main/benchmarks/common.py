@@ -0,0 +1,57 @@
+"""
+Utilidades compartidas por los benchmarks.
+Se ejecutan desde la carpeta del proyecto, por ejemplo: python benchmarks/mesh_stats.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from settings import *
+from terrain_gen import generate_chunks, generate_heightmaps
+
+
+def chunk_positions():
+    for x in range(WORLD_W):
+        for y in range(WORLD_H):
+            for z in range(WORLD_D):
+                yield (x, y, z), x + WORLD_W * z + WORLD_AREA * y
+
+
+def chunk_position_array():
+    positions = np.empty([WORLD_VOL, 3], dtype='int32')
+    for position, chunk_index in chunk_positions():
+        positions[chunk_index] = position
+    return positions
+
+
+def generate_world_heightmap():
+    heightmap = np.empty([WORLD_AREA, CHUNK_SIZE, CHUNK_SIZE], dtype='int16')
+    column_positions = np.array([(x, z) for z in range(WORLD_D) for x in range(WORLD_W)], dtype='int32')
+    generate_heightmaps(heightmap, column_positions)
+    return heightmap
+
+
+def generate_world_voxels(heightmap=None):
+    """Genera los voxeles del mundo por defecto sin crear contexto de OpenGL."""
+    if heightmap is None:
+        heightmap = generate_world_heightmap()
+    positions = chunk_position_array()
+    voxels = np.zeros([WORLD_VOL, CHUNK_VOL], dtype='uint8')
+    is_empty = np.empty(WORLD_VOL, dtype=np.bool_)
+    # int64 column ids like World.generate_chunks, so the jitted code is the one the game compiles
+    column_ids = (positions[:, 0] + WORLD_W * positions[:, 2]).astype('int64')
+    generate_chunks(voxels, positions, heightmap, column_ids, is_empty)
+    return voxels
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.start
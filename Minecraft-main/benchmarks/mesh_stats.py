@@ -0,0 +1,45 @@
+"""
+Compara la malla estándar con el greedy meshing en el mundo por defecto:
+triángulos, bytes de VBO y tiempo de construcción.
+"""
+from common import *
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_chunk_mesh_greedy, build_padded_voxels
+from voxel_store import VoxelStore
+
+
+def measure(builder, voxels):
+    store = VoxelStore(WORLD_VOL)
+    store.set_chunks(range(WORLD_VOL), voxels)
+    # in the fixed grid every slot holds the chunk of the same index
+    slot_coords = chunk_position_array()
+    # compile before timing
+    builder(build_padded_voxels(voxels[0], (0, 0, 0), store.refs, store.pool, slot_coords))
+
+    vbo_bytes = 0
+    with Timer() as timer:
+        for position, chunk_index in chunk_positions():
+            padded_voxels = build_padded_voxels(voxels[chunk_index], position, store.refs, store.pool, slot_coords)
+            mesh = builder(padded_voxels)
+            vbo_bytes += mesh.nbytes
+    # 4 bytes per vertex, 4 vertices and 2 triangles per face
+    triangles = vbo_bytes // 4 // 4 * 2
+    return triangles, vbo_bytes, timer.elapsed
+
+
+def main():
+    voxels = generate_world_voxels()
+
+    results = {
+        'standard': measure(build_chunk_mesh, voxels),
+        'greedy': measure(build_chunk_mesh_greedy, voxels),
+    }
+    print(f'{"mode":<10}{"triangles":>12}{"VBO MB":>10}{"build s":>10}{"ms/chunk":>10}')
+    for name, (triangles, vbo_bytes, elapsed) in results.items():
+        print(f'{name:<10}{triangles:>12}{vbo_bytes / 2 ** 20:>10.1f}{elapsed:>10.2f}{elapsed / WORLD_VOL * 1000:>10.2f}')
+
+    base, greedy = results['standard'][1], results['greedy'][1]
+    print(f'greedy saves {100 * (1 - greedy / base):.1f}% of triangles and VBO bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+from settings import *
+
+
+class ChunkStreamer:
+    """
+    Mantiene cargadas las columnas de chunks a menos de STREAM_RADIUS columnas del jugador.
+
+    El almacén de chunks del mundo es un buffer circular de (2 * STREAM_RADIUS + 1)^2 columnas, así
+    que una columna nueva ocupa siempre el slot de la que acaba de quedar fuera de la ventana:
+    esa columna se descarga (y se guarda en disco si se editó) al reutilizar su slot.
+    Cada frame se cargan como mucho STREAM_COLUMNS_PER_FRAME columnas, las más cercanas primero.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.center = None
+        # columns waiting to be loaded, the nearest one at the end
+        self.queue = []
+
+    @staticmethod
+    def get_column(position):
+        return int(position.x // CHUNK_SIZE), int(position.z // CHUNK_SIZE)
+
+    def get_player_column(self):
+        return self.get_column(self.world.app.player.position)
+
+    def get_wanted_columns(self):
+        return self.get_columns_around(*self.get_player_column())
+
+    @staticmethod
+    def get_columns_around(cx, cz):
+        """Columnas a menos de STREAM_RADIUS de (cx, cz), de la más cercana a la más lejana."""
+        columns = [
+            (cx + dx, cz + dz)
+            for dx in range(-STREAM_RADIUS, STREAM_RADIUS + 1)
+            for dz in range(-STREAM_RADIUS, STREAM_RADIUS + 1)
+        ]
+        columns.sort(key=lambda column: (column[0] - cx) ** 2 + (column[1] - cz) ** 2)
+        return columns
+
+    def update(self):
+        center = self.get_player_column()
+        if center != self.center:
+            self.center = center
+            self.queue = [column for column in self.get_wanted_columns() if not self.world.is_column_loaded(*column)]
+            self.queue.reverse()
+
+        if self.queue:
+            columns = [self.queue.pop() for _ in range(min(STREAM_COLUMNS_PER_FRAME, len(self.queue)))]
+            self.world.load_columns(columns)
+            self.world.request_column_meshes(columns)
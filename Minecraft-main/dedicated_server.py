@@ -0,0 +1,48 @@
+"""
+Servidor dedicado: el mundo autoritativo, solo sus voxeles (ver VoxelWorld), y la red, sin ventana,
+OpenGL ni mallas. No importa pygame ni moderngl, así que funciona en máquinas sin pantalla, y arranca
+antes y con menos memoria que el modo servidor de main.py ('s'), que crea un VoxelEngine completo.
+
+Uso: python dedicated_server.py [puerto]
+"""
+from settings import *
+from network_manager import NetworkManager
+from server import Server, DummySocket, HOST, PORT
+from startup import Startup
+from voxel_world import VoxelWorld
+from warmup import warmup, get_summary, SERVER_STEPS
+import sys
+
+
+class DedicatedServer:
+    def __init__(self, host=HOST, port=PORT):
+        # nothing to overlap with, there is no OpenGL: the phases run in order in this thread
+        self.startup = Startup(num_workers=0)
+        with self.startup.phase('JIT'):
+            jit_report = warmup(SERVER_STEPS)
+        print(f'[Startup] {get_summary(jit_report)}')
+        with self.startup.phase('terreno'):
+            self.world = VoxelWorld()
+            self.world.build_chunks()
+        with self.startup.phase('red'):
+            self.server = Server(host, port)
+            self.net_manager = NetworkManager(
+                is_server=True, sock=DummySocket(), world=self.world, connections=self.server.connections
+            )
+            self.server.net_manager = self.net_manager
+            # nothing else touches the world: the client edits are applied in the tick of the server
+            self.server.on_tick = self.net_manager.update
+        self.startup.finish('servidor listo')
+
+    def run(self):
+        # the tick of the server moves the players and syncs the world of the clients
+        try:
+            self.server.start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.world.save()
+
+
+if __name__ == '__main__':
+    DedicatedServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT).run()
@@ -33,3 +33,38 @@ class Frustum:
             return False
 
         return True
+
+    def get_visible(self, centers, margin=0.0, angle_margin=0.0):
+        """
+        Igual que is_on_frustum pero para todas las esferas de chunk a la vez: centers es un array
+        (N, 3) y devuelve una máscara de N booleanos (los centros NaN nunca son visibles).
+        margin agranda las esferas y angle_margin abre el campo de visión, así el resultado sigue
+        siendo válido mientras la cámara no se mueva ni gire más que eso.
+        """
+        half_y, half_x = V_FOV * 0.5 + angle_margin, H_FOV * 0.5 + angle_margin
+        return get_visible_spheres(
+            centers, np.array(self.cam.position), np.array(self.cam.forward), np.array(self.cam.up),
+            np.array(self.cam.right), CHUNK_SPHERE_RADIUS + margin,
+            1.0 / math.cos(half_y), math.tan(half_y), 1.0 / math.cos(half_x), math.tan(half_x)
+        )
+
+
+@njit(cache=True)
+def get_visible_spheres(centers, position, forward, up, right, radius, factor_y, tan_y, factor_x, tan_x):
+    visible = np.zeros(len(centers), dtype=np.bool_)
+    for i in range(len(centers)):
+        vx, vy, vz = centers[i, 0] - position[0], centers[i, 1] - position[1], centers[i, 2] - position[2]
+
+        sz = vx * forward[0] + vy * forward[1] + vz * forward[2]
+        if not (NEAR - radius <= sz <= FAR + radius):
+            continue
+
+        sy = vx * up[0] + vy * up[1] + vz * up[2]
+        dist = factor_y * radius + sz * tan_y
+        if not (-dist <= sy <= dist):
+            continue
+
+        sx = vx * right[0] + vy * right[1] + vz * right[2]
+        dist = factor_x * radius + sz * tan_x
+        visible[i] = -dist <= sx <= dist
+    return visible
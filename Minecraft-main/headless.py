@@ -0,0 +1,222 @@
+"""
+Modo sin ventana para medir el renderizado: contexto de OpenGL sin ventana (EGL si está disponible,
+vale un rasterizador por software), framebuffer fuera de pantalla, sin bucle de eventos de pygame
+y con la cámara siguiendo un recorrido fijo. Guarda los tiempos de cada frame en un CSV y,
+opcionalmente, los frames en PNG para comparar entre versiones.
+
+Uso: python headless.py --frames 300 --out timings.csv --png-dir frames --png-every 30
+Con --profile DIR también guarda en DIR el resultado del profiler (profiler.py) de todo el recorrido.
+"""
+import os
+
+# pygame only loads the textures: with the dummy video driver it needs no display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from settings import *
+import moderngl as mgl
+import pygame as pg
+import argparse
+import csv
+import time
+from camera import Camera
+from profiler import Profiler
+from startup import Startup
+from main import VoxelEngine
+
+# camera path as (position, yaw, pitch) keyframes in degrees, the frames are spread evenly between them
+DEFAULT_PATH = (
+    ((CENTER_XZ, CHUNK_SIZE * 1.5, CENTER_XZ), -90, -10),
+    ((CENTER_XZ, CHUNK_SIZE * 1.5, CENTER_XZ - 200), -45, -10),
+    ((CENTER_XZ + 200, 120, CENTER_XZ - 200), 45, -30),
+    ((CENTER_XZ, 200, CENTER_XZ), 135, -60),
+)
+# fixed time step, so every run sees the same clouds
+FRAME_MS = 1000 / 60
+
+
+class CameraPath:
+    def __init__(self, keyframes, num_frames):
+        self.keyframes = [(glm.vec3(position), yaw, pitch) for position, yaw, pitch in keyframes]
+        self.num_frames = num_frames
+
+    def get(self, frame):
+        """Posición, yaw y pitch (en grados) del frame, interpolando entre los dos keyframes que lo rodean."""
+        if len(self.keyframes) == 1 or self.num_frames < 2:
+            return self.keyframes[0]
+        t = frame / (self.num_frames - 1) * (len(self.keyframes) - 1)
+        i = min(int(t), len(self.keyframes) - 2)
+        t -= i
+        (position_a, yaw_a, pitch_a), (position_b, yaw_b, pitch_b) = self.keyframes[i], self.keyframes[i + 1]
+        return glm.mix(position_a, position_b, t), yaw_a + (yaw_b - yaw_a) * t, pitch_a + (pitch_b - pitch_a) * t
+
+
+class ScriptedPlayer(Camera):
+    """Jugador sin teclado ni ratón: en cada frame toma la posición y la orientación del recorrido."""
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        position, yaw, pitch = path.get(0)
+        super().__init__(position, yaw, pitch)
+
+    def update(self):
+        position, yaw, pitch = self.path.get(self.app.frame)
+        self.position = glm.vec3(position)
+        self.yaw, self.pitch = glm.radians(yaw), glm.radians(pitch)
+        super().update()
+
+    def handle_event(self, event):
+        pass
+
+
+class HeadlessEngine(VoxelEngine):
+    """
+    VoxelEngine sin ventana. La resolución es WIN_RES * scale, para conservar la relación de
+    aspecto de la cámara. Con wait_meshes cada frame espera a que se suban las mallas pendientes,
+    así los PNG no dependen de lo rápido que vayan los hilos de fondo. Con remote_world el mundo empieza
+    vacío, como el de un cliente que espera los voxeles del servidor.
+    """
+    def __init__(self, path=DEFAULT_PATH, num_frames=300, scale=0.5, wait_meshes=False, profile=False, overlay=False,
+                 startup_workers=STARTUP_WORKERS, remote_world=False):
+        self.remote_world = remote_world
+        self.startup = Startup(startup_workers)
+        with self.startup.phase('contexto'):
+            pg.init()
+            self.ctx = self.create_context()
+            self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE | mgl.BLEND)
+            self.ctx.gc_mode = 'auto'
+
+            self.size = int(WIN_RES.x * scale), int(WIN_RES.y * scale)
+            self.fbo = self.ctx.framebuffer(
+                color_attachments=[self.ctx.renderbuffer(self.size)],
+                depth_attachment=self.ctx.depth_renderbuffer(self.size)
+            )
+            self.fbo.use()
+
+        self.path = CameraPath(path, num_frames)
+        self.num_frames = num_frames
+        self.wait_meshes = wait_meshes
+        self.profile, self.overlay = profile, overlay
+        self.frame = 0
+        self.delta_time = FRAME_MS
+        self.time = 0
+        self.is_running = True
+        self.on_init()
+
+    @staticmethod
+    def create_context():
+        require = MAJOR_VER * 100 + MINOR_VER * 10
+        try:
+            return mgl.create_standalone_context(require=require, backend='egl')
+        except Exception:
+            # no EGL (Windows, macOS): the platform default also works without a window
+            return mgl.create_standalone_context(require=require)
+
+    def create_profiler(self):
+        profiler = Profiler(self.ctx, enabled=self.profile or self.overlay, history=self.num_frames)
+        profiler.show_overlay = self.overlay
+        return profiler
+
+    def create_player(self):
+        return ScriptedPlayer(self, self.path)
+
+    def create_textures(self, images):
+        textures = super().create_textures(images)
+        # the textures use NEAREST filtering anyway, but software rasterisers (llvmpipe) still sample
+        # them anisotropically and the large water quad alone takes minutes
+        for texture in (textures.texture_0, textures.texture_1, textures.texture_array_0):
+            texture.anisotropy = 1.0
+        return textures
+
+    def update(self):
+        with self.profiler.scope('player.update'):
+            self.player.update()
+        self.shader_program.update()
+        with self.profiler.scope('scene.update'):
+            self.scene.update()
+        if self.wait_meshes:
+            self.scene.world.mesh_pool.wait()
+        self.time += self.delta_time * 0.001
+
+    def render(self):
+        self.ctx.clear(color=BG_COLOR)
+        self.scene.render()
+        self.profiler.render_overlay(self)
+
+    def run(self, png_dir=None, png_every=1):
+        """Dibuja los frames del recorrido y devuelve una fila de tiempos (ms) por frame."""
+        self.startup.finish('escena lista')
+        # start with every mesh of the initial view built, like after the loading of the game
+        self.scene.world.mesh_pool.wait()
+        if png_dir:
+            os.makedirs(png_dir, exist_ok=True)
+
+        timings = []
+        for self.frame in range(self.num_frames):
+            start = time.perf_counter()
+            self.update()
+            updated = time.perf_counter()
+            self.render()
+            submitted = time.perf_counter()
+            # wait for the GPU, otherwise the frame time would only count the CPU side
+            self.ctx.finish()
+            finished = time.perf_counter()
+            self.profiler.end_frame()
+
+            timings.append({
+                'frame': self.frame,
+                'update_ms': (updated - start) * 1000,
+                'render_ms': (submitted - updated) * 1000,
+                'gpu_wait_ms': (finished - submitted) * 1000,
+                'frame_ms': (finished - start) * 1000,
+                'draws': self.scene.world.chunk_arena.num_draws,
+            })
+            if png_dir and self.frame % png_every == 0:
+                self.save_frame(os.path.join(png_dir, f'frame_{self.frame:05d}.png'))
+
+        self.scene.world.mesh_pool.shutdown()
+        return timings
+
+    def save_frame(self, file_name):
+        image = pg.image.frombuffer(self.fbo.read(components=3), self.size, 'RGB')
+        # OpenGL rows start at the bottom
+        pg.image.save(pg.transform.flip(image, False, True), file_name)
+
+
+def save_timings(timings, file_name):
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(timings[0]))
+        writer.writeheader()
+        writer.writerows(timings)
+
+
+def print_summary(timings):
+    for key in ('update_ms', 'render_ms', 'gpu_wait_ms', 'frame_ms'):
+        values = np.array([timing[key] for timing in timings])
+        print(f'{key:<12} media {values.mean():8.2f}  mediana {np.median(values):8.2f}  '
+              f'p95 {np.percentile(values, 95):8.2f}  p99 {np.percentile(values, 99):8.2f}  máx {values.max():8.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Renderiza un recorrido fijo sin ventana y mide cada frame.')
+    parser.add_argument('--frames', type=int, default=300, help='número de frames del recorrido')
+    parser.add_argument('--scale', type=float, default=0.5, help='resolución relativa a WIN_RES')
+    parser.add_argument('--out', default='timings.csv', help='CSV con los tiempos de cada frame')
+    parser.add_argument('--png-dir', help='carpeta donde guardar los frames en PNG')
+    parser.add_argument('--png-every', type=int, default=1, help='guardar uno de cada N frames')
+    parser.add_argument('--wait-meshes', action='store_true', help='esperar a las mallas pendientes en cada frame')
+    parser.add_argument('--profile', metavar='DIR', help='carpeta donde guardar el resultado del profiler')
+    parser.add_argument('--overlay', action='store_true', help='dibujar el overlay del profiler en los frames')
+    args = parser.parse_args()
+
+    engine = HeadlessEngine(num_frames=args.frames, scale=args.scale, wait_meshes=args.wait_meshes,
+                            profile=bool(args.profile), overlay=args.overlay)
+    timings = engine.run(png_dir=args.png_dir, png_every=args.png_every)
+    save_timings(timings, args.out)
+    print_summary(timings)
+    if args.profile:
+        engine.profiler.export(args.profile)
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,105 +6,25 @@ from shader_program import ShaderProgram
 from scene import Scene
 from player import Player
 from textures import Textures
+from profiler import Profiler
+from startup import Startup
+from warmup import warmup, get_summary
+from world import World
+from meshes.cloud_mesh import CloudMesh
 import socket
 import threading
-import pickle
+from protocol import StreamDecoder, encode_direction, MSG_POSITIONS, RECV_SIZE
+from server import Server, DummySocket, PORT
 import time
 
 # Importar la clase NetworkManager (asumiendo que se encuentra en network_manager.py)
 from network_manager import NetworkManager
 
-HOST = '0.0.0.0'
-PORT = 12345
-FPS = 30
-
-WIDTH, HEIGHT = 600, 400
-PLAYER_SIZE = 20
-
-COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
-
-# --- Definición de DummySocket para el servidor ---
-class DummySocket:
-    def recv(self, bufsize):
-        return b''
-    def sendall(self, data):
-        pass
-    def close(self):
-        pass
-
-# ==================== CLASE SERVIDOR ====================
-class Server:
-    def __init__(self):
-        self.players = {}
-        self.connections = []
-        self.lock = threading.Lock()
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server.bind((HOST, PORT))
-        self.server.listen()
-        print(f"[SERVIDOR] Escuchando en {HOST}:{PORT}")
-
-    def broadcast_positions(self):
-        with self.lock:
-            data = pickle.dumps(self.players)
-            for conn in self.connections:
-                try:
-                    conn.sendall(data)
-                except Exception as e:
-                    print(f"[ERROR] Al enviar posiciones: {e}")
-
-    def handle_client(self, conn, addr):
-        with self.lock:
-            self.players[addr] = [WIDTH // 2, HEIGHT // 2]
-            self.connections.append(conn)
-        
-        self.broadcast_positions()
-
-        try:
-            while True:
-                data = conn.recv(1024)
-                if not data:
-                    break
-
-                direction = pickle.loads(data)
-                with self.lock:
-                    if direction == 'UP':
-                        self.players[addr][1] = max(0, self.players[addr][1] - 5)
-                    elif direction == 'DOWN':
-                        self.players[addr][1] = min(HEIGHT, self.players[addr][1] + 5)
-                    elif direction == 'LEFT':
-                        self.players[addr][0] = max(0, self.players[addr][0] - 5)
-                    elif direction == 'RIGHT':
-                        self.players[addr][0] = min(WIDTH, self.players[addr][0] + 5)
-                
-                self.broadcast_positions()
-
-        except Exception as e:
-            print(f"[ERROR] Cliente {addr} desconectado inesperadamente: {e}")
-        finally:
-            with self.lock:
-                print(f"[DESCONECTADO] {addr} se ha desconectado.")
-                if addr in self.players:
-                    del self.players[addr]
-                if conn in self.connections:
-                    self.connections.remove(conn)
-            self.broadcast_positions()
-            conn.close()
-
-    def start(self):
-        print("[SERVIDOR] Esperando conexiones...")
-        while True:
-            try:
-                conn, addr = self.server.accept()
-                print(f"[NUEVA CONEXIÓN] {addr} conectado.")
-                threading.Thread(target=self.handle_client, args=(conn, addr), daemon=True).start()
-            except Exception as e:
-                print(f"[ERROR] Al aceptar conexión: {e}")
-
 # ==================== CLASE CLIENTE ====================
 class Client:
     def __init__(self, host):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.decoder = StreamDecoder()
         try:
             resolved_host = socket.gethostbyname(host)
             self.client.connect((resolved_host, PORT))
@@ -121,15 +41,17 @@ class Client:
 
     def send_direction(self, direction):
         try:
-            self.client.sendall(pickle.dumps(direction))
+            self.client.sendall(encode_direction(direction))
         except Exception as e:
             print(f"[ERROR] No se pudo enviar la dirección: {e}")
 
     def receive_positions(self):
         try:
             self.client.settimeout(0.1)
-            data = self.client.recv(4096)
-            return pickle.loads(data) if data else {}
+            data = self.client.recv(RECV_SIZE)
+            # the newest complete positions message, if any
+            positions = [message for msg_type, message in self.decoder.feed(data) if msg_type == MSG_POSITIONS]
+            return positions[-1] if positions else {}
         except socket.timeout:
             return {}
         except Exception as e:
@@ -137,25 +59,23 @@ class Client:
             return {}
 
     def runVoxelEngine(self):
-        app = VoxelEngine()
+        # el mundo empieza vacío: los voxeles llegan del servidor
+        app = VoxelEngine(remote_world=True)
         # Instanciar NetworkManager en modo cliente usando la instancia del mundo en app.scene.world
         net_manager = NetworkManager(is_server=False, sock=self.client, world=app.scene.world)
         app.net_manager = net_manager  # Guardar la referencia para usarla desde otros módulos (por ejemplo, VoxelHandler)
+        # los chunks más cercanos al jugador llegan primero y se mallan según llegan
+        net_manager.join(app.player.position)
 
         # Patching del método set_voxel en VoxelHandler para enviar la actualización al servidor
         vh = app.scene.world.voxel_handler
         original_set_voxel = vh.set_voxel
         def patched_set_voxel():
             original_set_voxel()
-            # Verificar que se haya detectado un voxel (voxel_world_pos no es None)
-            if vh.voxel_world_pos is None:
-                return
-            cx = int(vh.voxel_world_pos.x) // CHUNK_SIZE
-            cy = int(vh.voxel_world_pos.y) // CHUNK_SIZE
-            cz = int(vh.voxel_world_pos.z) // CHUNK_SIZE
-            chunk_index = cx + WORLD_W * cz + WORLD_AREA * cy
-            # En función de la acción (añadir o quitar), se envía el nuevo ID (0 para eliminar, o vh.new_voxel_id para añadir)
-            net_manager.send_voxel_update(chunk_index, vh.voxel_index, vh.new_voxel_id)
+            # Se envía exactamente el voxel que ha cambiado: 0 al eliminar, el vecino colocado al añadir;
+            # nada si no ha cambiado ninguno
+            if vh.last_edit is not None:
+                net_manager.send_voxel_update(*vh.last_edit)
 
         vh.set_voxel = patched_set_voxel
 
@@ -163,7 +83,24 @@ class Client:
 
 # ==================== CLASE VOXELENGINE ====================
 class VoxelEngine:
-    def __init__(self):
+    def __init__(self, remote_world=False):
+        # remote_world: the voxels come from the server, the world starts empty
+        self.remote_world = remote_world
+        self.startup = Startup()
+        with self.startup.phase('ventana y contexto'):
+            self.create_window()
+
+        self.clock = pg.time.Clock()
+        self.delta_time = 0
+        self.time = 0
+
+        pg.event.set_grab(True)
+        pg.mouse.set_visible(False)
+
+        self.is_running = True
+        self.on_init()
+
+    def create_window(self):
         pg.init()
         pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, MAJOR_VER)
         pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, MINOR_VER)
@@ -178,26 +115,47 @@ class VoxelEngine:
         self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE | mgl.BLEND)
         self.ctx.gc_mode = 'auto'
 
-        self.clock = pg.time.Clock()
-        self.delta_time = 0
-        self.time = 0
-
-        pg.event.set_grab(True)
-        pg.mouse.set_visible(False)
-
-        self.is_running = True
-        self.on_init()
-
     def on_init(self):
-        self.textures = Textures(self)
-        self.player = Player(self)
-        self.shader_program = ShaderProgram(self)
-        self.scene = Scene(self)
+        startup = self.startup
+        # the NetworkManager, set by main once the game is up in the server or a client
+        self.net_manager = None
+        self.profiler = self.create_profiler()
+        # compile everything first, so the phases below are only real work
+        with startup.phase('JIT'):
+            jit_report = warmup()
+        print(f'[Startup] {get_summary(jit_report)}')
+        self.player = self.create_player()
+
+        # the CPU-only work goes to the startup threads, the OpenGL objects are made in this one
+        images = startup.submit('texturas: decodificar', Textures.decode_images)
+        sources = startup.submit('shaders: leer', ShaderProgram.read_sources)
+        terrain = startup.submit(
+            'terreno', World.generate_terrain, World.get_initial_columns(self.player.position), not self.remote_world
+        )
+        cloud_data = startup.submit('nubes: malla', CloudMesh.build_vertex_data)
+
+        with startup.phase('texturas: OpenGL'):
+            self.textures = self.create_textures(startup.wait('texturas', images))
+        with startup.phase('shaders: compilar'):
+            self.shader_program = ShaderProgram(self, startup.wait('shaders', sources))
+        with startup.phase('escena'):
+            self.scene = Scene(self, startup.wait('terreno', terrain), startup.wait('nubes', cloud_data))
+
+    def create_profiler(self):
+        return Profiler(self.ctx)
+
+    def create_player(self):
+        return Player(self)
+
+    def create_textures(self, images):
+        return Textures(self, images)
 
     def update(self):
-        self.player.update()
+        with self.profiler.scope('player.update'):
+            self.player.update()
         self.shader_program.update()
-        self.scene.update()
+        with self.profiler.scope('scene.update'):
+            self.scene.update()
 
         self.delta_time = self.clock.tick()
         self.time = pg.time.get_ticks() * 0.001
@@ -206,12 +164,17 @@ class VoxelEngine:
     def render(self):
         self.ctx.clear(color=BG_COLOR)
         self.scene.render()
+        self.profiler.render_overlay(self)
         pg.display.flip()
 
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
                 self.is_running = False
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                self.profiler.toggle()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                self.profiler.export()
             self.player.handle_event(event=event)
 
     def run(self):
@@ -219,6 +182,11 @@ class VoxelEngine:
             self.handle_events()
             self.update()
             self.render()
+            self.profiler.end_frame()
+            self.startup.finish()
+        # a client's world is the server's: saving it would overwrite the save of a server in the same folder
+        if not self.remote_world:
+            self.scene.world.save()
         pg.quit()
         sys.exit()
 
@@ -232,14 +200,12 @@ if __name__ == "__main__":
         server = Server()
         dummy_sock = DummySocket()
         # Usamos engine.scene.world, ya que el mundo se crea en Scene.on_init()
-        net_manager = NetworkManager(is_server=True, sock=dummy_sock, world=engine.scene.world, connections=server.connections)
+        net_manager = NetworkManager(is_server=True, sock=dummy_sock, world=engine.scene.world,
+                                     connections=server.connections)
         engine.net_manager = net_manager
+        # el servidor sincroniza el mundo de los clientes en su tick
+        server.net_manager = net_manager
         threading.Thread(target=server.start, daemon=True).start()
-        def broadcast_loop():
-            while True:
-                net_manager.send_world_update()
-                time.sleep(0.1)  # Actualiza 10 veces por segundo
-        threading.Thread(target=broadcast_loop, daemon=True).start()
         engine.run()
 
     elif choice == 'c':
@@ -0,0 +1,243 @@
+from settings import *
+import moderngl as mgl
+from meshes.chunk_mesh_builder import QUAD_INDICES
+import bisect
+
+# the arena is split in pages of PAGE_SIZE vertices and a page only holds vertices of one chunk
+PAGE_BITS = 10
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_BYTES = PAGE_SIZE * 4
+# origin texture: one texel per page, ORIGINS_PER_ROW pages per row (same values as in chunk.vert)
+ORIGIN_ROW_BITS = 10
+ORIGINS_PER_ROW = 1 << ORIGIN_ROW_BITS
+ORIGIN_TEXTURE_UNIT = 3
+# worst case: every other voxel solid with its 6 faces visible
+MAX_CHUNK_FACES = CHUNK_VOL * 3
+# glMultiDrawElementsIndirect command: count, instance_count, first_index, base_vertex, base_instance
+INDIRECT_COMMAND_SIZE = 5
+
+
+class ChunkArena:
+    """
+    Un único VBO con los vértices de todas las mallas de chunks y un VAO para dibujarlas.
+
+    Cada chunk ocupa un tramo de páginas consecutivas, reservado con una lista de tramos libres
+    ordenada (primer ajuste, los tramos vecinos se unen al liberarse). En lugar de una matriz
+    de modelo, el shader lee el origen del chunk de una textura con un texel por página,
+    usando gl_VertexID >> PAGE_BITS. Lo que sobra de cada tramo se deja a cero: son caras
+    degeneradas que no generan fragmentos.
+
+    Con OpenGL 4.3 todos los chunks visibles se dibujan con una sola llamada a
+    glMultiDrawElementsIndirect con base vertex y el buffer de índices de un chunk.
+    En OpenGL 3.3 moderngl no expone los draws con base vertex: los índices cubren todo el
+    arena con valores absolutos y los chunks visibles que están seguidos en el arena se
+    dibujan con una sola llamada.
+    """
+    def __init__(self, ctx, program, num_slots, num_pages=CHUNK_ARENA_PAGES, use_indirect=None):
+        self.ctx = ctx
+        self.program = program
+        self.use_indirect = ctx.version_code >= 430 if use_indirect is None else use_indirect
+
+        # allocation of every chunk slot: first page, number of pages and vertices that may be non zero
+        self.first_pages = np.full(num_slots, -1, dtype='int64')
+        self.page_counts = np.zeros(num_slots, dtype='int64')
+        self.vertex_counts = np.zeros(num_slots, dtype='int64')
+        # free runs of pages as (first_page, num_pages), sorted by first page
+        self.free_runs = []
+
+        self.num_pages = 0
+        self.vbo = self.ibo = self.vao = self.origin_texture = None
+        self.origins = np.zeros([0, 4], dtype='int32')
+        # rows of the origin texture changed since the last render
+        self.dirty_rows = [np.inf, -np.inf]
+        self.indirect_buffer = ctx.buffer(reserve=1024 * INDIRECT_COMMAND_SIZE * 4) if self.use_indirect else None
+        # draws of the last frame, each one a glMultiDrawElementsIndirect command or a render call
+        self.num_draws = 0
+
+        self.program['u_chunk_origins'] = ORIGIN_TEXTURE_UNIT
+        self.resize(num_pages)
+
+    @property
+    def nbytes(self):
+        return self.vbo.size + self.ibo.size + self.origins.nbytes
+
+    def is_allocated(self, slot):
+        return self.first_pages[slot] >= 0
+
+    def get_capacity(self, slot):
+        return int(self.page_counts[slot]) * PAGE_SIZE
+
+    def allocate(self, slot, num_vertices, origin):
+        """Reserva páginas para num_vertices vértices del slot (liberando las que tuviera) con el origen dado."""
+        self.free(slot)
+        num_pages = max(1, -(-num_vertices // PAGE_SIZE))
+        first_page = self.take_run(num_pages)
+        if first_page is None:
+            # grow by half; the new pages join the free run at the end of the arena, if there is one
+            trailing = self.free_runs[-1][1] if self.free_runs and sum(self.free_runs[-1]) == self.num_pages else 0
+            self.resize(self.num_pages + max(self.num_pages // 2, num_pages - trailing))
+            first_page = self.take_run(num_pages)
+
+        self.first_pages[slot] = first_page
+        self.page_counts[slot] = num_pages
+        # the pages may keep vertices of a previous chunk until they are overwritten
+        self.vertex_counts[slot] = num_pages * PAGE_SIZE
+        self.origins[first_page:first_page + num_pages, :3] = origin
+        self.mark_dirty(first_page, first_page + num_pages)
+
+    def free(self, slot):
+        if not self.is_allocated(slot):
+            return
+        self.add_free_run(int(self.first_pages[slot]), int(self.page_counts[slot]))
+        self.first_pages[slot] = -1
+        self.page_counts[slot] = 0
+        self.vertex_counts[slot] = 0
+
+    def write(self, slot, vertex_data, offset=0):
+        """
+        Escribe vertex_data a partir del byte offset del tramo del slot; la malla termina ahí.
+        Los vértices que quedaban detrás se ponen a cero.
+        """
+        start = int(self.first_pages[slot]) * PAGE_BYTES
+        if vertex_data.nbytes:
+            self.vbo.write(vertex_data, offset=start + offset)
+        end = offset // 4 + len(vertex_data)
+        old_end = int(self.vertex_counts[slot])
+        if end < old_end:
+            self.vbo.write(np.zeros(old_end - end, dtype='uint32'), offset=start + end * 4)
+        self.vertex_counts[slot] = end
+
+    def take_run(self, num_pages):
+        for i, (first_page, run_pages) in enumerate(self.free_runs):
+            if run_pages >= num_pages:
+                if run_pages == num_pages:
+                    del self.free_runs[i]
+                else:
+                    self.free_runs[i] = (first_page + num_pages, run_pages - num_pages)
+                return first_page
+        return None
+
+    def add_free_run(self, first_page, num_pages):
+        i = bisect.bisect(self.free_runs, (first_page, num_pages))
+        # merge with the free runs right before and after it
+        if i < len(self.free_runs) and self.free_runs[i][0] == first_page + num_pages:
+            num_pages += self.free_runs.pop(i)[1]
+        if i > 0 and sum(self.free_runs[i - 1]) == first_page:
+            first_page, prev_pages = self.free_runs.pop(i - 1)
+            num_pages += prev_pages
+            i -= 1
+        self.free_runs.insert(i, (first_page, num_pages))
+
+    def resize(self, num_pages):
+        """Amplía el arena a num_pages páginas, copiando en la GPU los vértices que ya tenía."""
+        num_pages = -(-num_pages // ORIGINS_PER_ROW) * ORIGINS_PER_ROW
+        old_pages = self.num_pages
+
+        vbo = self.ctx.buffer(reserve=num_pages * PAGE_BYTES)
+        if self.vbo:
+            self.ctx.copy_buffer(vbo, self.vbo)
+            self.vbo.release()
+            self.vao.release()
+        self.vbo = vbo
+
+        if self.ibo is None:
+            self.ibo = self.get_index_buffer(num_pages)
+        elif not self.use_indirect:
+            ibo = self.get_index_buffer(num_pages, first_face=old_pages * PAGE_SIZE // 4)
+            self.ctx.copy_buffer(ibo, self.ibo)
+            self.ibo.release()
+            self.ibo = ibo
+        self.vao = self.ctx.vertex_array(
+            self.program, [(self.vbo, '1u4', 'packed_data')],
+            index_buffer=self.ibo, index_element_size=4, skip_errors=True
+        )
+
+        self.origins = np.concatenate([self.origins, np.zeros([num_pages - old_pages, 4], dtype='int32')])
+        if self.origin_texture:
+            self.origin_texture.release()
+        self.origin_texture = self.ctx.texture(
+            (ORIGINS_PER_ROW, num_pages // ORIGINS_PER_ROW), components=4, data=self.origins, dtype='i4'
+        )
+        # integer textures are incomplete with a linear filter
+        self.origin_texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.origin_texture.use(location=ORIGIN_TEXTURE_UNIT)
+        self.dirty_rows = [np.inf, -np.inf]
+
+        self.num_pages = num_pages
+        self.add_free_run(old_pages, num_pages - old_pages)
+
+    def get_index_buffer(self, num_pages, first_face=0):
+        """
+        Con draws indirectos basta con los índices del peor chunk, el base vertex los desplaza.
+        Si no, los índices de las caras first_face .. (todo el arena), el resto se copia del buffer anterior.
+        """
+        if self.use_indirect:
+            faces = np.arange(MAX_CHUNK_FACES, dtype='uint32')
+            return self.ctx.buffer(faces[:, np.newaxis] * 4 + QUAD_INDICES)
+
+        num_faces = num_pages * PAGE_SIZE // 4
+        ibo = self.ctx.buffer(reserve=num_faces * len(QUAD_INDICES) * 4)
+        faces = np.arange(first_face, num_faces, dtype='uint32')
+        ibo.write(faces[:, np.newaxis] * 4 + QUAD_INDICES, offset=first_face * len(QUAD_INDICES) * 4)
+        return ibo
+
+    def mark_dirty(self, first_page, end_page):
+        self.dirty_rows[0] = min(self.dirty_rows[0], first_page >> ORIGIN_ROW_BITS)
+        self.dirty_rows[1] = max(self.dirty_rows[1], (end_page - 1) >> ORIGIN_ROW_BITS)
+
+    def update_origins(self):
+        first_row, last_row = self.dirty_rows
+        if first_row > last_row:
+            return
+        first_row, last_row = int(first_row), int(last_row) + 1
+        origins = self.origins[first_row * ORIGINS_PER_ROW:last_row * ORIGINS_PER_ROW]
+        self.origin_texture.write(origins, viewport=(0, first_row, ORIGINS_PER_ROW, last_row - first_row))
+        self.dirty_rows = [np.inf, -np.inf]
+
+    def render(self, slots):
+        """Dibuja las mallas de los slots indicados con el menor número de llamadas posible."""
+        self.update_origins()
+        slots = np.asarray(slots, dtype='int64')
+        slots = slots[self.vertex_counts[slots] > 0]
+        self.num_draws = 0
+        if not len(slots):
+            return
+
+        if self.use_indirect:
+            self.render_indirect(slots)
+        else:
+            self.render_runs(slots)
+
+    def render_indirect(self, slots):
+        commands = np.zeros([len(slots), INDIRECT_COMMAND_SIZE], dtype='uint32')
+        # 6 indices for every 4 vertices
+        commands[:, 0] = self.vertex_counts[slots] // 4 * 6
+        commands[:, 1] = 1
+        commands[:, 3] = self.first_pages[slots] * PAGE_SIZE
+
+        if commands.nbytes > self.indirect_buffer.size:
+            self.indirect_buffer.orphan(2 * commands.nbytes)
+        self.indirect_buffer.write(commands)
+        self.vao.render_indirect(self.indirect_buffer, count=len(commands))
+        self.num_draws = len(commands)
+
+    def render_runs(self, slots):
+        slots = slots[np.argsort(self.first_pages[slots])]
+        starts = self.first_pages[slots] * PAGE_SIZE
+        ends = starts + self.vertex_counts[slots]
+        page_ends = (self.first_pages[slots] + self.page_counts[slots]) * PAGE_SIZE
+
+        # a draw goes on while the next mesh starts right where the pages of the previous one end,
+        # the zeroed tails in between are degenerate faces
+        breaks = np.flatnonzero(starts[1:] != page_ends[:-1]) + 1
+        run_starts = starts[np.concatenate([[0], breaks])]
+        run_ends = ends[np.concatenate([breaks - 1, [len(slots) - 1]])]
+
+        for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+            self.vao.render(vertices=(end - start) // 4 * 6, first=start // 4 * 6)
+        self.num_draws = len(run_starts)
+
+    def release(self):
+        for resource in (self.vao, self.vbo, self.ibo, self.origin_texture, self.indirect_buffer):
+            if resource:
+                resource.release()
@@ -1,28 +1,178 @@
+from settings import *
 from meshes.base_mesh import BaseMesh
-from meshes.chunk_mesh_builder import build_chunk_mesh
+from meshes.chunk_mesh_builder import build_chunk_mesh, build_chunk_mesh_greedy, build_chunk_mesh_lod, build_padded_voxels
+from meshes.chunk_arena import PAGE_SIZE
+from occlusion import get_face_connectivity, ALL_CONNECTED
+
+ALL_SECTIONS = range(NUM_SECTIONS)
+
 
 class ChunkMesh(BaseMesh):
-    def __init__(self, chunk):
+    def __init__(self, chunk, greedy=GREEDY_MESHING):
         super().__init__()
         self.app = chunk.app
         self.chunk = chunk
         self.ctx = self.app.ctx
         self.program = self.app.shader_program.chunk
+        self.greedy = greedy
 
-        # Formato: 1 unsigned int (4 bytes) + 2 floats (8 bytes) = 12 bytes por vértice
-        self.vbo_format = '1u4 2f'
-        self.format_size = 12  # 12 bytes por vértice
-        self.attrs = ('packed_data', 'in_uv')
-        self.vao = self.get_vao()
+        # Formato: 1 unsigned int (4 bytes) por vértice, 4 vértices por cara.
+        # Los vértices viven en las páginas del slot del chunk dentro del arena del mundo
+        self.arena = chunk.world.chunk_arena
 
-    def rebuild(self):
-        self.vao = self.get_vao()
+        # vertex data of every section, uploaded back to back into the pages of the chunk
+        self.sections = [None] * NUM_SECTIONS
+        # downsampled meshes of the distant levels of detail (lod -> vertex data), built when needed
+        self.lod_meshes = {}
+        # level of detail of the mesh in the arena, None if nothing was uploaded
+        self.uploaded_lod = None
+        self.num_vertices = 0
+        # bumped on every change of the mesh data, so stale background builds can be discarded
+        self.version = 0
 
-    def get_vertex_data(self):
-        mesh = build_chunk_mesh(
-            chunk_voxels=self.chunk.voxels,
-            format_size=self.format_size,
+    @property
+    def is_built(self):
+        return self.arena.is_allocated(self.chunk.slot)
+
+    @property
+    def lod(self):
+        # level of detail for the distance to the player, see World.update_lods
+        return int(self.chunk.world.chunk_lods[self.chunk.slot])
+
+    def has_lod(self, lod):
+        return self.sections[0] is not None if lod == 0 else lod in self.lod_meshes
+
+    def get_padded_voxels(self, voxels):
+        # the chunk and a one voxel border from its neighbours, copied once for all the sections
+        voxel_store = self.chunk.world.voxel_store
+        return build_padded_voxels(
+            chunk_voxels=voxels,
             chunk_pos=self.chunk.position,
-            world_voxels=self.chunk.world.voxels
+            voxel_refs=voxel_store.refs,
+            voxel_pool=voxel_store.pool,
+            slot_coords=self.chunk.world.slot_coords
         )
-        return mesh.tobytes()
+
+    @staticmethod
+    def get_connectivity(voxels):
+        # without occlusion culling every chunk is left fully connected
+        return get_face_connectivity(voxels) if OCCLUSION_CULLING else ALL_CONNECTED
+
+    def build(self, lod):
+        """
+        Genera la malla del nivel de detalle lod: todas las secciones si es 0, los vértices de
+        build_chunk_mesh_lod si no, y la conectividad. Se puede llamar desde otro hilo.
+        """
+        if lod == 0:
+            return self.build_sections(ALL_SECTIONS)
+        voxels = self.chunk.get_voxels()
+        return build_chunk_mesh_lod(self.get_padded_voxels(voxels), 1 << lod), self.get_connectivity(voxels)
+
+    def build_sections(self, section_ids):
+        """
+        Genera los vértices de las secciones indicadas y la conectividad de las caras del chunk
+        (ver occlusion.py). Solo usa la CPU, se puede llamar desde otro hilo.
+        """
+        builder = build_chunk_mesh_greedy if self.greedy else build_chunk_mesh
+        voxels = self.chunk.get_voxels()
+        padded_voxels = self.get_padded_voxels(voxels)
+        sections = []
+        for section_id in section_ids:
+            y_min = section_id * SECTION_HEIGHT
+            sections.append(builder(padded_voxels, y_min=y_min, y_max=y_min + SECTION_HEIGHT))
+        return sections, self.get_connectivity(voxels)
+
+    def set_mesh(self, lod, data, connectivity):
+        """Guarda el resultado de build(lod) (hilo principal)."""
+        if lod == 0:
+            self.set_sections(ALL_SECTIONS, data, connectivity)
+            return
+        self.lod_meshes[lod] = data
+        self.chunk.world.set_connectivity(self.chunk.slot, connectivity)
+        self.update_lod()
+
+    def set_sections(self, section_ids, sections, connectivity):
+        """Reemplaza las secciones indicadas y sube los cambios a la GPU (hilo principal)."""
+        for section_id, vertex_data in zip(section_ids, sections):
+            self.sections[section_id] = vertex_data
+        self.version += 1
+        # the other levels were built from the old voxels
+        self.lod_meshes.clear()
+        self.chunk.world.set_connectivity(self.chunk.slot, connectivity)
+
+        if self.lod == 0:
+            self.upload(first_section=min(section_ids) if self.uploaded_lod == 0 else 0)
+        else:
+            # a distant chunk keeps showing its old mesh until the new one is built
+            self.chunk.world.mesh_pool.request(self.chunk)
+
+    def update_lod(self):
+        """
+        Pasa al nivel de detalle que toca por distancia si ya está generado; si no, lo pide a los
+        hilos de fondo y mientras tanto se sigue viendo el anterior.
+        """
+        lod = self.lod
+        # the distance changes gradually, only the levels next to this one can be needed soon
+        for cached_lod in [cached_lod for cached_lod in self.lod_meshes if abs(cached_lod - lod) > 1]:
+            del self.lod_meshes[cached_lod]
+        if lod > 1:
+            self.sections = [None] * NUM_SECTIONS
+
+        if lod == self.uploaded_lod:
+            return
+        if not self.has_lod(lod):
+            self.chunk.world.mesh_pool.request(self.chunk)
+        elif lod == 0:
+            self.upload(first_section=0)
+        else:
+            self.write(self.lod_meshes[lod])
+            self.uploaded_lod = lod
+
+    def rebuild(self):
+        self.set_sections(ALL_SECTIONS, *self.build_sections(ALL_SECTIONS))
+
+    def rebuild_layers(self, y_min, y_max):
+        """Vuelve a generar solo las secciones que contienen las capas [y_min, y_max)."""
+        if not self.has_lod(0):
+            self.rebuild()
+            return
+        y_min, y_max = max(y_min, 0), min(y_max, CHUNK_SIZE)
+        if y_min >= y_max:
+            return
+        section_ids = range(y_min // SECTION_HEIGHT, (y_max - 1) // SECTION_HEIGHT + 1)
+        with self.app.profiler.scope('mesh.rebuild'):
+            self.set_sections(section_ids, *self.build_sections(section_ids))
+
+    def upload(self, first_section):
+        """
+        Sube al arena los datos a partir de la sección first_section; las anteriores no cambian
+        de tamaño ni de posición. Solo se reservan páginas nuevas si los datos ya no caben.
+        """
+        offset = sum(section.nbytes for section in self.sections[:first_section])
+        self.write(self.get_vertex_data(), offset)
+        self.uploaded_lod = 0
+
+    def write(self, vertex_data, offset=0):
+        """Escribe vertex_data en las páginas del chunk a partir del byte offset, reservándolas si hace falta."""
+        self.num_vertices = len(vertex_data)
+        slot = self.chunk.slot
+        reserve_size = self.get_reserve_size(self.num_vertices)
+        # also give back the pages of a much bigger mesh, like the full one after switching to a distant level
+        if (not self.is_built or self.num_vertices > self.arena.get_capacity(slot)
+                or self.arena.get_capacity(slot) > 2 * reserve_size + PAGE_SIZE):
+            origin = np.array(self.chunk.position) * CHUNK_SIZE
+            self.arena.allocate(slot, reserve_size, origin)
+            offset = 0
+        self.arena.write(slot, vertex_data[offset // 4:], offset=offset)
+
+    @staticmethod
+    def get_reserve_size(num_vertices):
+        # leave room for edits (about 1/8 of the mesh) so most of them can be written in place
+        return num_vertices + max(num_vertices // 8, 256)
+
+    def get_vertex_data(self):
+        return np.concatenate(self.sections)
+
+    def release(self):
+        self.arena.free(self.chunk.slot)
+        self.uploaded_lod = None
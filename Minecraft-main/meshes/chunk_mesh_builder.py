@@ -1,43 +1,55 @@
 from settings import *
 from numba import njit, uint8
 import numpy as np
+from voxel_store import get_voxel
 
-@njit
-def get_ao(local_pos, world_pos, world_voxels, plane):
+# the mesher works on a copy of the chunk with a one voxel border taken from its neighbours
+PADDED_SIZE = CHUNK_SIZE + 2
+PADDED_AREA = PADDED_SIZE * PADDED_SIZE
+PADDED_VOL = PADDED_AREA * PADDED_SIZE
+# border value where the neighbour chunk is not loaded: any non-zero id, so its faces are hidden
+UNLOADED_VOXEL = 255
+# neighbour offset + 1 -> local range of the border cells it provides along that axis
+PADDING_RANGES = np.array([(-1, 0), (0, CHUNK_SIZE), (CHUNK_SIZE, CHUNK_SIZE + 1)], dtype=np.int32)
+# axis normal to a face, the plane argument of get_ao
+PLANE_X, PLANE_Y, PLANE_Z = 0, 1, 2
+
+@njit(cache=True)
+def get_ao(local_pos, padded_voxels, plane, step=1):
+    # step: size of the face, the voxels past its far corners are step voxels away
     x, y, z = local_pos
-    wx, wy, wz = world_pos
-
-    if plane == 'Y':
-        a = is_void((x    , y, z - 1), (wx    , wy, wz - 1), world_voxels)
-        b = is_void((x - 1, y, z - 1), (wx - 1, wy, wz - 1), world_voxels)
-        c = is_void((x - 1, y, z    ), (wx - 1, wy, wz    ), world_voxels)
-        d = is_void((x - 1, y, z + 1), (wx - 1, wy, wz + 1), world_voxels)
-        e = is_void((x    , y, z + 1), (wx    , wy, wz + 1), world_voxels)
-        f = is_void((x + 1, y, z + 1), (wx + 1, wy, wz + 1), world_voxels)
-        g = is_void((x + 1, y, z    ), (wx + 1, wy, wz    ), world_voxels)
-        h = is_void((x + 1, y, z - 1), (wx + 1, wy, wz - 1), world_voxels)
-    elif plane == 'X':
-        a = is_void((x, y    , z - 1), (wx, wy    , wz - 1), world_voxels)
-        b = is_void((x, y - 1, z - 1), (wx, wy - 1, wz - 1), world_voxels)
-        c = is_void((x, y - 1, z    ), (wx, wy - 1, wz    ), world_voxels)
-        d = is_void((x, y - 1, z + 1), (wx, wy - 1, wz + 1), world_voxels)
-        e = is_void((x, y    , z + 1), (wx, wy    , wz + 1), world_voxels)
-        f = is_void((x, y + 1, z + 1), (wx, wy + 1, wz + 1), world_voxels)
-        g = is_void((x, y + 1, z    ), (wx, wy + 1, wz    ), world_voxels)
-        h = is_void((x, y + 1, z - 1), (wx, wy + 1, wz - 1), world_voxels)
+
+    if plane == PLANE_Y:
+        a = is_void(padded_voxels, x    , y, z - 1)
+        b = is_void(padded_voxels, x - 1, y, z - 1)
+        c = is_void(padded_voxels, x - 1, y, z    )
+        d = is_void(padded_voxels, x - 1, y, z + step)
+        e = is_void(padded_voxels, x    , y, z + step)
+        f = is_void(padded_voxels, x + step, y, z + step)
+        g = is_void(padded_voxels, x + step, y, z    )
+        h = is_void(padded_voxels, x + step, y, z - 1)
+    elif plane == PLANE_X:
+        a = is_void(padded_voxels, x, y    , z - 1)
+        b = is_void(padded_voxels, x, y - 1, z - 1)
+        c = is_void(padded_voxels, x, y - 1, z    )
+        d = is_void(padded_voxels, x, y - 1, z + step)
+        e = is_void(padded_voxels, x, y    , z + step)
+        f = is_void(padded_voxels, x, y + step, z + step)
+        g = is_void(padded_voxels, x, y + step, z    )
+        h = is_void(padded_voxels, x, y + step, z - 1)
     else:  # Z plane
-        a = is_void((x - 1, y    , z), (wx - 1, wy    , wz), world_voxels)
-        b = is_void((x - 1, y - 1, z), (wx - 1, wy - 1, wz), world_voxels)
-        c = is_void((x    , y - 1, z), (wx    , wy - 1, wz), world_voxels)
-        d = is_void((x + 1, y - 1, z), (wx + 1, wy - 1, wz), world_voxels)
-        e = is_void((x + 1, y    , z), (wx + 1, wy    , wz), world_voxels)
-        f = is_void((x + 1, y + 1, z), (wx + 1, wy + 1, wz), world_voxels)
-        g = is_void((x    , y + 1, z), (wx    , wy + 1, wz), world_voxels)
-        h = is_void((x - 1, y + 1, z), (wx - 1, wy + 1, wz), world_voxels)
+        a = is_void(padded_voxels, x - 1, y    , z)
+        b = is_void(padded_voxels, x - 1, y - 1, z)
+        c = is_void(padded_voxels, x    , y - 1, z)
+        d = is_void(padded_voxels, x + step, y - 1, z)
+        e = is_void(padded_voxels, x + step, y    , z)
+        f = is_void(padded_voxels, x + step, y + step, z)
+        g = is_void(padded_voxels, x    , y + step, z)
+        h = is_void(padded_voxels, x - 1, y + step, z)
     ao = (a + b + c, g + h + a, e + f + g, c + d + e)
     return ao
 
-@njit
+@njit(cache=True)
 def pack_data(x, y, z, voxel_id, face_id, ao_id, flip_id):
     # x: 6bit, y: 6bit, z: 6bit, voxel_id: 8bit, face_id: 3bit, ao_id: 2bit, flip_id: 1bit
     a, b, c, d, e, f, g = x, y, z, voxel_id, face_id, ao_id, flip_id
@@ -50,197 +62,383 @@ def pack_data(x, y, z, voxel_id, face_id, ao_id, flip_id):
     packed = (a << bcdefg_bit) | (b << cdefg_bit) | (c << defg_bit) | (d << efg_bit) | (e << fg_bit) | (f << g_bit) | g
     return packed
 
-@njit
-def get_chunk_index(world_voxel_pos):
+@njit(cache=True)
+def get_chunk_index(world_voxel_pos, slot_coords):
+    """Slot del almacén de chunks que contiene el voxel, o -1 si ese chunk no está cargado."""
     wx, wy, wz = world_voxel_pos
     cx = wx // CHUNK_SIZE
     cy = wy // CHUNK_SIZE
     cz = wz // CHUNK_SIZE
-    if not (0 <= cx < WORLD_W and 0 <= cy < WORLD_H and 0 <= cz < WORLD_D):
+    if not (0 <= cy < WORLD_H):
+        return -1
+    chunk_index = cx % STORE_W + STORE_W * (cz % STORE_D) + STORE_AREA * cy
+    if slot_coords[chunk_index, 0] != cx or slot_coords[chunk_index, 2] != cz:
         return -1
-    return cx + WORLD_W * cz + WORLD_AREA * cy
-
-@njit
-def is_void(local_voxel_pos, world_voxel_pos, world_voxels):
-    chunk_index = get_chunk_index(world_voxel_pos)
-    if chunk_index == -1:
-        return False
-    chunk_voxels = world_voxels[chunk_index]
-    x, y, z = local_voxel_pos
-    voxel_index = x % CHUNK_SIZE + (z % CHUNK_SIZE) * CHUNK_SIZE + (y % CHUNK_SIZE) * CHUNK_AREA
-    if chunk_voxels[voxel_index]:
-        return False
-    return True
-
-@njit
-def add_data(vertex_data, index, *vertices):
-    for v in vertices:
-        vertex_data[index] = v
+    return chunk_index
+
+@njit(cache=True)
+def get_padded_index(x, y, z):
+    # x, y, z are chunk-local coordinates from -1 to CHUNK_SIZE
+    return (x + 1) + PADDED_SIZE * (z + 1) + PADDED_AREA * (y + 1)
+
+@njit(cache=True)
+def is_void(padded_voxels, x, y, z):
+    return not padded_voxels[get_padded_index(x, y, z)]
+
+@njit(cache=True)
+def build_padded_voxels(chunk_voxels, chunk_pos, voxel_refs, voxel_pool, slot_coords):
+    """
+    Copia el chunk en un array de PADDED_SIZE^3 con un borde de un voxel tomado de los 26 chunks
+    vecinos, de modo que el mallado no tenga que buscar el chunk de cada vecino.
+    Los vecinos que no están cargados cuentan como sólidos.
+    """
+    padded_voxels = np.empty(PADDED_VOL, dtype=np.uint8)
+    for y in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            row = get_padded_index(0, y, z)
+            voxel_index = CHUNK_SIZE * z + CHUNK_AREA * y
+            padded_voxels[row:row + CHUNK_SIZE] = chunk_voxels[voxel_index:voxel_index + CHUNK_SIZE]
+
+    cx, cy, cz = chunk_pos
+    for ny in range(-1, 2):
+        for nz in range(-1, 2):
+            for nx in range(-1, 2):
+                if nx == 0 and ny == 0 and nz == 0:
+                    continue
+                slot = get_chunk_index(((cx + nx) * CHUNK_SIZE, (cy + ny) * CHUNK_SIZE, (cz + nz) * CHUNK_SIZE), slot_coords)
+
+                # local range of the border cells that belong to this neighbour, -1 or CHUNK_SIZE on its side
+                x_lo, x_hi = PADDING_RANGES[nx + 1]
+                y_lo, y_hi = PADDING_RANGES[ny + 1]
+                z_lo, z_hi = PADDING_RANGES[nz + 1]
+                for y in range(y_lo, y_hi):
+                    for z in range(z_lo, z_hi):
+                        for x in range(x_lo, x_hi):
+                            if slot == -1:
+                                voxel_id = UNLOADED_VOXEL
+                            else:
+                                voxel_index = x % CHUNK_SIZE + CHUNK_SIZE * (z % CHUNK_SIZE) + CHUNK_AREA * (y % CHUNK_SIZE)
+                                voxel_id = get_voxel(voxel_refs, voxel_pool, slot, voxel_index)
+                            padded_voxels[get_padded_index(x, y, z)] = voxel_id
+    return padded_voxels
+
+
+# vertex layout '1u4': a single packed_data word per vertex, the uv is worked out in chunk.vert
+# every face is 4 vertices drawn with these indices, see ChunkArena
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+# face_id -> offset of the neighbour that must be empty for the face to be visible
+FACE_NORMALS = np.array([
+    (0, 1, 0), (0, -1, 0),  # top, bottom
+    (1, 0, 0), (-1, 0, 0),  # right, left
+    (0, 0, -1), (0, 0, 1),  # back, front
+], dtype=np.int32)
+
+# face_id -> offsets of the 4 face corners (v0, v1, v2, v3) from the voxel origin
+FACE_CORNERS = np.array([
+    ((0, 1, 0), (1, 1, 0), (1, 1, 1), (0, 1, 1)),
+    ((0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)),
+    ((1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)),
+    ((0, 0, 0), (0, 1, 0), (0, 1, 1), (0, 0, 1)),
+    ((0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)),
+    ((0, 0, 1), (0, 1, 1), (1, 1, 1), (1, 0, 1)),
+], dtype=np.int32)
+
+# face_id -> axes of the face plane: u runs from v0 to v1, v runs from v0 to v3
+FACE_AXES = np.array([
+    (0, 2), (0, 2),
+    (1, 2), (1, 2),
+    (1, 0), (1, 0),
+], dtype=np.int32)
+
+# face_id -> [flip_id] -> order in which the corners are written, so that QUAD_INDICES
+# gives the same two triangles, with the same winding, as the old unindexed vertex list
+FACE_QUAD_CORNERS = np.array([
+    ((0, 3, 2, 1), (1, 0, 3, 2)),
+    ((0, 1, 2, 3), (1, 2, 3, 0)),
+    ((0, 1, 2, 3), (1, 2, 3, 0)),
+    ((0, 3, 2, 1), (1, 0, 3, 2)),
+    ((0, 1, 2, 3), (1, 2, 3, 0)),
+    ((0, 3, 2, 1), (1, 0, 3, 2)),
+], dtype=np.int32)
+
+# corner -> (u, v) step along the face plane: uv0 (0, 0), uv1 (1, 0), uv2 (1, 1), uv3 (0, 1)
+CORNER_UV = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.int32)
+
+
+@njit(cache=True)
+def get_face_ao(face_id, local_pos, padded_voxels, step=1):
+    if face_id < 2:
+        return get_ao(local_pos, padded_voxels, PLANE_Y, step)
+    elif face_id < 4:
+        return get_ao(local_pos, padded_voxels, PLANE_X, step)
+    return get_ao(local_pos, padded_voxels, PLANE_Z, step)
+
+
+@njit(cache=True)
+def get_visible_faces(padded_voxels, face_masks, y_min, y_max):
+    """
+    Marca en face_masks (un bit por cara) las caras visibles de cada voxel entre las capas
+    y_min e y_max, y devuelve el número total de caras visibles.
+    """
+    num_faces = 0
+
+    # x innermost walks both arrays in memory order
+    for y in range(y_min, y_max):
+        for z in range(CHUNK_SIZE):
+            for x in range(CHUNK_SIZE):
+                if is_void(padded_voxels, x, y, z):
+                    continue
+                voxel_index = x + CHUNK_SIZE * z + CHUNK_AREA * y
+
+                mask = 0
+                for face_id in range(6):
+                    nx, ny, nz = FACE_NORMALS[face_id]
+                    if is_void(padded_voxels, x + nx, y + ny, z + nz):
+                        mask |= 1 << face_id
+                        num_faces += 1
+                face_masks[voxel_index] = mask
+    return num_faces
+
+
+@njit(cache=True)
+def add_quad(vertex_data, index, pos, size_u, size_v, voxel_id, face_id, ao, flip_id):
+    """
+    Escribe los 4 vértices de una cara que cubre size_u x size_v voxeles a partir del voxel pos.
+    El shader toma la UV de la posición del vértice, así que la textura se repite una vez por voxel.
+    """
+    x, y, z = pos
+    x0, y0, z0 = FACE_CORNERS[face_id, 0]
+    axis_u, axis_v = FACE_AXES[face_id]
+
+    for corner in FACE_QUAD_CORNERS[face_id, int(flip_id)]:
+        du = CORNER_UV[corner, 0] * size_u
+        dv = CORNER_UV[corner, 1] * size_v
+        vx = x + x0 + (du if axis_u == 0 else 0) + (dv if axis_v == 0 else 0)
+        vy = y + y0 + (du if axis_u == 1 else 0)
+        vz = z + z0 + (du if axis_u == 2 else 0) + (dv if axis_v == 2 else 0)
+
+        vertex_data[index] = pack_data(vx, vy, vz, voxel_id, face_id, ao[corner], flip_id)
         index += 1
     return index
 
-def build_chunk_mesh(chunk_voxels, format_size, chunk_pos, world_voxels):
+
+@njit(nogil=True, cache=True)
+def build_chunk_mesh(padded_voxels, y_min=0, y_max=CHUNK_SIZE):
     """
-    Genera la malla del chunk. Por cada vértice se crea una tupla: (packed_data, (u, v)).
-    Se devuelve un array estructurado con dtype [('packed_data', uint32), ('in_uv', float32, (2,))]
+    Genera la malla de las capas [y_min, y_max) del chunk en un array uint32 preasignado,
+    un packed_data por vértice y 4 vértices por cara (se dibujan con QUAD_INDICES).
+    padded_voxels es la copia del chunk con borde que devuelve build_padded_voxels.
     """
-    vertices = []
-    # UV locales estándar para un cuadrado
-    uv0 = (0.0, 0.0)
-    uv1 = (1.0, 0.0)
-    uv2 = (1.0, 1.0)
-    uv3 = (0.0, 1.0)
-    
+    face_masks = np.zeros(CHUNK_VOL, dtype=np.uint8)
+    num_faces = get_visible_faces(padded_voxels, face_masks, y_min, y_max)
+
+    vertex_data = np.empty(num_faces * 4, dtype=np.uint32)
+    index = 0
+
     for x in range(CHUNK_SIZE):
-        for y in range(CHUNK_SIZE):
+        for y in range(y_min, y_max):
             for z in range(CHUNK_SIZE):
                 voxel_index = x + CHUNK_SIZE * z + CHUNK_AREA * y
-                voxel_id = chunk_voxels[voxel_index]
-                if voxel_id == 0:
+                mask = face_masks[voxel_index]
+                if not mask:
                     continue
-                cx, cy, cz = chunk_pos
-                wx = x + cx * CHUNK_SIZE
-                wy = y + cy * CHUNK_SIZE
-                wz = z + cz * CHUNK_SIZE
-                
-                # Top face (face_id = 0)
-                if is_void((x, y+1, z), (wx, wy+1, wz), world_voxels):
-                    ao = get_ao((x, y+1, z), (wx, wy+1, wz), world_voxels, 'Y')
-                    flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x, y+1, z, voxel_id, 0, ao[0], flip_id)
-                    v1 = pack_data(x+1, y+1, z, voxel_id, 0, ao[1], flip_id)
-                    v2 = pack_data(x+1, y+1, z+1, voxel_id, 0, ao[2], flip_id)
-                    v3 = pack_data(x, y+1, z+1, voxel_id, 0, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v1, uv1))
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v1, uv1))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                    else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v1, uv1))
-                
-                # Bottom face (face_id = 1)
-                if is_void((x, y-1, z), (wx, wy-1, wz), world_voxels):
-                    ao = get_ao((x, y-1, z), (wx, wy-1, wz), world_voxels, 'Y')
-                    flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x, y, z, voxel_id, 1, ao[0], flip_id)
-                    v1 = pack_data(x+1, y, z, voxel_id, 1, ao[1], flip_id)
-                    v2 = pack_data(x+1, y, z+1, voxel_id, 1, ao[2], flip_id)
-                    v3 = pack_data(x, y, z+1, voxel_id, 1, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v1, uv1))
-                        vertices.append((v3, uv3))
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
-                        vertices.append((v3, uv3))
-                    else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v3, uv3))
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
-                
-                # Right face (face_id = 2)
-                if is_void((x+1, y, z), (wx+1, wy, wz), world_voxels):
-                    ao = get_ao((x+1, y, z), (wx+1, wy, wz), world_voxels, 'X')
-                    flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x+1, y, z, voxel_id, 2, ao[0], flip_id)
-                    v1 = pack_data(x+1, y+1, z, voxel_id, 2, ao[1], flip_id)
-                    v2 = pack_data(x+1, y+1, z+1, voxel_id, 2, ao[2], flip_id)
-                    v3 = pack_data(x+1, y, z+1, voxel_id, 2, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v3, uv3))
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v3, uv3))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
-                    else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v3, uv3))
-                
-                # Left face (face_id = 3)
-                if is_void((x-1, y, z), (wx-1, wy, wz), world_voxels):
-                    ao = get_ao((x-1, y, z), (wx-1, wy, wz), world_voxels, 'X')
-                    flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x, y, z, voxel_id, 3, ao[0], flip_id)
-                    v1 = pack_data(x, y+1, z, voxel_id, 3, ao[1], flip_id)
-                    v2 = pack_data(x, y+1, z+1, voxel_id, 3, ao[2], flip_id)
-                    v3 = pack_data(x, y, z+1, voxel_id, 3, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v3, uv3))
-                        vertices.append((v1, uv1))
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                        vertices.append((v1, uv1))
-                    else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v1, uv1))
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                
-                # Back face (face_id = 4)
-                if is_void((x, y, z-1), (wx, wy, wz-1), world_voxels):
-                    ao = get_ao((x, y, z-1), (wx, wy, wz-1), world_voxels, 'Z')
+                voxel_id = padded_voxels[get_padded_index(x, y, z)]
+
+                for face_id in range(6):
+                    if not mask & (1 << face_id):
+                        continue
+                    nx, ny, nz = FACE_NORMALS[face_id]
+                    ao = get_face_ao(face_id, (x + nx, y + ny, z + nz), padded_voxels)
                     flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x, y, z, voxel_id, 4, ao[0], flip_id)
-                    v1 = pack_data(x, y+1, z, voxel_id, 4, ao[1], flip_id)
-                    v2 = pack_data(x+1, y+1, z, voxel_id, 4, ao[2], flip_id)
-                    v3 = pack_data(x+1, y, z, voxel_id, 4, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v3, uv3))
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v3, uv3))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
+                    index = add_quad(vertex_data, index, (x, y, z), 1, 1, voxel_id, face_id, ao, flip_id)
+    return vertex_data
+
+
+@njit(nogil=True, cache=True)
+def build_chunk_mesh_greedy(padded_voxels, y_min=0, y_max=CHUNK_SIZE):
+    """
+    Igual que build_chunk_mesh, pero une en un solo quad las caras coplanares contiguas
+    con el mismo voxel_id y la misma oclusión ambiental en sus 4 esquinas.
+    Las caras con AO no uniforme se emiten sin unir para no alterar el sombreado.
+    """
+    face_masks = np.zeros(CHUNK_VOL, dtype=np.uint8)
+    num_faces = get_visible_faces(padded_voxels, face_masks, y_min, y_max)
+
+    vertex_data = np.empty(num_faces * 4, dtype=np.uint32)
+    index = 0
+
+    # voxel bounds of the layers being meshed
+    lo = np.array((0, y_min, 0), dtype=np.int32)
+    hi = np.array((CHUNK_SIZE, y_max, CHUNK_SIZE), dtype=np.int32)
+
+    # merge key of every face in the current slice: voxel_id | (ao + 1) << 8, 0 if not mergeable
+    keys = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int32)
+    pos = np.zeros(3, dtype=np.int32)
+
+    for face_id in range(6):
+        axis_u, axis_v = FACE_AXES[face_id]
+        axis_n = 3 - axis_u - axis_v
+        nx, ny, nz = FACE_NORMALS[face_id]
+        bit = 1 << face_id
+
+        for n in range(lo[axis_n], hi[axis_n]):
+            pos[axis_n] = n
+
+            for v in range(lo[axis_v], hi[axis_v]):
+                pos[axis_v] = v
+                for u in range(lo[axis_u], hi[axis_u]):
+                    pos[axis_u] = u
+                    keys[v, u] = 0
+
+                    x, y, z = pos[0], pos[1], pos[2]
+                    voxel_index = x + CHUNK_SIZE * z + CHUNK_AREA * y
+                    if not face_masks[voxel_index] & bit:
+                        continue
+                    voxel_id = padded_voxels[get_padded_index(x, y, z)]
+
+                    ao = get_face_ao(face_id, (x + nx, y + ny, z + nz), padded_voxels)
+                    if ao[0] == ao[1] == ao[2] == ao[3]:
+                        keys[v, u] = voxel_id | (ao[0] + 1) << 8
                     else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v1, uv1))
-                        vertices.append((v2, uv2))
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v3, uv3))
-                
-                # Front face (face_id = 5)
-                if is_void((x, y, z+1), (wx, wy, wz+1), world_voxels):
-                    ao = get_ao((x, y, z+1), (wx, wy, wz+1), world_voxels, 'Z')
+                        flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
+                        index = add_quad(vertex_data, index, (x, y, z), 1, 1, voxel_id, face_id, ao, flip_id)
+
+            for v in range(lo[axis_v], hi[axis_v]):
+                for u in range(lo[axis_u], hi[axis_u]):
+                    key = keys[v, u]
+                    if not key:
+                        continue
+
+                    # grow along u, then along v while the whole row matches
+                    size_u = 1
+                    while u + size_u < hi[axis_u] and keys[v, u + size_u] == key:
+                        size_u += 1
+
+                    size_v = 1
+                    while v + size_v < hi[axis_v]:
+                        row_matches = True
+                        for i in range(size_u):
+                            if keys[v + size_v, u + i] != key:
+                                row_matches = False
+                                break
+                        if not row_matches:
+                            break
+                        size_v += 1
+
+                    for iv in range(size_v):
+                        for iu in range(size_u):
+                            keys[v + iv, u + iu] = 0
+
+                    pos[axis_u] = u
+                    pos[axis_v] = v
+                    ao_id = (key >> 8) - 1
+                    ao = (ao_id, ao_id, ao_id, ao_id)
+                    index = add_quad(vertex_data, index, (pos[0], pos[1], pos[2]),
+                                     size_u, size_v, key & 255, face_id, ao, False)
+    return vertex_data[:index]
+
+
+@njit(cache=True)
+def build_lod_voxels(padded_voxels, scale):
+    """
+    Copia de padded_voxels en la que cada bloque de scale^3 voxeles del chunk toma un solo valor:
+    sólido si lo es al menos la mitad, con el voxel_id del sólido más alto (el que se ve desde arriba).
+    Los bloques junto a las caras del chunk son sólidos si tienen algún voxel sólido, para que
+    no queden huecos con los vecinos de otro nivel. El borde de los vecinos se deja igual.
+    """
+    lod_voxels = padded_voxels.copy()
+    last = CHUNK_SIZE - scale
+    for by in range(0, CHUNK_SIZE, scale):
+        for bz in range(0, CHUNK_SIZE, scale):
+            for bx in range(0, CHUNK_SIZE, scale):
+                on_border = bx == 0 or by == 0 or bz == 0 or bx == last or by == last or bz == last
+                min_solid = 1 if on_border else scale * scale * scale // 2
+                num_solid = 0
+                voxel_id = 0
+                for y in range(by + scale - 1, by - 1, -1):
+                    for z in range(bz, bz + scale):
+                        for x in range(bx, bx + scale):
+                            block_voxel = padded_voxels[get_padded_index(x, y, z)]
+                            if block_voxel:
+                                num_solid += 1
+                                if not voxel_id:
+                                    voxel_id = block_voxel
+                if num_solid < min_solid:
+                    voxel_id = 0
+
+                for y in range(by, by + scale):
+                    for z in range(bz, bz + scale):
+                        row = get_padded_index(bx, y, z)
+                        lod_voxels[row:row + scale] = voxel_id
+    return lod_voxels
+
+
+@njit(cache=True)
+def get_block_neighbour(x, y, z, face_id, scale):
+    # voxel right in front of the face_id face of the scale^3 block at (x, y, z)
+    nx, ny, nz = FACE_NORMALS[face_id]
+    return (x + (scale if nx > 0 else nx),
+            y + (scale if ny > 0 else ny),
+            z + (scale if nz > 0 else nz))
+
+
+@njit(cache=True)
+def is_block_face_visible(lod_voxels, x, y, z, face_id, scale):
+    # any empty voxel in front of the face: inside the chunk the blocks are uniform,
+    # but the border of the neighbours is at full resolution
+    fx, fy, fz = get_block_neighbour(x, y, z, face_id, scale)
+    axis_u, axis_v = FACE_AXES[face_id]
+    for v in range(scale):
+        for u in range(scale):
+            ax = fx + (u if axis_u == 0 else 0) + (v if axis_v == 0 else 0)
+            ay = fy + (u if axis_u == 1 else 0)
+            az = fz + (u if axis_u == 2 else 0) + (v if axis_v == 2 else 0)
+            if is_void(lod_voxels, ax, ay, az):
+                return True
+    return False
+
+
+@njit(nogil=True, cache=True)
+def build_chunk_mesh_lod(padded_voxels, scale):
+    """
+    Malla de nivel de detalle: el chunk se trata como bloques de scale^3 voxeles (build_lod_voxels)
+    y cada cara visible de un bloque es un solo quad de scale x scale. Con scale=1 da la misma
+    malla que build_chunk_mesh. Las coordenadas siguen en voxeles, así que el formato no cambia.
+    """
+    lod_voxels = build_lod_voxels(padded_voxels, scale)
+    num_blocks = CHUNK_SIZE // scale
+    face_masks = np.zeros(num_blocks * num_blocks * num_blocks, dtype=np.uint8)
+    num_faces = 0
+    for y in range(0, CHUNK_SIZE, scale):
+        for z in range(0, CHUNK_SIZE, scale):
+            for x in range(0, CHUNK_SIZE, scale):
+                if is_void(lod_voxels, x, y, z):
+                    continue
+                mask = 0
+                for face_id in range(6):
+                    if is_block_face_visible(lod_voxels, x, y, z, face_id, scale):
+                        mask |= 1 << face_id
+                        num_faces += 1
+                face_masks[(x + num_blocks * z + num_blocks * num_blocks * y) // scale] = mask
+
+    vertex_data = np.empty(num_faces * 4, dtype=np.uint32)
+    index = 0
+    for y in range(0, CHUNK_SIZE, scale):
+        for z in range(0, CHUNK_SIZE, scale):
+            for x in range(0, CHUNK_SIZE, scale):
+                mask = face_masks[(x + num_blocks * z + num_blocks * num_blocks * y) // scale]
+                if not mask:
+                    continue
+                voxel_id = lod_voxels[get_padded_index(x, y, z)]
+
+                for face_id in range(6):
+                    if not mask & (1 << face_id):
+                        continue
+                    ao = get_face_ao(face_id, get_block_neighbour(x, y, z, face_id, scale), lod_voxels, scale)
                     flip_id = (ao[1] + ao[3]) > (ao[0] + ao[2])
-                    v0 = pack_data(x, y, z+1, voxel_id, 5, ao[0], flip_id)
-                    v1 = pack_data(x, y+1, z+1, voxel_id, 5, ao[1], flip_id)
-                    v2 = pack_data(x+1, y+1, z+1, voxel_id, 5, ao[2], flip_id)
-                    v3 = pack_data(x+1, y, z+1, voxel_id, 5, ao[3], flip_id)
-                    if flip_id:
-                        vertices.append((v3, uv3))
-                        vertices.append((v1, uv1))
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                        vertices.append((v1, uv1))
-                    else:
-                        vertices.append((v0, uv0))
-                        vertices.append((v2, uv2))
-                        vertices.append((v1, uv1))
-                        vertices.append((v0, uv0))
-                        vertices.append((v3, uv3))
-                        vertices.append((v2, uv2))
-                        
-    dtype = np.dtype([('packed_data', np.uint32), ('in_uv', np.float32, (2,))])
-    vertex_array = np.array(vertices, dtype=dtype)
-    return vertex_array
+                    # add_quad puts the faces on the positive side one voxel past pos, the block is scale voxels deep
+                    nx, ny, nz = FACE_NORMALS[face_id]
+                    pos = (x + (scale - 1) * max(nx, 0), y + (scale - 1) * max(ny, 0), z + (scale - 1) * max(nz, 0))
+                    index = add_quad(vertex_data, index, pos, scale, scale, voxel_id, face_id, ao, flip_id)
+    return vertex_data
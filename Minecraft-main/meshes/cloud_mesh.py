@@ -4,9 +4,11 @@ from noise import *
 
 
 class CloudMesh(BaseMesh):
-    def __init__(self, app):
+    def __init__(self, app, vertex_data=None):
         super().__init__()
         self.app = app
+        # the result of build_vertex_data if it was already made (in a startup thread)
+        self.vertex_data = vertex_data
 
         self.ctx = self.app.ctx
         self.program = self.app.shader_program.clouds
@@ -15,13 +17,20 @@ class CloudMesh(BaseMesh):
         self.vao = self.get_vao()
 
     def get_vertex_data(self):
+        if self.vertex_data is None:
+            return self.build_vertex_data()
+        return self.vertex_data
+
+    @classmethod
+    def build_vertex_data(cls):
+        # CPU only, it can run in another thread
         cloud_data = np.zeros(WORLD_AREA * CHUNK_SIZE ** 2, dtype='uint8')
-        self.gen_clouds(cloud_data)
+        cls.gen_clouds(cloud_data)
 
-        return self.build_mesh(cloud_data)
+        return cls.build_mesh(cloud_data)
 
     @staticmethod
-    @njit
+    @njit(nogil=True, cache=True)
     def gen_clouds(cloud_data):
         for x in range(WORLD_W * CHUNK_SIZE):
             for z in range(WORLD_D * CHUNK_SIZE):
@@ -31,7 +40,7 @@ class CloudMesh(BaseMesh):
                 cloud_data[x + WORLD_W * CHUNK_SIZE * z] = 1
 
     @staticmethod
-    @njit
+    @njit(nogil=True, cache=True)
     def build_mesh(cloud_data):
         mesh = np.empty(WORLD_AREA * CHUNK_AREA * 6 * 3, dtype='uint16')
         index = 0
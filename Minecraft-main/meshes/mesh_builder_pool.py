@@ -0,0 +1,110 @@
+from settings import *
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import queue
+import threading
+import time
+
+
+class MeshBuilderPool:
+    """
+    Genera las mallas de los chunks en hilos de fondo y las sube a la GPU desde el hilo principal.
+
+    Los constructores de mallas están compilados con nogil, así que los hilos trabajan en paralelo.
+    Los chunks pendientes se reparten por cercanía a la cámara y cada frame solo se dedican
+    MESH_UPLOAD_BUDGET_MS milisegundos a crear o actualizar los buffers de OpenGL.
+    """
+    def __init__(self, world, num_workers=MESH_WORKERS, upload_budget_ms=MESH_UPLOAD_BUDGET_MS):
+        self.world = world
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='mesh')
+        self.upload_budget = upload_budget_ms * 0.001
+        # keep the workers busy without committing to a build order too early
+        self.max_in_flight = 2 * num_workers
+
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.in_flight = 0
+        self.results = queue.SimpleQueue()
+
+    @property
+    def is_idle(self):
+        with self.lock:
+            return not self.pending and not self.in_flight and self.results.empty()
+
+    def request(self, chunk):
+        """
+        Pide una reconstrucción completa de la malla del chunk, en el nivel de detalle que tenga
+        al empezar a generarla. Se puede llamar desde cualquier hilo.
+        """
+        with self.lock:
+            self.pending.add(chunk)
+
+    def cancel(self, chunk):
+        with self.lock:
+            self.pending.discard(chunk)
+
+    def dispatch(self):
+        with self.lock:
+            free_workers = self.max_in_flight - self.in_flight
+            if free_workers <= 0 or not self.pending:
+                return
+            camera_pos = self.world.app.player.position
+            nearest = heapq.nsmallest(
+                free_workers, self.pending, key=lambda chunk: glm.distance(chunk.center, camera_pos)
+            )
+            self.pending.difference_update(nearest)
+            self.in_flight += len(nearest)
+
+        voxel_store = self.world.voxel_store
+        for chunk in nearest:
+            # the rows the build reads are not reused until it is over
+            generation = voxel_store.begin_read()
+            self.executor.submit(self.build, chunk, chunk.mesh.version, chunk.mesh.lod, voxel_store, generation)
+
+    def build(self, chunk, version, lod, voxel_store, generation):
+        try:
+            with self.world.app.profiler.scope('mesh.build'):
+                data, connectivity = chunk.mesh.build(lod)
+        except Exception as e:
+            print(f'[MeshBuilderPool] Error generando la malla del chunk {chunk.position}: {e}')
+            data = connectivity = None
+        finally:
+            voxel_store.end_read(generation)
+        self.results.put((chunk, version, lod, data, connectivity))
+
+    def upload_finished(self):
+        deadline = time.perf_counter() + self.upload_budget
+        while time.perf_counter() < deadline:
+            try:
+                chunk, version, lod, data, connectivity = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.in_flight -= 1
+
+            # skip failed builds and chunks unloaded while the worker was busy
+            if data is None or self.world.chunks[chunk.slot] is not chunk:
+                continue
+            # the chunk was edited while the worker was busy: build it again from the new voxels
+            if version != chunk.mesh.version:
+                self.request(chunk)
+                continue
+            chunk.mesh.set_mesh(lod, data, connectivity)
+
+    def update(self):
+        with self.world.app.profiler.scope('mesh.upload'):
+            self.upload_finished()
+        # the rows freed before the builds that just finished can be used again
+        self.world.voxel_store.recycle()
+        self.dispatch()
+
+    def wait(self):
+        """Bloquea hasta que no queden mallas pendientes (útil para benchmarks)."""
+        while not self.is_idle:
+            self.update()
+            time.sleep(0.001)
+
+    def shutdown(self):
+        with self.lock:
+            self.pending.clear()
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -1,18 +1,28 @@
-import pickle
+import collections
 import threading
 import time
 import numpy as np
+from settings import CHUNK_AREA, CHUNK_VOL, STORE_VOL, WORLD_H, JOIN_BYTES_PER_TICK
+from protocol import (
+    StreamDecoder, compress_chunk, encode_ack, encode_chunk_data, encode_chunks, encode_join, encode_voxel_edits,
+    encode_voxel_update, MSG_ACK, MSG_CHUNK_DATA, MSG_CHUNKS, MSG_JOIN, MSG_VOXEL_EDITS, MSG_VOXEL_UPDATE,
+    MSG_WORLD_UPDATE, RECV_SIZE
+)
 
 class NetworkManager:
     """
     Clase para gestionar la sincronización del estado del mundo entre el servidor y los clientes.
     
     En modo servidor, se encarga de recibir actualizaciones locales (por ejemplo, cambios en los voxeles)
-    y reenvía los cambios a todos los clientes conectados.
+    y reenvía los cambios a todos los clientes conectados: al unirse, los chunks del mundo comprimidos y empezando
+    por los más cercanos al cliente, y después, en cada send_updates, solo lo que ha cambiado desde la última
+    versión que ha confirmado cada uno.
     
-    En modo cliente, se conecta al servidor y recibe actualizaciones para aplicarlas a la instancia local del World.
+    En modo cliente, se conecta al servidor y recibe actualizaciones para aplicarlas a la instancia local del World,
+    confirmando al servidor la versión del mundo de cada una. Lo recibido se aplica y se malla en update, desde el
+    hilo principal.
     """
-    def __init__(self, is_server, sock, world, connections=None):
+    def __init__(self, is_server, sock, world, connections=None, lock=None):
         """
         Los parametros que estamos recibiendo en el init son:
         :param is_server: True si la instancia es del lado del servidor.
@@ -21,11 +31,26 @@ class NetworkManager:
             - En modo servidor, se puede pasar un socket "dummy" (no se usa para enviar, se usará la lista de conexiones).
         :param world: Instancia del mundo (World) que se va a sincronizar.
         :param connections: En modo servidor, una lista de sockets de clientes a los que se enviarán actualizaciones.
+        :param lock: En modo servidor, el lock con el que se envía a los clientes, compartido con quien más les envíe
+            (los mensajes de dos hilos no deben mezclarse en un socket).
         """
         self.is_server = is_server
         self.sock = sock
         self.world = world
         self.connections = connections if connections is not None else []
+        self.lock = lock or threading.Lock()
+        # socket of every client -> [last world version it has acknowledged, last version sent to it];
+        # None until it has been sent the whole world
+        self.client_versions = {}
+        # socket of every joining client -> (world version of the join, slots still to send, nearest first)
+        self.joins = {}
+        # slot -> (chunk version and position, compressed voxels) of the chunks sent on join
+        self.compressed_chunks = {}
+        # in the client, the chunks received of every column during the join and the columns meshed since
+        self.join_columns = collections.Counter()
+        self.join_meshed_columns = set()
+        # messages received by the network threads, applied by update in the thread that owns the world
+        self.inbox = collections.deque()
         self.running = True
 
         # Iniciar el hilo de recepción de mensajes
@@ -34,12 +59,14 @@ class NetworkManager:
 
     def receive_loop(self):
         """Bucle que recibe mensajes del socket y los procesa."""
+        # a recv can bring part of a message or several of them
+        decoder = StreamDecoder()
         while self.running:
             try:
-                data = self.sock.recv(4096)
+                data = self.sock.recv(RECV_SIZE)
                 if data:
-                    message = pickle.loads(data)
-                    self.process_message(message)
+                    for msg_type, message in decoder.feed(data):
+                        self.process_message(msg_type, message)
                 else:
                     time.sleep(0.01)
             except Exception as e:
@@ -47,43 +74,259 @@ class NetworkManager:
                 print(f"[NetworkManager] Error recibiendo datos: {e}")
                 break
 
-    def process_message(self, message):
+    def process_message(self, msg_type, message):
         """
-        Procesa el mensaje recibido.
-        Se esperan mensajes con la siguiente estructura:
-            {"type": "world_update", "data": <matriz_voxeles>}
-            {"type": "voxel_update", "data": (chunk_index, voxel_index, new_voxel_id)}
+        Guarda un mensaje recibido para aplicarlo en update: los hilos de red no tocan los voxeles ni las
+        mallas, que se usan a la vez en el hilo principal (y las mallas solo pueden subirse desde él).
         """
-        msg_type = message.get("type")
-        if msg_type == "world_update":
-            new_voxels = message.get("data")
-            # Se espera que new_voxels sea un arreglo de NumPy con la misma forma que self.world.voxels
-            if new_voxels.shape == self.world.voxels.shape:
-                self.world.voxels[:] = new_voxels[:]
+        self.inbox.append((msg_type, message))
+
+    def update(self):
+        """
+        Aplica los mensajes recibidos desde la última llamada. Se llama desde el hilo dueño del mundo:
+        World.update en el juego, el tick del servidor en el servidor dedicado.
+        """
+        while self.inbox:
+            self.apply_message(*self.inbox.popleft())
+
+    def apply_message(self, msg_type, message):
+        """
+        Aplica un mensaje recibido, ya decodificado por protocol.StreamDecoder:
+            MSG_WORLD_UPDATE: (version, <matriz_voxeles>)
+            MSG_VOXEL_EDITS: (version, chunk_indices, voxel_indices, voxel_ids)
+            MSG_CHUNKS: (version, chunk_indices, <voxeles de los chunks>)
+            MSG_CHUNK_DATA: (version, chunk_index, chunks que faltan, <voxeles del chunk>)
+            MSG_VOXEL_UPDATE: (chunk_index, voxel_index, new_voxel_id)
+        Los cuatro primeros llegan del servidor y se confirman con su versión; los chunks de la unión
+        al servidor (MSG_CHUNK_DATA), al llegar el último.
+        """
+        if msg_type == MSG_WORLD_UPDATE:
+            version, new_voxels = message
+            # Se espera un arreglo de NumPy con los voxeles descomprimidos de todos los slots del mundo
+            if new_voxels.shape == (STORE_VOL, CHUNK_VOL):
+                self.world.voxel_store.set_chunks(range(STORE_VOL), new_voxels)
+                with self.world.edit_lock:
+                    self.world.modified_chunks.update(chunk for chunk in self.world.chunks if chunk)
                 self.world.build_chunk_mesh()  # Reconstruir mallas para reflejar la actualización
                 print("[NetworkManager] Actualización completa del mundo aplicada.")
+                self.send(encode_ack(version))
             else:
                 print("[NetworkManager] La forma de los datos del mundo no coincide.")
-        elif msg_type == "voxel_update":
+        elif msg_type == MSG_VOXEL_EDITS:
+            version, chunk_indices, voxel_indices, voxel_ids = message
+            self.apply_voxel_edits(chunk_indices.tolist(), voxel_indices.tolist(), voxel_ids.tolist())
+            self.send(encode_ack(version))
+        elif msg_type == MSG_CHUNKS:
+            version, chunk_indices, voxels = message
+            self.apply_chunks(chunk_indices.tolist(), voxels)
+            self.send(encode_ack(version))
+        elif msg_type == MSG_CHUNK_DATA:
+            version, chunk_index, remaining, voxels = message
+            self.apply_join_chunk(chunk_index, voxels)
+            if not remaining:
+                print("[NetworkManager] Mundo del servidor recibido.")
+                self.send(encode_ack(version))
+        elif msg_type == MSG_VOXEL_UPDATE:
             # Se espera un update individual: (chunk_index, voxel_index, new_voxel_id)
-            voxel_data = message.get("data")
+            voxel_data = message
             if voxel_data:
                 chunk_index, voxel_index, new_voxel_id = voxel_data
-                self.world.voxels[chunk_index][voxel_index] = new_voxel_id
-                self.world.chunks[chunk_index].mesh.rebuild()
+                # the chunk may have been unloaded since the edit was accepted
+                if not self.is_valid_edit(chunk_index, voxel_index):
+                    return
+                self.apply_voxel_edits([chunk_index], [voxel_index], [new_voxel_id])
                 print("[NetworkManager] Actualización individual de voxel aplicada.")
         # Aquí se pueden agregar más tipos de mensajes según se requiera.
 
-    def send_world_update(self):
+    def apply_voxel_edits(self, chunk_indices, voxel_indices, voxel_ids):
+        # layers edited in every chunk
+        layers = {}
+        for chunk_index, voxel_index, voxel_id in zip(chunk_indices, voxel_indices, voxel_ids):
+            self.world.voxel_store.set_voxel(chunk_index, voxel_index, voxel_id)
+            chunk = self.world.chunks[chunk_index]
+            # a slot streamed out, or not loaded yet: nothing to mark or mesh
+            if chunk is None:
+                continue
+            self.world.mark_modified(chunk, voxel_index)
+            ly = voxel_index // CHUNK_AREA
+            y_min, y_max = layers.get(chunk_index, (ly, ly))
+            layers[chunk_index] = min(y_min, ly), max(y_max, ly)
+        # solo se regeneran las capas alrededor de los voxeles modificados
+        for chunk_index, (y_min, y_max) in layers.items():
+            chunk = self.world.chunks[chunk_index]
+            chunk.is_empty = self.world.voxel_store.is_empty(chunk_index)
+            if chunk.mesh:
+                chunk.mesh.rebuild_layers(y_min - 1, y_max + 2)
+
+    def apply_chunks(self, chunk_indices, voxels):
+        self.world.voxel_store.set_chunks(chunk_indices, voxels)
+        to_mesh = set()
+        for chunk_index in chunk_indices:
+            chunk = self.world.chunks[chunk_index]
+            if chunk is None:
+                continue
+            self.world.mark_modified(chunk)
+            cx, cy, cz = chunk.position
+            # the faces on the borders of the neighbours depend on this chunk too
+            for position in ((cx, cy, cz), (cx - 1, cy, cz), (cx + 1, cy, cz), (cx, cy - 1, cz),
+                             (cx, cy + 1, cz), (cx, cy, cz - 1), (cx, cy, cz + 1)):
+                neighbour = self.world.get_chunk(*position)
+                if neighbour:
+                    to_mesh.add(neighbour)
+        # the mesh pool builds the nearest first
+        for chunk in to_mesh:
+            self.world.request_chunk_mesh(chunk)
+
+    def apply_join_chunk(self, chunk_index, voxels):
+        self.world.voxel_store.set_chunks([chunk_index], voxels[np.newaxis])
+        chunk = self.world.chunks[chunk_index]
+        if chunk is None:
+            return
+        self.world.mark_modified(chunk)
+        cx, _, cz = chunk.position
+        self.join_columns[cx, cz] += 1
+        # like World.request_column_meshes: a column is meshed once it and its neighbours are here,
+        # so every chunk is meshed only once
+        for column in ((cx, cz), (cx - 1, cz), (cx + 1, cz), (cx, cz - 1), (cx, cz + 1)):
+            if column in self.join_meshed_columns or not self.is_column_received(*column):
+                continue
+            self.join_meshed_columns.add(column)
+            for cy in range(WORLD_H):
+                column_chunk = self.world.get_chunk(column[0], cy, column[1])
+                if column_chunk:
+                    self.world.request_chunk_mesh(column_chunk)
+
+    def is_column_received(self, cx, cz):
+        # the columns the client has not loaded are never sent
+        return self.join_columns[cx, cz] == WORLD_H and all(
+            not self.world.is_column_loaded(nx, nz) or self.join_columns[nx, nz] == WORLD_H
+            for nx, nz in ((cx - 1, cz), (cx + 1, cz), (cx, cz - 1), (cx, cz + 1))
+        )
+
+    def join(self, position):
+        """En el cliente, pide al servidor el mundo, empezando por los chunks más cercanos a position."""
+        self.join_columns.clear()
+        self.join_meshed_columns.clear()
+        self.send(encode_join(position.x, position.z))
+
+    def process_client_message(self, conn, msg_type, message):
+        """
+        En el servidor, procesa un mensaje recibido del cliente conectado en conn. Un cliente solo puede
+        confirmar versiones, unirse y editar voxeles de chunks cargados: el mundo lo manda el servidor.
+        """
+        if msg_type == MSG_ACK:
+            self.acknowledge(conn, message)
+        elif msg_type == MSG_JOIN:
+            self.join_client(conn, *message)
+        elif msg_type == MSG_VOXEL_UPDATE and self.is_valid_edit(*message[:2]):
+            self.process_message(msg_type, message)
+        else:
+            print(f"[NetworkManager] Mensaje de tipo {msg_type} de un cliente descartado.")
+
+    def is_valid_edit(self, chunk_index, voxel_index):
+        return 0 <= chunk_index < STORE_VOL and 0 <= voxel_index < CHUNK_VOL and self.world.chunks[chunk_index] is not None
+
+    def add_client(self, conn):
+        # it gets the world once it asks to join
+        with self.lock:
+            self.client_versions[conn] = [None, None]
+
+    def remove_client(self, conn):
+        with self.lock:
+            self.client_versions.pop(conn, None)
+            self.joins.pop(conn, None)
+
+    def join_client(self, conn, x, z):
+        """Empieza a enviar el mundo al cliente de conn, los chunks más cercanos a (x, z) primero."""
+        centers = self.world.chunk_centers
+        slots = np.flatnonzero(~np.isnan(centers[:, 0]))
+        distances = np.hypot(centers[slots, 0] - x, centers[slots, 2] - z)
+        # the chunks of a column go together, from the bottom
+        slots = slots[np.argsort(distances, kind='stable')]
+        version = self.world.version
+        with self.lock:
+            if conn in self.client_versions:
+                self.joins[conn] = version, collections.deque(slots.tolist())
+
+    def acknowledge(self, conn, version):
+        with self.lock:
+            versions = self.client_versions.get(conn)
+            if versions and versions[0] is not None:
+                versions[0] = max(versions[0], version)
+
+    def send_updates(self):
         """
-        Envía una actualización completa del estado del mundo.
-        Este método se usará en el servidor para enviar la matriz de voxeles a todos los clientes.
+        Envía a cada cliente lo que necesita para ponerse al día: la siguiente parte de los chunks del mundo si
+        se está uniendo o, si el mundo ha cambiado desde lo último que se le envió, los cambios desde la versión
+        que ha confirmado.
+        Lo enviado sin confirmar se repite, así que un cliente con el mundo al día no recibe nada.
         """
-        message = {
-            "type": "world_update",
-            "data": self.world.voxels,
-        }
-        self.send(message)
+        # clients at the same version get the same message
+        messages = {}
+        with self.lock:
+            clients = list(self.client_versions.items())
+        for conn, versions in clients:
+            acked, sent = versions
+            if acked is None:
+                self.send_join_chunks(conn, versions)
+                continue
+            if self.world.version == sent:
+                continue
+            if acked not in messages:
+                messages[acked] = self.encode_changes(acked)
+            version, data = messages[acked]
+            self.send_to(conn, data)
+            with self.lock:
+                versions[1] = version
+
+    def send_join_chunks(self, conn, versions):
+        # the next JOIN_BYTES_PER_TICK bytes of chunks of a joining client
+        with self.lock:
+            join = self.joins.get(conn)
+        if join is None:
+            return
+        version, slots = join
+        num_bytes = 0
+        while slots and num_bytes < JOIN_BYTES_PER_TICK:
+            slot = slots.popleft()
+            data = encode_chunk_data(version, slot, len(slots), self.get_compressed_chunk(slot))
+            if not self.send_to(conn, data):
+                return
+            num_bytes += len(data)
+        if not slots:
+            with self.lock:
+                self.joins.pop(conn, None)
+                # the chunks count as acknowledged, TCP delivers them before anything sent later;
+                # the edits made during the join go in the next updates
+                versions[0] = versions[1] = version
+
+    def get_compressed_chunk(self, slot):
+        # a chunk is compressed once per version, however many clients join
+        key = int(self.world.chunk_versions[slot]), tuple(self.world.slot_coords[slot])
+        cached = self.compressed_chunks.get(slot)
+        if cached is None or cached[0] != key:
+            # the key is read before the voxels: an edit made meanwhile is also sent in the next updates
+            with self.world.voxel_store.reading():
+                cached = key, compress_chunk(self.world.voxel_store.get_chunk(slot))
+            self.compressed_chunks[slot] = cached
+        return cached[1]
+
+    def encode_changes(self, version):
+        """(versión actual, mensaje con los cambios del mundo desde version)."""
+        current, edits, slots = self.world.get_changes(version)
+        voxel_store = self.world.voxel_store
+        if edits is None:
+            with voxel_store.reading():
+                return current, encode_chunks(current, slots, voxel_store.get_chunks(slots))
+        # the current id of every edited voxel, each voxel once
+        keys = np.unique(np.array(edits, dtype='int64').reshape(-1, 2) @ np.array([CHUNK_VOL, 1]))
+        chunk_indices, voxel_indices = np.divmod(keys, CHUNK_VOL)
+        with voxel_store.reading():
+            voxel_ids = [
+                voxel_store.get_voxel(slot, voxel_index)
+                for slot, voxel_index in zip(chunk_indices.tolist(), voxel_indices.tolist())
+            ]
+        return current, encode_voxel_edits(current, chunk_indices, voxel_indices, voxel_ids)
 
     def send_voxel_update(self, chunk_index, voxel_index, new_voxel_id):
         """
@@ -93,22 +336,23 @@ class NetworkManager:
         :param voxel_index: Índice del voxel dentro del chunk.
         :param new_voxel_id: Nuevo valor del voxel.
         """
-        message = {
-            "type": "voxel_update",
-            "data": (chunk_index, voxel_index, new_voxel_id),
-        }
-        self.send(message)
-
-    def send(self, message):
-        """Serializa y envía el mensaje según el modo."""
-        data = pickle.dumps(message)
+        self.send(encode_voxel_update(chunk_index, voxel_index, new_voxel_id))
+
+    def send_to(self, conn, data):
+        try:
+            with self.lock:
+                conn.sendall(data)
+            return True
+        except Exception as e:
+            print(f"[NetworkManager] Error enviando datos a un cliente: {e}")
+            return False
+
+    def send(self, data):
+        """Envía un mensaje ya codificado (ver protocol.py) según el modo."""
         if self.is_server:
             # En el servidor, se hace broadcast a todas las conexiones
-            for conn in self.connections:
-                try:
-                    conn.sendall(data)
-                except Exception as e:
-                    print(f"[NetworkManager] Error enviando datos a un cliente: {e}")
+            for conn in list(self.connections):
+                self.send_to(conn, data)
         else:
             # En modo cliente, se envía al servidor
             try:
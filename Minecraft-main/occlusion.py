@@ -0,0 +1,120 @@
+from settings import *
+from meshes.chunk_mesh_builder import FACE_NORMALS
+
+# connectivity of a chunk: one byte per face (same order as FACE_NORMALS) with a bit for every face
+# it reaches through air inside the chunk
+ALL_FACES = (1 << 6) - 1
+ALL_CONNECTED = np.full(6, ALL_FACES, dtype=np.uint8)
+
+
+@njit(cache=True)
+def get_border_faces(x, y, z):
+    faces = 0
+    if y == CHUNK_SIZE - 1:
+        faces |= 1 << 0
+    if y == 0:
+        faces |= 1 << 1
+    if x == CHUNK_SIZE - 1:
+        faces |= 1 << 2
+    if x == 0:
+        faces |= 1 << 3
+    if z == 0:
+        faces |= 1 << 4
+    if z == CHUNK_SIZE - 1:
+        faces |= 1 << 5
+    return faces
+
+
+@njit(nogil=True, cache=True)
+def get_face_connectivity(voxels):
+    """
+    Rellena cada región de aire del chunk y anota qué caras del chunk toca: todas las caras de
+    una misma región quedan conectadas entre sí. Devuelve 6 bytes, ver ALL_CONNECTED.
+    """
+    connectivity = np.zeros(6, dtype=np.uint8)
+    visited = np.zeros(CHUNK_VOL, dtype=np.bool_)
+    stack = np.empty(CHUNK_VOL, dtype=np.int32)
+
+    for start in range(CHUNK_VOL):
+        if voxels[start] or visited[start]:
+            continue
+        visited[start] = True
+        stack[0] = start
+        size = 1
+        faces = 0
+        # a region that touches every face connects all of them, the other regions do not matter
+        while size and faces != ALL_FACES:
+            size -= 1
+            index = stack[size]
+            x, z, y = index % CHUNK_SIZE, (index // CHUNK_SIZE) % CHUNK_SIZE, index // CHUNK_AREA
+            faces |= get_border_faces(x, y, z)
+
+            for face_id in range(6):
+                nx, ny, nz = FACE_NORMALS[face_id]
+                ax, ay, az = x + nx, y + ny, z + nz
+                if not (0 <= ax < CHUNK_SIZE and 0 <= ay < CHUNK_SIZE and 0 <= az < CHUNK_SIZE):
+                    continue
+                neighbour = ax + CHUNK_SIZE * az + CHUNK_AREA * ay
+                if not voxels[neighbour] and not visited[neighbour]:
+                    visited[neighbour] = True
+                    stack[size] = neighbour
+                    size += 1
+
+        for face_id in range(6):
+            if faces & (1 << face_id):
+                connectivity[face_id] |= faces
+        if faces == ALL_FACES:
+            break
+    return connectivity
+
+
+@njit(cache=True)
+def get_reachable_chunks(visible, camera_chunk, slot_coords, connectivity):
+    """
+    Cave culling: recorre los chunks desde el de la cámara, pasando de un chunk a su vecino solo
+    si la cara por la que se entró al chunk conecta por aire con la de salida, sin volver nunca
+    en una dirección opuesta a una ya tomada y solo por chunks dentro del frustum (visible).
+    Devuelve la máscara de los chunks alcanzados, o visible si la cámara está fuera de los chunks cargados.
+    """
+    cx, cy, cz = camera_chunk
+    start = cx % STORE_W + STORE_W * (cz % STORE_D) + STORE_AREA * cy
+    if not (0 <= cy < WORLD_H) or slot_coords[start, 0] != cx or slot_coords[start, 2] != cz:
+        return visible
+
+    reachable = np.zeros(len(visible), dtype=np.bool_)
+    reachable[start] = True
+    # every slot enters the queue once, with its chunk position, the face it was entered by
+    # and the directions taken to reach it
+    queue = np.empty((len(visible), 3), dtype=np.int64)
+    entry_faces = np.empty(len(visible), dtype=np.int64)
+    directions = np.empty(len(visible), dtype=np.int64)
+    queue[0, 0], queue[0, 1], queue[0, 2] = cx, cy, cz
+    entry_faces[0] = -1
+    directions[0] = 0
+    head, tail = 0, 1
+
+    while head < tail:
+        x, y, z = queue[head]
+        slot = x % STORE_W + STORE_W * (z % STORE_D) + STORE_AREA * y
+        entry_face, taken = entry_faces[head], directions[head]
+        head += 1
+
+        for face_id in range(6):
+            # never go back the way we came: the opposite of face_id is face_id ^ 1
+            if taken & (1 << (face_id ^ 1)):
+                continue
+            if entry_face >= 0 and not connectivity[slot, entry_face] & (1 << face_id):
+                continue
+            nx, ny, nz = x + FACE_NORMALS[face_id, 0], y + FACE_NORMALS[face_id, 1], z + FACE_NORMALS[face_id, 2]
+            if not (0 <= ny < WORLD_H):
+                continue
+            neighbour = nx % STORE_W + STORE_W * (nz % STORE_D) + STORE_AREA * ny
+            if (reachable[neighbour] or not visible[neighbour]
+                    or slot_coords[neighbour, 0] != nx or slot_coords[neighbour, 2] != nz):
+                continue
+            reachable[neighbour] = True
+            queue[tail, 0], queue[tail, 1], queue[tail, 2] = nx, ny, nz
+            entry_faces[tail] = face_id ^ 1
+            directions[tail] = taken | (1 << face_id)
+            tail += 1
+    return reachable
@@ -0,0 +1,256 @@
+from settings import *
+import moderngl as mgl
+import pygame as pg
+import collections
+import contextlib
+import csv
+import json
+import threading
+import time
+
+# frame time histogram bins in ms, 16.7 and 33.3 are 60 and 30 fps
+HISTOGRAM_EDGES = (0, 8, 12, 16.7, 20, 25, 33.3, 50, 100, np.inf)
+# a GPU timer is read this many frames after it was issued, when the GPU is usually done with it
+GPU_QUERY_LATENCY = 2
+# what a scope returns while the profiler is off
+NULL_SCOPE = contextlib.nullcontext()
+
+OVERLAY_TEXTURE_UNIT = 4
+OVERLAY_FONT_SIZE = 16
+OVERLAY_REFRESH = 0.25  # seconds between overlay redraws
+
+
+class Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class GpuScope:
+    __slots__ = ('profiler', 'name', 'query')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.query = profiler.get_query()
+
+    def __enter__(self):
+        self.query.__enter__()
+
+    def __exit__(self, *args):
+        self.query.__exit__(*args)
+        self.profiler.pending_queries.append((self.profiler.num_frames, self.profiler.current, self.name, self.query))
+
+
+class Profiler:
+    """
+    Tiempos por frame de cada parte del motor.
+
+    scope(name) mide el tiempo de CPU de un bloque (se puede anidar y llamar desde cualquier hilo; los
+    tiempos de un mismo nombre en un frame se suman) y gpu_scope(name) el de la GPU con un timer query
+    de OpenGL (no se pueden anidar). end_frame() cierra cada frame: guarda sus tiempos en un historial
+    de PROFILER_HISTORY frames y lo marca como tirón si tarda PROFILER_STUTTER_FACTOR veces la mediana
+    del historial. Apagado, cada scope solo cuesta una llamada que devuelve NULL_SCOPE.
+    """
+    def __init__(self, ctx, enabled=PROFILER_ENABLED, history=PROFILER_HISTORY):
+        self.ctx = ctx
+        self.enabled = enabled
+        self.show_overlay = False
+        self.overlay = None
+
+        # one record per frame: {'frame', 'frame_ms', 'cpu': {name: ms}, 'gpu': {name: ms}}
+        self.frames = collections.deque(maxlen=history)
+        # ring buffer with the frame_ms of the same frames, for the median
+        self.frame_times = np.zeros(history)
+        self.num_measured = 0
+        self.stutters = collections.deque(maxlen=history)
+        self.num_frames = 0
+        self.frame_start = None
+        self.lock = threading.Lock()
+        self.current = self.new_frame()
+
+        self.free_queries = []
+        self.pending_queries = collections.deque()
+
+    def new_frame(self):
+        return {'frame': self.num_frames, 'frame_ms': 0.0, 'cpu': {}, 'gpu': {}}
+
+    def toggle(self):
+        self.enabled = self.show_overlay = not self.enabled
+        self.frame_start = None
+
+    def scope(self, name):
+        return Scope(self, name) if self.enabled else NULL_SCOPE
+
+    def gpu_scope(self, name):
+        return GpuScope(self, name) if self.enabled else NULL_SCOPE
+
+    def record(self, name, ms):
+        with self.lock:
+            cpu = self.current['cpu']
+            cpu[name] = cpu.get(name, 0.0) + ms
+
+    def get_query(self):
+        return self.free_queries.pop() if self.free_queries else self.ctx.query(time=True)
+
+    def read_queries(self, latency=GPU_QUERY_LATENCY):
+        while self.pending_queries and self.pending_queries[0][0] <= self.num_frames - latency:
+            _, frame, name, query = self.pending_queries.popleft()
+            # nanoseconds
+            frame['gpu'][name] = frame['gpu'].get(name, 0.0) + query.elapsed * 1e-6
+            self.free_queries.append(query)
+
+    def end_frame(self):
+        """Cierra las medidas del frame y empieza las del siguiente. Se llama una vez por frame."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            frame_ms = self.current['frame_ms'] = (now - self.frame_start) * 1000
+            self.check_stutter(self.current)
+            self.frame_times[self.num_measured % len(self.frame_times)] = frame_ms
+            self.num_measured += 1
+            self.frames.append(self.current)
+        self.frame_start = now
+
+        self.num_frames += 1
+        with self.lock:
+            self.current = self.new_frame()
+        self.read_queries()
+
+    def check_stutter(self, frame):
+        if len(self.frames) < 10:
+            return
+        median = np.median(self.frame_times[:len(self.frames)])
+        if frame['frame_ms'] > max(PROFILER_STUTTER_FACTOR * median, PROFILER_STUTTER_MIN_MS):
+            self.stutters.append(frame)
+
+    def get_summary(self):
+        """Media de cada scope, percentiles del frame, histograma y número de tirones del historial."""
+        frames = list(self.frames)
+        if not frames:
+            return {}
+        frame_ms = np.array([frame['frame_ms'] for frame in frames])
+        summary = {
+            'frames': len(frames),
+            'fps': 1000 / frame_ms.mean(),
+            'frame_ms': {
+                'mean': frame_ms.mean(), 'p50': np.percentile(frame_ms, 50),
+                'p99': np.percentile(frame_ms, 99), 'max': frame_ms.max(),
+            },
+            'histogram': {
+                'edges_ms': list(HISTOGRAM_EDGES[:-1]),
+                'counts': np.histogram(frame_ms, bins=HISTOGRAM_EDGES)[0].tolist(),
+            },
+            'stutters': len(self.stutters),
+        }
+        for kind in ('cpu', 'gpu'):
+            names = sorted({name for frame in frames for name in frame[kind]})
+            summary[kind] = {name: sum(frame[kind].get(name, 0.0) for frame in frames) / len(frames) for name in names}
+        return summary
+
+    def export(self, directory=PROFILER_DIR):
+        """Guarda el resumen y los frames en JSON y una fila por frame en CSV. Devuelve las dos rutas."""
+        self.read_queries(latency=0)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, time.strftime('profile_%Y%m%d_%H%M%S'))
+
+        with open(base + '.json', 'w') as file:
+            json.dump({
+                'summary': self.get_summary(),
+                'frames': list(self.frames),
+                'stutters': [frame['frame'] for frame in self.stutters],
+            }, file, indent=1, default=float)
+
+        cpu_names = sorted({name for frame in self.frames for name in frame['cpu']})
+        gpu_names = sorted({name for frame in self.frames for name in frame['gpu']})
+        with open(base + '.csv', 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'frame_ms'] + [f'cpu.{name}' for name in cpu_names]
+                            + [f'gpu.{name}' for name in gpu_names])
+            for frame in self.frames:
+                writer.writerow([frame['frame'], frame['frame_ms']]
+                                + [frame['cpu'].get(name, 0.0) for name in cpu_names]
+                                + [frame['gpu'].get(name, 0.0) for name in gpu_names])
+        print(f'[Profiler] Guardado en {base}.json y {base}.csv')
+        return base + '.json', base + '.csv'
+
+    def render_overlay(self, app):
+        if not self.show_overlay:
+            return
+        if self.overlay is None:
+            self.overlay = ProfilerOverlay(app, self)
+        self.overlay.render()
+
+
+class ProfilerOverlay:
+    """Texto con el resumen del profiler en la esquina superior izquierda, redibujado cada OVERLAY_REFRESH s."""
+    def __init__(self, app, profiler):
+        self.ctx = app.ctx
+        self.profiler = profiler
+        self.program = app.shader_program.overlay
+        self.program['u_texture'] = OVERLAY_TEXTURE_UNIT
+        self.font = pg.font.SysFont('monospace', OVERLAY_FONT_SIZE)
+
+        # unit quad drawn as a triangle strip, placed on screen by u_rect
+        corners = np.array([(0, 0), (1, 0), (0, 1), (1, 1)], dtype='f4')
+        self.vbo = self.ctx.buffer(corners)
+        self.vao = self.ctx.vertex_array(self.program, [(self.vbo, '2f', 'in_corner')])
+        self.texture = None
+        self.last_refresh = -np.inf
+
+    def get_lines(self):
+        summary = self.profiler.get_summary()
+        if not summary:
+            return ['profiler: midiendo...']
+        frame_ms = summary['frame_ms']
+        lines = [
+            f"{summary['fps']:.0f} fps   frame {frame_ms['mean']:.1f} ms   p99 {frame_ms['p99']:.1f}   "
+            f"máx {frame_ms['max']:.1f}   tirones {summary['stutters']}",
+        ]
+        lines += [f'cpu {name:<16} {ms:6.2f} ms' for name, ms in summary['cpu'].items()]
+        lines += [f'gpu {name:<16} {ms:6.2f} ms' for name, ms in summary['gpu'].items()]
+        counts = summary['histogram']['counts']
+        max_count = max(counts) or 1
+        for edge, count in zip(summary['histogram']['edges_ms'], counts):
+            lines.append(f'>{edge:5.1f} ms {"#" * round(20 * count / max_count):<20} {count}')
+        return lines
+
+    def refresh(self):
+        lines = [self.font.render(line, True, (255, 255, 255)) for line in self.get_lines()]
+        line_height = self.font.get_linesize()
+        surface = pg.Surface((max(line.get_width() for line in lines) + 8, line_height * len(lines) + 8), pg.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        for i, line in enumerate(lines):
+            surface.blit(line, (4, 4 + i * line_height))
+
+        if self.texture is None or self.texture.size != surface.get_size():
+            if self.texture:
+                self.texture.release()
+            self.texture = self.ctx.texture(surface.get_size(), components=4)
+            self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        # OpenGL rows start at the bottom
+        self.texture.write(pg.image.tostring(surface, 'RGBA', True))
+
+    def render(self):
+        now = time.perf_counter()
+        if now - self.last_refresh > OVERLAY_REFRESH:
+            self.refresh()
+            self.last_refresh = now
+
+        # top left corner, one texel per pixel
+        _, _, width, height = self.ctx.viewport
+        w, h = 2 * self.texture.width / width, 2 * self.texture.height / height
+        self.program['u_rect'] = (-1, 1 - h, w, h)
+        self.texture.use(location=OVERLAY_TEXTURE_UNIT)
+        self.ctx.disable(mgl.DEPTH_TEST)
+        self.vao.render(mgl.TRIANGLE_STRIP)
+        self.ctx.enable(mgl.DEPTH_TEST)
@@ -0,0 +1,248 @@
+"""
+Protocolo binario de la red: cada mensaje es una cabecera FRAME_HEADER (longitud del contenido y tipo)
+seguida del contenido, con un formato struct fijo para cada tipo; los voxeles van como los bytes del
+array de NumPy. Como TCP es un flujo de bytes, un recv puede traer medio mensaje o varios juntos:
+StreamDecoder junta lo recibido y devuelve solo los mensajes completos.
+"""
+from settings import *
+import socket
+import struct
+import zlib
+
+# payload length, message type
+FRAME_HEADER = struct.Struct('<IB')
+# larger frames can only be a corrupt or hostile stream: the world snapshots the clients decode are big,
+# what the server gets from a client (ACK, JOIN, VOXEL_UPDATE, DIRECTION) is tens of bytes
+MAX_PAYLOAD = 1 << 30
+MAX_CLIENT_PAYLOAD = 4 << 10
+# bytes asked from the socket in every recv
+RECV_SIZE = 1 << 16
+# zlib level of the chunks sent on join: the fastest one already leaves the default world about 35 times smaller
+CHUNK_COMPRESSION = 1
+
+MSG_WORLD_UPDATE = 1
+MSG_VOXEL_UPDATE = 2
+MSG_POSITIONS = 3
+MSG_DIRECTION = 4
+MSG_VOXEL_EDITS = 5
+MSG_CHUNKS = 6
+MSG_ACK = 7
+MSG_JOIN = 8
+MSG_CHUNK_DATA = 9
+
+# world version, number of chunks and voxels per chunk, followed by the uint8 voxels
+WORLD_UPDATE = struct.Struct('<III')
+# chunk index, voxel index, voxel id
+VOXEL_UPDATE = struct.Struct('<IIB')
+# world version and number of edits, followed by the uint32 chunk indices, the uint32 voxel indices
+# and the uint8 voxel ids of the edits
+VOXEL_EDITS = struct.Struct('<II')
+# world version and number of chunks, followed by the uint32 chunk indices and the uint8 voxels of the chunks
+CHUNKS = struct.Struct('<II')
+# world version the client has applied
+ACK = struct.Struct('<I')
+# x, z of the client spawn, to send it the nearest chunks first
+JOIN = struct.Struct('<ff')
+# world version, chunk index and chunks still to come in the join, followed by the zlib-compressed voxels
+CHUNK_DATA = struct.Struct('<III')
+# number of players, followed by one POSITION per player: IPv4 address, port, x, y
+POSITIONS = struct.Struct('<H')
+POSITION = struct.Struct('<4sHii')
+DIRECTIONS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+DIRECTION = struct.Struct('<B')
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_frame(msg_type, payload):
+    return FRAME_HEADER.pack(len(payload), msg_type) + payload
+
+
+def encode_world_update(version, voxels):
+    # one copy of the voxels, straight from the array into the frame
+    voxels = np.ascontiguousarray(voxels, dtype='uint8')
+    header = FRAME_HEADER.pack(WORLD_UPDATE.size + voxels.nbytes, MSG_WORLD_UPDATE)
+    return b''.join((header, WORLD_UPDATE.pack(version, *voxels.shape), voxels.data))
+
+
+def decode_world_update(payload):
+    """(versión, array de (chunks, voxeles) sobre payload, sin copiar)."""
+    version, num_chunks, chunk_vol = WORLD_UPDATE.unpack_from(payload)
+    if len(payload) != WORLD_UPDATE.size + num_chunks * chunk_vol:
+        raise ProtocolError('world_update con un tamaño que no coincide')
+    return version, np.frombuffer(payload, dtype='uint8', offset=WORLD_UPDATE.size).reshape(num_chunks, chunk_vol)
+
+
+def encode_voxel_update(chunk_index, voxel_index, voxel_id):
+    return encode_frame(MSG_VOXEL_UPDATE, VOXEL_UPDATE.pack(chunk_index, voxel_index, voxel_id))
+
+
+def decode_voxel_update(payload):
+    return VOXEL_UPDATE.unpack(payload)
+
+
+def encode_voxel_edits(version, chunk_indices, voxel_indices, voxel_ids):
+    count = len(chunk_indices)
+    return encode_frame(MSG_VOXEL_EDITS, b''.join((
+        VOXEL_EDITS.pack(version, count),
+        np.asarray(chunk_indices, dtype='<u4').tobytes(),
+        np.asarray(voxel_indices, dtype='<u4').tobytes(),
+        np.asarray(voxel_ids, dtype='uint8').tobytes(),
+    )))
+
+
+def decode_voxel_edits(payload):
+    """(versión, índices de chunk, índices de voxel, ids), los arrays sobre payload."""
+    version, count = VOXEL_EDITS.unpack_from(payload)
+    if len(payload) != VOXEL_EDITS.size + count * 9:
+        raise ProtocolError('voxel_edits con un tamaño que no coincide')
+    chunk_indices = np.frombuffer(payload, dtype='<u4', count=count, offset=VOXEL_EDITS.size)
+    voxel_indices = np.frombuffer(payload, dtype='<u4', count=count, offset=VOXEL_EDITS.size + 4 * count)
+    voxel_ids = np.frombuffer(payload, dtype='uint8', count=count, offset=VOXEL_EDITS.size + 8 * count)
+    return version, chunk_indices, voxel_indices, voxel_ids
+
+
+def encode_chunks(version, chunk_indices, voxels):
+    voxels = np.ascontiguousarray(voxels, dtype='uint8')
+    chunk_indices = np.asarray(chunk_indices, dtype='<u4')
+    header = FRAME_HEADER.pack(CHUNKS.size + chunk_indices.nbytes + voxels.nbytes, MSG_CHUNKS)
+    return b''.join((header, CHUNKS.pack(version, len(chunk_indices)), chunk_indices.tobytes(), voxels.data))
+
+
+def decode_chunks(payload):
+    """(versión, índices de chunk, array de (chunks, CHUNK_VOL) voxeles), los arrays sobre payload."""
+    version, count = CHUNKS.unpack_from(payload)
+    if len(payload) != CHUNKS.size + count * (4 + CHUNK_VOL):
+        raise ProtocolError('chunks con un tamaño que no coincide')
+    chunk_indices = np.frombuffer(payload, dtype='<u4', count=count, offset=CHUNKS.size)
+    voxels = np.frombuffer(payload, dtype='uint8', offset=CHUNKS.size + 4 * count).reshape(count, CHUNK_VOL)
+    return version, chunk_indices, voxels
+
+
+def encode_ack(version):
+    return encode_frame(MSG_ACK, ACK.pack(version))
+
+
+def decode_ack(payload):
+    version, = ACK.unpack(payload)
+    return version
+
+
+def encode_join(x, z):
+    return encode_frame(MSG_JOIN, JOIN.pack(x, z))
+
+
+def decode_join(payload):
+    return JOIN.unpack(payload)
+
+
+def compress_chunk(voxels):
+    return zlib.compress(np.ascontiguousarray(voxels, dtype='uint8'), CHUNK_COMPRESSION)
+
+
+def encode_chunk_data(version, chunk_index, remaining, compressed):
+    """compressed: los voxeles del chunk comprimidos con compress_chunk."""
+    return encode_frame(MSG_CHUNK_DATA, CHUNK_DATA.pack(version, chunk_index, remaining) + compressed)
+
+
+def decode_chunk_data(payload):
+    """(versión, índice de chunk, chunks que faltan, voxeles del chunk ya descomprimidos)."""
+    version, chunk_index, remaining = CHUNK_DATA.unpack_from(payload)
+    # never inflate more than a chunk, whatever the payload says
+    decompressor = zlib.decompressobj()
+    try:
+        voxels = decompressor.decompress(memoryview(payload)[CHUNK_DATA.size:], CHUNK_VOL + 1)
+    except zlib.error as e:
+        raise ProtocolError(f'chunk_data mal comprimido: {e}')
+    if len(voxels) != CHUNK_VOL or not decompressor.eof:
+        raise ProtocolError('chunk_data con un tamaño que no coincide')
+    return version, chunk_index, remaining, np.frombuffer(voxels, dtype='uint8')
+
+
+def encode_positions(players):
+    """players: {(ip, puerto): [x, y]}, como Server.players."""
+    payload = bytearray(POSITIONS.pack(len(players)))
+    for (host, port), (x, y) in players.items():
+        payload += POSITION.pack(socket.inet_aton(host), port, x, y)
+    return encode_frame(MSG_POSITIONS, bytes(payload))
+
+
+def decode_positions(payload):
+    count, = POSITIONS.unpack_from(payload)
+    if len(payload) != POSITIONS.size + count * POSITION.size:
+        raise ProtocolError('positions con un tamaño que no coincide')
+    return {
+        (socket.inet_ntoa(host), port): [x, y]
+        for host, port, x, y in POSITION.iter_unpack(memoryview(payload)[POSITIONS.size:])
+    }
+
+
+def encode_direction(direction):
+    return encode_frame(MSG_DIRECTION, DIRECTION.pack(DIRECTIONS.index(direction)))
+
+
+def decode_direction(payload):
+    index, = DIRECTION.unpack(payload)
+    if index >= len(DIRECTIONS):
+        raise ProtocolError(f'dirección desconocida: {index}')
+    return DIRECTIONS[index]
+
+
+DECODERS = {
+    MSG_WORLD_UPDATE: decode_world_update,
+    MSG_VOXEL_UPDATE: decode_voxel_update,
+    MSG_POSITIONS: decode_positions,
+    MSG_DIRECTION: decode_direction,
+    MSG_VOXEL_EDITS: decode_voxel_edits,
+    MSG_CHUNKS: decode_chunks,
+    MSG_ACK: decode_ack,
+    MSG_JOIN: decode_join,
+    MSG_CHUNK_DATA: decode_chunk_data,
+}
+
+
+class StreamDecoder:
+    """
+    Separa en mensajes los bytes recibidos de un socket, en los trozos en que lleguen.
+    feed devuelve los mensajes completos como (tipo, datos ya decodificados con DECODERS).
+    Un mensaje de más de max_payload bytes es un ProtocolError en cuanto llega su cabecera, así que
+    nunca se guardan más de max_payload bytes de un mensaje: el servidor usa MAX_CLIENT_PAYLOAD.
+    """
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.buffer = bytearray()
+        self.max_payload = max_payload
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        start = 0
+        view = memoryview(self.buffer)
+        try:
+            while len(view) - start >= FRAME_HEADER.size:
+                length, msg_type = FRAME_HEADER.unpack_from(view, start)
+                if length > self.max_payload:
+                    raise ProtocolError(f'mensaje demasiado grande: {length} bytes')
+                end = start + FRAME_HEADER.size + length
+                if len(view) < end:
+                    break
+                decoder = DECODERS.get(msg_type)
+                if decoder is None:
+                    raise ProtocolError(f'tipo de mensaje desconocido: {msg_type}')
+                payload = view[start + FRAME_HEADER.size:end]
+                if len(view) - end < length:
+                    # copying what follows the frame is cheaper than copying the frame (a world update):
+                    # the frame keeps the buffer and the rest goes to a new one
+                    self.buffer = bytearray(view[end:])
+                    view = memoryview(self.buffer)
+                    start = 0
+                else:
+                    payload = payload.tobytes()
+                    start = end
+                messages.append((msg_type, decoder(payload)))
+        finally:
+            view.release()
+        # deleting from the front of a bytearray does not move the rest
+        del self.buffer[:start]
+        return messages
@@ -7,12 +7,13 @@ from world_objects.clouds import Clouds
 
 
 class Scene:
-    def __init__(self, app):
+    def __init__(self, app, terrain=None, cloud_data=None):
+        # terrain and cloud_data: World.generate_terrain and CloudMesh.build_vertex_data, if already made
         self.app = app
-        self.world = World(self.app)
+        self.world = World(self.app, terrain)
         self.voxel_marker = VoxelMarker(self.world.voxel_handler)
         self.water = Water(app)
-        self.clouds = Clouds(app)
+        self.clouds = Clouds(app, cloud_data)
 
     def update(self):
         self.world.update()
@@ -20,13 +21,16 @@ class Scene:
         self.clouds.update()
 
     def render(self):
+        profiler = self.app.profiler
         # chunks rendering
-        self.world.render()
+        with profiler.scope('world.render'), profiler.gpu_scope('world.render'):
+            self.world.render()
 
         # rendering without cull face
         self.app.ctx.disable(mgl.CULL_FACE)
-        self.clouds.render()
-        self.water.render()
+        with profiler.gpu_scope('clouds+water'):
+            self.clouds.render()
+            self.water.render()
         self.app.ctx.enable(mgl.CULL_FACE)
 
         # voxel selection
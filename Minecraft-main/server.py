@@ -0,0 +1,192 @@
+"""
+Servidor del juego: un solo hilo con un bucle de asyncio atiende a todos los clientes. Cada cliente tiene
+su propia cola de salida, así que uno lento no frena a los demás: de las posiciones solo recibe las más
+nuevas y, si se le acumulan más de MAX_QUEUED_BYTES sin enviar, se le desconecta. Las posiciones que han
+cambiado se envían todas juntas TICK_RATE veces por segundo, y el NetworkManager sincroniza el mundo
+cada SYNC_INTERVAL en un hilo aparte.
+"""
+from settings import SYNC_INTERVAL
+from protocol import StreamDecoder, encode_positions, MSG_DIRECTION, MAX_CLIENT_PAYLOAD, RECV_SIZE
+import asyncio
+import collections
+import itertools
+import socket
+
+HOST = '0.0.0.0'
+PORT = 12345
+
+WIDTH, HEIGHT = 600, 400
+# broadcasts of the positions per second
+TICK_RATE = 20
+# bytes waiting to be sent to a client before it is dropped
+MAX_QUEUED_BYTES = 8 << 20
+
+
+# --- Definición de DummySocket para el servidor ---
+class DummySocket:
+    def recv(self, bufsize):
+        return b''
+    def sendall(self, data):
+        pass
+    def close(self):
+        pass
+
+
+class ClientConnection:
+    """
+    Conexión de un cliente en el servidor, con su cola de salida. sendall se puede llamar desde cualquier
+    hilo y nunca espera al cliente: encola el mensaje y la tarea write_loop lo envía.
+    """
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.addr = writer.get_extra_info('peername')[:2]
+        self.outbox = collections.deque()
+        self.queued_bytes = 0
+        # newest positions not sent yet, they replace the older ones
+        self.positions = None
+        self.wakeup = asyncio.Event()
+        self.is_closed = False
+
+    def sendall(self, data):
+        # the NetworkManager sends from other threads
+        self.loop.call_soon_threadsafe(self.send, data)
+
+    def send(self, data):
+        if self.is_closed:
+            return
+        if self.queued_bytes + len(data) > MAX_QUEUED_BYTES:
+            print(f"[SERVIDOR] {self.addr} no recibe lo bastante rápido, se le desconecta.")
+            self.close()
+            return
+        self.outbox.append(data)
+        self.queued_bytes += len(data)
+        self.wakeup.set()
+
+    def send_positions(self, data):
+        self.positions = data
+        self.wakeup.set()
+
+    async def write_loop(self):
+        try:
+            while not self.is_closed:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while not self.is_closed and (self.outbox or self.positions):
+                    if self.positions is not None:
+                        data, self.positions = self.positions, None
+                    else:
+                        data = self.outbox.popleft()
+                        self.queued_bytes -= len(data)
+                    self.writer.write(data)
+                    # past the high-water mark of the transport this waits for the client, only this task
+                    await self.writer.drain()
+        except OSError as e:
+            print(f"[ERROR] Al enviar a {self.addr}: {e}")
+            self.close()
+
+    def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+            self.wakeup.set()
+            self.writer.close()
+
+
+# ==================== CLASE SERVIDOR ====================
+class Server:
+    def __init__(self, host=HOST, port=PORT):
+        self.players = {}
+        self.connections = []
+        # NetworkManager that keeps the world of the clients in sync, it gets their other messages
+        self.net_manager = None
+        # called every tick in the loop thread: the dedicated server applies the client edits with it
+        self.on_tick = None
+        # a player moved, joined or left since the last broadcast
+        self.positions_changed = False
+        self.loop = None
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.host, self.port = self.server.getsockname()[:2]
+        print(f"[SERVIDOR] Escuchando en {self.host}:{self.port}")
+
+    def broadcast_positions(self):
+        if not self.positions_changed:
+            return
+        self.positions_changed = False
+        # encoded once for every client
+        data = encode_positions(self.players)
+        for conn in self.connections:
+            conn.send_positions(data)
+
+    def move_player(self, addr, direction):
+        if direction == 'UP':
+            self.players[addr][1] = max(0, self.players[addr][1] - 5)
+        elif direction == 'DOWN':
+            self.players[addr][1] = min(HEIGHT, self.players[addr][1] + 5)
+        elif direction == 'LEFT':
+            self.players[addr][0] = max(0, self.players[addr][0] - 5)
+        elif direction == 'RIGHT':
+            self.players[addr][0] = min(WIDTH, self.players[addr][0] + 5)
+        self.positions_changed = True
+
+    async def handle_client(self, reader, writer):
+        conn = ClientConnection(self.loop, writer)
+        addr = conn.addr
+        print(f"[NUEVA CONEXIÓN] {addr} conectado.")
+        self.players[addr] = [WIDTH // 2, HEIGHT // 2]
+        self.positions_changed = True
+        self.connections.append(conn)
+        if self.net_manager:
+            self.net_manager.add_client(conn)
+        write_task = asyncio.create_task(conn.write_loop())
+
+        # a client only sends small messages: a bigger frame is rejected before it is buffered
+        decoder = StreamDecoder(MAX_CLIENT_PAYLOAD)
+        try:
+            while data := await reader.read(RECV_SIZE):
+                for msg_type, message in decoder.feed(data):
+                    if msg_type == MSG_DIRECTION:
+                        self.move_player(addr, message)
+                    elif self.net_manager:
+                        self.net_manager.process_client_message(conn, msg_type, message)
+        except Exception as e:
+            print(f"[ERROR] Cliente {addr} desconectado inesperadamente: {e}")
+        finally:
+            print(f"[DESCONECTADO] {addr} se ha desconectado.")
+            del self.players[addr]
+            self.positions_changed = True
+            self.connections.remove(conn)
+            if self.net_manager:
+                self.net_manager.remove_client(conn)
+            conn.close()
+            await write_task
+
+    async def tick_loop(self):
+        ticks_per_sync = max(1, round(SYNC_INTERVAL * TICK_RATE))
+        sync = None
+        next_tick = self.loop.time()
+        for tick in itertools.count():
+            if self.on_tick:
+                self.on_tick()
+            self.broadcast_positions()
+            # the world sync reads and compresses chunks: in a worker thread, so the ticks keep their pace;
+            # one still running is not queued again
+            if self.net_manager and tick % ticks_per_sync == 0 and (sync is None or sync.done()):
+                if sync is not None and sync.exception():
+                    print(f"[ERROR] Al sincronizar el mundo: {sync.exception()}")
+                sync = self.loop.run_in_executor(None, self.net_manager.send_updates)
+            # scheduled from the first tick, so a slow tick does not shift the next ones
+            next_tick += 1 / TICK_RATE
+            await asyncio.sleep(max(0.0, next_tick - self.loop.time()))
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        async with await asyncio.start_server(self.handle_client, sock=self.server):
+            await self.tick_loop()
+
+    def start(self):
+        """Atiende a los clientes en un bucle de asyncio; no vuelve, se llama en su propio hilo."""
+        print("[SERVIDOR] Esperando conexiones...")
+        asyncio.run(self.serve())
@@ -1,3 +1,23 @@
+import hashlib
+import os
+
+# numba keeps the compiled functions on disk (cache=True), but only recompiles one when its own file changes:
+# the constants of this file and the jitted functions it calls in other modules are baked into it, so the
+# cache goes in a folder named after the contents of every file with jitted code
+JIT_SOURCES = (
+    'settings.py', 'noise.py', 'terrain_gen.py', 'voxel_store.py', 'occlusion.py', 'frustum.py',
+    'meshes/chunk_mesh_builder.py', 'meshes/cloud_mesh.py',
+)
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+_jit_hash = hashlib.sha1()
+for _file_name in JIT_SOURCES:
+    with open(os.path.join(ROOT_DIR, _file_name), 'rb') as _file:
+        _jit_hash.update(_file.read())
+# the folders of older contents are removed by warmup.prune_jit_cache
+JIT_CACHE_ROOT = os.path.join(ROOT_DIR, '__pycache__', 'numba')
+JIT_CACHE_DIR = os.path.join(JIT_CACHE_ROOT, _jit_hash.hexdigest()[:12])
+os.environ.setdefault('NUMBA_CACHE_DIR', JIT_CACHE_DIR)
+
 from numba import njit
 import numpy as np
 import glm
@@ -14,6 +34,11 @@ WIN_RES = glm.vec2(1600, 900)
 # world generation
 SEED = 16
 
+# world saves
+SAVE_DIR = 'saves/world'
+REGION_SIZE = 8  # a region file holds REGION_SIZE^3 chunks
+ZLIB_LEVEL = 1  # chunk compression: fastest level, voxel data compresses well anyway
+
 # ray casting
 MAX_RAY_DIST = 6
 
@@ -24,12 +49,45 @@ CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
 CHUNK_VOL = CHUNK_AREA * CHUNK_SIZE
 CHUNK_SPHERE_RADIUS = H_CHUNK_SIZE * math.sqrt(3)
 
+# chunk meshes are built in horizontal sections so voxel edits only remesh a few layers
+SECTION_HEIGHT = 8
+NUM_SECTIONS = CHUNK_SIZE // SECTION_HEIGHT
+
+# merge coplanar faces with the same voxel id and AO into larger quads
+GREEDY_MESHING = False
+
+# chunk meshes are generated by background threads and uploaded to the GPU by the main loop
+MESH_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MESH_UPLOAD_BUDGET_MS = 4  # max time per frame spent uploading finished meshes
+# threads that read the assets and generate the terrain and the clouds during the startup (startup.py), 0 = none
+STARTUP_WORKERS = 4
+# every chunk mesh lives in a single vertex buffer of CHUNK_ARENA_PAGES pages of 1024 vertices, grown by half when full
+CHUNK_ARENA_PAGES = 4096
+# level of detail: chunks whose centre is farther than LOD_DISTANCES[i] from the player are meshed with
+# blocks of 2^(i+1) voxels; a chunk only changes level once LOD_HYSTERESIS voxels past the limit
+LOD_DISTANCES = (192, 384)
+LOD_HYSTERESIS = 16
+# the levels are checked again when the player has moved this far
+LOD_UPDATE_DISTANCE = 8
+
 # world
 WORLD_W, WORLD_H = 20, 2
 WORLD_D = WORLD_W
 WORLD_AREA = WORLD_W * WORLD_D
 WORLD_VOL = WORLD_AREA * WORLD_H
 
+# chunk streaming: when enabled only the chunk columns within STREAM_RADIUS of the player are kept
+# in memory and the world has no horizontal limit; otherwise the whole WORLD_W x WORLD_D grid is loaded
+CHUNK_STREAMING = False
+STREAM_RADIUS = 6
+STREAM_COLUMNS_PER_FRAME = 2
+
+# chunk store: ring buffer of chunk columns, a chunk lives in the slot given by its position modulo the store size
+STORE_W = 2 * STREAM_RADIUS + 1 if CHUNK_STREAMING else WORLD_W
+STORE_D = 2 * STREAM_RADIUS + 1 if CHUNK_STREAMING else WORLD_D
+STORE_AREA = STORE_W * STORE_D
+STORE_VOL = STORE_AREA * WORLD_H
+
 # world center
 CENTER_XZ = WORLD_W * H_CHUNK_SIZE
 CENTER_Y = WORLD_H * H_CHUNK_SIZE
@@ -42,6 +100,30 @@ H_FOV = 2 * math.atan(math.tan(V_FOV * 0.5) * ASPECT_RATIO)  # horizontal FOV
 NEAR = 0.1
 FAR = 2000.0
 PITCH_MAX = glm.radians(89)
+# the chunk frustum test is only redone when the camera moves or turns more than this since the last one;
+# that test is widened by the same amounts, so its result stays valid in between
+CULLING_MOVE_THRESHOLD = 0.25
+CULLING_TURN_THRESHOLD = glm.radians(0.1)
+# cave culling: skip chunks the camera cannot see through the air of the chunks in between (occlusion.py).
+# Off: on the generated terrain every chunk connects its faces through the air, so it culls nothing and
+# each mesh build still pays the flood fill of its connectivity
+OCCLUSION_CULLING = False
+
+# profiler (profiler.py): CPU and GPU time of each part of every frame, F3 turns it and its overlay on and off,
+# F4 saves the last PROFILER_HISTORY frames to PROFILER_DIR as JSON and CSV
+PROFILER_ENABLED = False
+PROFILER_HISTORY = 600
+PROFILER_DIR = 'profiles'
+# a frame is a stutter when it takes PROFILER_STUTTER_FACTOR times the median frame and at least PROFILER_STUTTER_MIN_MS
+PROFILER_STUTTER_FACTOR = 2.0
+PROFILER_STUTTER_MIN_MS = 25
+
+# network sync (network_manager.py): every SYNC_INTERVAL seconds the server sends each client the voxel edits
+# it has not acknowledged yet, or the whole chunks changed since then if that is older than the last EDIT_LOG_SIZE edits
+SYNC_INTERVAL = 0.1
+EDIT_LOG_SIZE = 4096
+# a joining client gets the chunks compressed and nearest first, at most JOIN_BYTES_PER_TICK bytes every SYNC_INTERVAL
+JOIN_BYTES_PER_TICK = 1 << 20
 
 # player
 PLAYER_SPEED = 0.005
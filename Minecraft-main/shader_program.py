@@ -1,23 +1,27 @@
 from settings import *
 
+SHADER_NAMES = ('chunk', 'voxel_marker', 'water', 'clouds', 'overlay')
+
 
 class ShaderProgram:
-    def __init__(self, app):
+    def __init__(self, app, sources=None):
         self.app = app
         self.ctx = app.ctx
         self.player = app.player
+        # shader_name -> (vertex shader, fragment shader), see read_sources
+        self.sources = sources or self.read_sources()
         # -------- shaders -------- #
         self.chunk = self.get_program(shader_name='chunk')
         self.voxel_marker = self.get_program(shader_name='voxel_marker')
         self.water = self.get_program('water')
         self.clouds = self.get_program('clouds')
+        self.overlay = self.get_program('overlay')
         # ------------------------- #
         self.set_uniforms_on_init()
 
     def set_uniforms_on_init(self):
         # chunk
         self.chunk['m_proj'].write(self.player.m_proj)
-        self.chunk['m_model'].write(glm.mat4())
         self.chunk['u_texture_array_0'] = 1
         self.chunk['bg_color'].write(BG_COLOR)
         self.chunk['water_line'] = WATER_LINE
@@ -45,12 +49,19 @@ class ShaderProgram:
         self.water['m_view'].write(self.player.m_view)
         self.clouds['m_view'].write(self.player.m_view)
 
-    def get_program(self, shader_name):
-        with open(f'shaders/{shader_name}.vert') as file:
-            vertex_shader = file.read()
+    @staticmethod
+    def read_sources(shader_names=SHADER_NAMES):
+        sources = {}
+        for shader_name in shader_names:
+            with open(f'shaders/{shader_name}.vert') as file:
+                vertex_shader = file.read()
 
-        with open(f'shaders/{shader_name}.frag') as file:
-            fragment_shader = file.read()
+            with open(f'shaders/{shader_name}.frag') as file:
+                fragment_shader = file.read()
+            sources[shader_name] = vertex_shader, fragment_shader
+        return sources
 
+    def get_program(self, shader_name):
+        vertex_shader, fragment_shader = self.sources[shader_name]
         program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
         return program
@@ -1,11 +1,11 @@
 #version 330 core
 
 layout (location = 0) in uint packed_data;
-layout (location = 1) in vec2 in_uv;
 
 uniform mat4 m_proj;
 uniform mat4 m_view;
-uniform mat4 m_model;
+// origin of the chunk stored in every page of 1024 vertices of the chunk arena, 1024 pages per row
+uniform isampler2D u_chunk_origins;
 
 flat out int voxel_id;
 flat out int face_id;
@@ -16,6 +16,13 @@ out vec2 uv;
 out float shading;
 out vec3 frag_world_pos;
 
+// face_id -> axes of the face plane that give the uv (same as FACE_AXES in chunk_mesh_builder)
+const ivec2 uv_axes[6] = ivec2[6](
+    ivec2(0, 2), ivec2(0, 2),  // top, bottom
+    ivec2(1, 2), ivec2(1, 2),  // right, left
+    ivec2(1, 0), ivec2(1, 0)   // front, back
+);
+
 const float ao_values[4] = float[4](0.1, 0.25, 0.5, 1.0);
 const float face_shading[6] = float[6](
     1.0, 0.5,  // top, bottom
@@ -51,11 +58,14 @@ void main() {
     ao_id = _ao_id;
     flip_id = _flip_id;
     
-    // Se utiliza la UV tal como se generó en el mesh
-    uv = in_uv;
+    // La textura se repite una vez por voxel: la UV es la posición del vértice sobre el plano de la cara
+    vec3 local_pos = vec3(float(_x), float(_y), float(_z));
+    uv = vec2(local_pos[uv_axes[face_id].x], local_pos[uv_axes[face_id].y]);
     shading = face_shading[face_id] * ao_values[ao_id];
     
-    vec4 world_pos = m_model * vec4(float(_x), float(_y), float(_z), 1.0);
+    int page = gl_VertexID >> 10;
+    vec3 chunk_origin = vec3(texelFetch(u_chunk_origins, ivec2(page & 1023, page >> 10), 0).xyz);
+    vec4 world_pos = vec4(chunk_origin + local_pos, 1.0);
     frag_world_pos = world_pos.xyz;
     
     gl_Position = m_proj * m_view * world_pos;
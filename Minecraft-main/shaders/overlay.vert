@@ -0,0 +1,14 @@
+#version 330 core
+
+layout (location = 0) in vec2 in_corner;
+
+// x, y, width, height in normalized device coordinates
+uniform vec4 u_rect;
+
+out vec2 uv;
+
+
+void main() {
+    uv = in_corner;
+    gl_Position = vec4(u_rect.xy + in_corner * u_rect.zw, 0.0, 1.0);
+}
@@ -0,0 +1,63 @@
+from settings import *
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextlib
+import threading
+import time
+
+
+class Startup:
+    """
+    Fases del arranque con su inicio y su duración, medidos desde que se crea, y los hilos que
+    adelantan el trabajo que solo usa la CPU (leer y decodificar archivos, generar el terreno y las
+    nubes) mientras el hilo principal crea los objetos de OpenGL, que solo pueden crearse en él.
+    Con num_workers = 0 todo se hace en el hilo principal, en orden, al pedirlo.
+    """
+    def __init__(self, num_workers=STARTUP_WORKERS):
+        self.start = time.perf_counter()
+        # (name, start s, seconds, thread name)
+        self.phases = []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(num_workers, thread_name_prefix='startup') if num_workers else None
+        self.total = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.phases.append((name, start - self.start, end - start, threading.current_thread().name))
+
+    def run(self, name, func, *args):
+        with self.phase(name):
+            return func(*args)
+
+    def submit(self, name, func, *args):
+        """Empieza func(*args) en un hilo de arranque y devuelve su Future (ya resuelto si no hay hilos)."""
+        if self.executor:
+            return self.executor.submit(self.run, name, func, *args)
+        future = Future()
+        future.set_result(self.run(name, func, *args))
+        return future
+
+    def wait(self, name, future):
+        # the time the main thread spends blocked on a background phase
+        with self.phase(f'esperar {name}'):
+            return future.result()
+
+    def finish(self, name='primer frame'):
+        """Cierra el arranque al llegar a name y muestra las fases. Solo cuenta la primera llamada."""
+        if self.total is not None:
+            return
+        self.total = time.perf_counter() - self.start
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        self.print_report(name)
+
+    def print_report(self, name):
+        print(f'[Startup] {"fase":<26}{"inicio s":>9}{"ms":>9}  hilo')
+        for phase, start, elapsed, thread in sorted(self.phases, key=lambda phase: phase[1]):
+            print(f'[Startup] {phase:<26}{start:>9.2f}{elapsed * 1000:>9.0f}  {thread}')
+        print(f'[Startup] {name} a los {self.total:.2f} s')
@@ -1,9 +1,39 @@
 from noise import noise2, noise3
-from random import random
+from numba import prange
 from settings import *
 
-
-@njit
+# independent random streams, so each random decision of the generator gets its own value
+RNG_SURFACE = 1
+RNG_TREE = 2
+RNG_LEAVES = 3
+
+
+@njit(cache=True)
+def hash_u32(value):
+    # integer finalizer (lowbias32): spreads every input bit over the 32 output bits
+    value &= 0xFFFFFFFF
+    value ^= value >> 16
+    value = (value * 0x7FEB352D) & 0xFFFFFFFF
+    value ^= value >> 15
+    value = (value * 0x846CA68B) & 0xFFFFFFFF
+    value ^= value >> 16
+    return value
+
+
+@njit(cache=True)
+def random_at(wx, wy, wz, stream):
+    """
+    Número pseudoaleatorio en [0, 1) que solo depende de SEED, de la posición en el mundo y del stream.
+    Al no tener estado, un chunk se genera igual en cualquier orden, hilo o máquina.
+    """
+    h = hash_u32(SEED * 0x9E3779B9 + stream)
+    h = hash_u32(h ^ (wx & 0xFFFFFFFF))
+    h = hash_u32(h ^ (wy & 0xFFFFFFFF))
+    h = hash_u32(h ^ (wz & 0xFFFFFFFF))
+    return h / 4294967296.0
+
+
+@njit(cache=True)
 def get_height(x, z):
     # island mask
     island = 1 / (pow(0.0025 * math.hypot(x - CENTER_XZ, z - CENTER_XZ), 20) + 0.0001)
@@ -32,12 +62,12 @@ def get_height(x, z):
     return int(height)
 
 
-@njit
+@njit(cache=True)
 def get_index(x, y, z):
     return x + CHUNK_SIZE * z + CHUNK_AREA * y
 
 
-@njit
+@njit(cache=True)
 def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
     voxel_id = 0
 
@@ -50,7 +80,7 @@ def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
         else:
             voxel_id = STONE
     else:
-        rng = int(7 * random())
+        rng = int(7 * random_at(wx, wy, wz, RNG_SURFACE))
         ry = wy - rng
         if SNOW_LVL <= ry < world_height:
             voxel_id = SNOW
@@ -72,12 +102,12 @@ def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
 
     # place tree
     if wy < DIRT_LVL:
-        place_tree(voxels, x, y, z, voxel_id)
+        place_tree(voxels, x, y, z, wx, wy, wz, voxel_id)
 
 
-@njit
-def place_tree(voxels, x, y, z, voxel_id):
-    rnd = random()
+@njit(cache=True)
+def place_tree(voxels, x, y, z, wx, wy, wz, voxel_id):
+    rnd = random_at(wx, wy, wz, RNG_TREE)
     if voxel_id != GRASS or rnd > TREE_PROBABILITY:
         return None
     if y + TREE_HEIGHT >= CHUNK_SIZE:
@@ -94,7 +124,7 @@ def place_tree(voxels, x, y, z, voxel_id):
     m = 0
     for n, iy in enumerate(range(TREE_H_HEIGHT, TREE_HEIGHT - 1)):
         k = iy % 2
-        rng = int(random() * 2)
+        rng = int(random_at(wx, wy + iy, wz, RNG_LEAVES) * 2)
         for ix in range(-TREE_H_WIDTH + m, TREE_H_WIDTH - m * rng):
             for iz in range(-TREE_H_WIDTH + m * rng, TREE_H_WIDTH - m):
                 if (ix + iz) % 4:
@@ -107,3 +137,51 @@ def place_tree(voxels, x, y, z, voxel_id):
 
     # top
     voxels[get_index(x, y + TREE_HEIGHT - 2, z)] = LEAVES
+
+
+@njit(cache=True)
+def generate_heightmap(heights, cx, cz):
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            heights[x, z] = get_height(x + cx, z + cz)
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def generate_heightmaps(heightmap, column_positions):
+    """
+    Calcula en paralelo la altura del terreno de cada columna de chunks (cx, cz) en heightmap[i].
+    Se calcula una sola vez por columna y la comparten todos los chunks de esa columna.
+    """
+    for i in prange(len(column_positions)):
+        cx = column_positions[i, 0] * CHUNK_SIZE
+        cz = column_positions[i, 1] * CHUNK_SIZE
+        generate_heightmap(heightmap[i], cx, cz)
+
+
+@njit(cache=True)
+def generate_terrain(voxels, heights, cx, cy, cz):
+    for x in range(CHUNK_SIZE):
+        wx = x + cx
+        for z in range(CHUNK_SIZE):
+            wz = z + cz
+            world_height = heights[x, z]
+            local_height = min(world_height - cy, CHUNK_SIZE)
+
+            for y in range(local_height):
+                wy = y + cy
+                set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height)
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def generate_chunks(voxels, chunk_positions, heightmap, column_ids, is_empty):
+    """
+    Genera en paralelo (un chunk por hilo) el terreno de voxels[i] para cada chunk_positions[i],
+    usando las alturas de heightmap[column_ids[i]].
+    Los arrays de voxels deben llegar a cero; is_empty[i] indica si el chunk quedó vacío.
+    """
+    for i in prange(len(chunk_positions)):
+        cx = chunk_positions[i, 0] * CHUNK_SIZE
+        cy = chunk_positions[i, 1] * CHUNK_SIZE
+        cz = chunk_positions[i, 2] * CHUNK_SIZE
+        generate_terrain(voxels[i], heightmap[column_ids[i]], cx, cy, cz)
+        is_empty[i] = not np.any(voxels[i])
@@ -0,0 +1,58 @@
+from settings import *
+import pytest
+
+# the meshes live in the vertex arena of an OpenGL context
+mgl = pytest.importorskip('moderngl')
+
+
+@pytest.fixture(scope='module')
+def world():
+    from headless import HeadlessEngine
+    try:
+        engine = HeadlessEngine(num_frames=1, scale=0.25)
+    except Exception as e:
+        pytest.skip(f'sin contexto de OpenGL: {e}')
+    yield engine.scene.world
+    engine.scene.world.mesh_pool.shutdown()
+
+
+def get_chunk_near_player(world):
+    """Un chunk con terreno a nivel de detalle 0, con su malla completa ya generada."""
+    for chunk in world.chunks:
+        if chunk and not chunk.is_empty and chunk.mesh and chunk.mesh.lod == 0:
+            chunk.mesh.rebuild()
+            return chunk
+    pytest.skip('ningún chunk cercano con terreno')
+
+
+@pytest.mark.parametrize('ly', [0, 6, 7, 9, 20, CHUNK_SIZE - 1])
+def test_edit_rebuilds_only_the_touched_sections(world, ly):
+    chunk = get_chunk_near_player(world)
+    mesh = chunk.mesh
+    handler = world.voxel_handler
+
+    # an inner voxel, so no neighbour chunk is rebuilt
+    lx, lz = CHUNK_SIZE // 2, CHUNK_SIZE // 2
+    voxel_index = lx + CHUNK_SIZE * lz + CHUNK_AREA * ly
+    voxel_id = 0 if chunk.get_voxel(voxel_index) else DIRT
+
+    rebuilt = []
+    build_sections = mesh.build_sections
+    mesh.build_sections = lambda section_ids: (rebuilt.extend(section_ids), build_sections(section_ids))[1]
+    old_sections = list(mesh.sections)
+    try:
+        chunk.set_voxel(voxel_index, voxel_id)
+        handler.rebuild_layers(chunk, ly)
+    finally:
+        del mesh.build_sections
+
+    # the edit can only change the faces and AO of layers ly - 1 .. ly + 1
+    expected = range(max(ly - 1, 0) // SECTION_HEIGHT, min(ly + 1, CHUNK_SIZE - 1) // SECTION_HEIGHT + 1)
+    assert rebuilt == list(expected)
+    for section_id in range(NUM_SECTIONS):
+        if section_id not in expected:
+            assert mesh.sections[section_id] is old_sections[section_id]
+
+    full_sections, _ = mesh.build_sections(range(NUM_SECTIONS))
+    assert np.array_equal(mesh.get_vertex_data(), np.concatenate(full_sections))
+    assert mesh.num_vertices == sum(len(section) for section in full_sections)
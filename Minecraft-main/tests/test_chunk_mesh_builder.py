@@ -0,0 +1,56 @@
+from settings import *
+from collections import Counter
+from meshes.chunk_mesh_builder import *
+
+
+def get_padded_voxels(seed):
+    rng = np.random.default_rng(seed)
+    voxels = np.zeros([PADDED_SIZE] * 3, dtype='uint8')  # y, z, x
+    # flat layers to merge, loose voxels that break them up, and a solid border on one side
+    voxels[1:10] = 1
+    voxels[10:14, 5:30, 5:30] = 2
+    loose = rng.random([PADDED_SIZE] * 3) < 0.05
+    voxels[loose] = rng.integers(1, 5, size=np.count_nonzero(loose), dtype='uint8')
+    voxels[:, :, 0] = 3
+    return voxels.reshape(PADDED_VOL)
+
+
+def get_faces(vertex_data):
+    """Caras de voxel que cubren los quads de la malla: (x, y, z, face_id, voxel_id), con repeticiones."""
+    faces = Counter()
+    for quad in vertex_data.astype('int64').reshape(-1, 4):
+        corners = np.stack([(quad >> 26) & 63, (quad >> 20) & 63, (quad >> 14) & 63], axis=1)
+        voxel_id = int(quad[0] >> 6) & 255
+        face_id = int(quad[0] >> 3) & 7
+        axis_u, axis_v = FACE_AXES[face_id]
+        axis_n = 3 - axis_u - axis_v
+        lo, hi = corners.min(axis=0), corners.max(axis=0)
+        pos = [0, 0, 0]
+        # the quad lies on the far side of the voxel for the faces that look along +axis
+        pos[axis_n] = lo[axis_n] - FACE_CORNERS[face_id, 0, axis_n]
+        for v in range(lo[axis_v], hi[axis_v]):
+            for u in range(lo[axis_u], hi[axis_u]):
+                pos[axis_u], pos[axis_v] = u, v
+                faces[(*pos, face_id, voxel_id)] += 1
+    return faces
+
+
+def test_greedy_covers_the_same_faces():
+    for seed in range(2):
+        padded_voxels = get_padded_voxels(seed)
+        for y_min, y_max in ((0, CHUNK_SIZE), (8, 16)):
+            naive = build_chunk_mesh(padded_voxels, y_min, y_max)
+            greedy = build_chunk_mesh_greedy(padded_voxels, y_min, y_max)
+            assert len(greedy) < len(naive)
+            assert get_faces(greedy) == get_faces(naive)
+            assert max(get_faces(greedy).values()) == 1
+
+
+def test_faces_are_the_visible_ones():
+    padded_voxels = get_padded_voxels(0)
+    faces = get_faces(build_chunk_mesh(padded_voxels))
+    voxels = padded_voxels.reshape([PADDED_SIZE] * 3)
+    for x, y, z, face_id, voxel_id in faces:
+        nx, ny, nz = FACE_NORMALS[face_id]
+        assert voxels[y + 1, z + 1, x + 1] == voxel_id
+        assert not voxels[y + ny + 1, z + nz + 1, x + nx + 1]
@@ -0,0 +1,78 @@
+from settings import *
+from protocol import *
+import pytest
+
+
+def normalize(messages):
+    # the decoded arrays are views over the received bytes, compare their contents
+    def value(field):
+        return field.tobytes() if isinstance(field, np.ndarray) else field
+    return [
+        (msg_type, tuple(value(field) for field in message) if isinstance(message, tuple) else value(message))
+        for msg_type, message in messages
+    ]
+
+
+def get_stream():
+    rng = np.random.default_rng(0)
+    voxels = rng.integers(0, 4, size=[2, CHUNK_VOL], dtype='uint8')
+    frames = [
+        encode_voxel_update(3, 1234, 7),
+        encode_ack(42),
+        encode_direction('LEFT'),
+        encode_chunks(5, [1, 9], voxels),
+        encode_chunk_data(6, 2, 0, compress_chunk(voxels[0])),
+        encode_positions({('127.0.0.1', 5000): [10, 20]}),
+        encode_voxel_edits(8, [1, 2], [3, 4], [5, 6]),
+        encode_join(1.5, -2.5),
+    ]
+    return b''.join(frames), len(frames)
+
+
+def test_merged_frames():
+    data, num_frames = get_stream()
+    messages = StreamDecoder().feed(data)
+    assert len(messages) == num_frames
+    assert messages[0] == (MSG_VOXEL_UPDATE, (3, 1234, 7))
+    assert messages[1] == (MSG_ACK, 42)
+    assert messages[2] == (MSG_DIRECTION, 'LEFT')
+
+
+def test_split_frames():
+    data, num_frames = get_stream()
+    expected = normalize(StreamDecoder().feed(data))
+    for piece_size in (1, 3, FRAME_HEADER.size, 1000, RECV_SIZE):
+        decoder = StreamDecoder()
+        messages = []
+        for start in range(0, len(data), piece_size):
+            messages += normalize(decoder.feed(data[start:start + piece_size]))
+        assert messages == expected, piece_size
+        assert not decoder.buffer
+
+
+def test_large_frame_split_around_its_end():
+    # a big frame followed by part of the next one takes the path that keeps the frame in the buffer
+    voxels = np.arange(CHUNK_VOL, dtype='uint32').astype('uint8').reshape(1, CHUNK_VOL)
+    frame = encode_chunks(1, [4], voxels)
+    ack = encode_ack(2)
+    decoder = StreamDecoder()
+    messages = decoder.feed(frame + ack[:2])
+    (msg_type, (version, chunk_indices, received)), = messages
+    assert (msg_type, version, list(chunk_indices)) == (MSG_CHUNKS, 1, [4])
+    assert np.array_equal(received, voxels)
+    assert decoder.feed(ack[2:]) == [(MSG_ACK, 2)]
+
+
+def test_unknown_type():
+    with pytest.raises(ProtocolError):
+        StreamDecoder().feed(encode_frame(200, b'x'))
+
+
+def test_client_frames_are_small():
+    decoder = StreamDecoder(MAX_CLIENT_PAYLOAD)
+    frames = encode_ack(1) + encode_join(2.0, 3.0) + encode_voxel_update(1, 2, 3) + encode_direction('UP')
+    assert len(decoder.feed(frames)) == 4
+    # rejected from the header alone, before the payload is buffered
+    header = FRAME_HEADER.pack(MAX_CLIENT_PAYLOAD + 1, MSG_CHUNKS)
+    with pytest.raises(ProtocolError):
+        decoder.feed(header)
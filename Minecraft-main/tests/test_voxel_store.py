@@ -0,0 +1,68 @@
+from settings import *
+from voxel_store import VoxelStore, UNIFORM, PALETTE, DENSE, PALETTE_SIZE
+
+
+def get_chunks():
+    rng = np.random.default_rng(0)
+    uniform = np.full(CHUNK_VOL, 3, dtype='uint8')
+    palette = rng.integers(0, PALETTE_SIZE, size=CHUNK_VOL, dtype='uint8')
+    dense = rng.integers(0, 256, size=CHUNK_VOL, dtype='uint8')
+    return np.stack([np.zeros(CHUNK_VOL, dtype='uint8'), uniform, palette, dense])
+
+
+def test_round_trip():
+    chunks = get_chunks()
+    store = VoxelStore(8)
+    slots = [1, 2, 5, 7]
+    store.set_chunks(slots, chunks)
+    assert [store.get_kind(slot) for slot in slots] == [UNIFORM, UNIFORM, PALETTE, DENSE]
+    assert store.is_empty(1) and not store.is_empty(2)
+    assert np.array_equal(store.get_chunks(slots), chunks)
+    for slot, voxels in zip(slots, chunks):
+        for voxel_index in (0, 1, CHUNK_VOL // 2 + 1, CHUNK_VOL - 1):
+            assert store.get_voxel(slot, voxel_index) == voxels[voxel_index]
+
+
+def test_set_voxel_promotes():
+    store = VoxelStore(1)
+    voxels = np.full(CHUNK_VOL, 2, dtype='uint8')
+    store.set_chunks([0], voxels[None])
+    assert store.get_kind(0) == UNIFORM
+
+    # the same id keeps it uniform, a new one needs a palette
+    store.set_voxel(0, 10, 2)
+    assert store.get_kind(0) == UNIFORM
+    for voxel_id in range(PALETTE_SIZE - 1):
+        voxel_index = 100 + voxel_id
+        store.set_voxel(0, voxel_index, 100 + voxel_id)
+        voxels[voxel_index] = 100 + voxel_id
+    assert store.get_kind(0) == PALETTE
+    assert np.array_equal(store.get_chunk(0), voxels)
+
+    # one id past the palette
+    store.set_voxel(0, CHUNK_VOL - 1, 250)
+    voxels[CHUNK_VOL - 1] = 250
+    assert store.get_kind(0) == DENSE
+    assert np.array_equal(store.get_chunk(0), voxels)
+
+    # set_chunks packs it again as tight as it can
+    voxels[:] = 9
+    store.set_chunks([0], voxels[None])
+    assert store.get_kind(0) == UNIFORM
+    assert np.array_equal(store.get_chunk(0), voxels)
+
+
+def test_rows_freed_during_a_read_wait_for_it():
+    chunks = get_chunks()
+    store = VoxelStore(1)
+    store.set_chunks([0], chunks[3:])
+    offset = int(store.refs[0]) >> 2
+
+    generation = store.begin_read()
+    store.free(0)
+    store.recycle()
+    assert offset not in store.free_rows[DENSE]
+
+    store.end_read(generation)
+    store.recycle()
+    assert offset in store.free_rows[DENSE]
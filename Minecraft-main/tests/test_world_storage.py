@@ -0,0 +1,47 @@
+from settings import *
+from world_storage import WorldStorage
+
+
+def test_save_and_load(tmp_path):
+    rng = np.random.default_rng(0)
+    # two chunks of one region, one of another, and an empty one
+    positions = [(0, 0, 0), (1, 1, 2), (REGION_SIZE, 0, -1), (3, 0, 3)]
+    voxels = rng.integers(0, 8, size=[len(positions), CHUNK_VOL], dtype='uint8')
+    voxels[3] = 0
+
+    storage = WorldStorage(str(tmp_path))
+    assert not storage.has_world()
+    storage.save_chunks(positions, voxels)
+    assert storage.has_world()
+
+    loaded = np.full([len(positions) + 1, CHUNK_VOL], 77, dtype='uint8')
+    found = WorldStorage(str(tmp_path)).load_chunks(positions + [(2, 0, 2)], loaded)
+    assert list(found) == [True, True, True, True, False]
+    assert np.array_equal(loaded[:-1], voxels)
+    # a chunk never saved is left untouched
+    assert np.all(loaded[-1] == 77)
+
+
+def test_save_keeps_the_other_chunks_of_the_region(tmp_path):
+    rng = np.random.default_rng(1)
+    positions = [(0, 0, 0), (1, 0, 0)]
+    voxels = rng.integers(0, 8, size=[2, CHUNK_VOL], dtype='uint8')
+    storage = WorldStorage(str(tmp_path))
+    storage.save_chunks(positions, voxels)
+
+    edited = voxels[1].copy()
+    edited[:100] = 5
+    storage.save_chunks(positions[1:], edited[None])
+
+    loaded = np.empty([2, CHUNK_VOL], dtype='uint8')
+    assert list(storage.load_chunks(positions, loaded)) == [True, True]
+    assert np.array_equal(loaded[0], voxels[0])
+    assert np.array_equal(loaded[1], edited)
+
+
+def test_other_settings_are_not_loaded(tmp_path):
+    storage = WorldStorage(str(tmp_path))
+    storage.save_chunks([(0, 0, 0)], np.ones([1, CHUNK_VOL], dtype='uint8'))
+    with open(os.path.join(tmp_path, 'level.json'), 'w') as file:
+        file.write('{"seed": -1}')
+    assert not storage.has_world()
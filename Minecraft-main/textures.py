@@ -2,54 +2,67 @@ import pygame as pg
 import moderngl as mgl
 from settings import ATLAS_TILE_SIZE, ATLAS_COLS, ATLAS_ROWS
 
+# archivo -> si es un atlas que se convierte en texture array
+TEXTURE_FILES = {'frame.png': False, 'water.png': False, 'tex_array_0.png': True}
+
+
 class Textures:
-    def __init__(self, app):
+    def __init__(self, app, images=None):
         self.app = app
         self.ctx = app.ctx
+        # imágenes ya decodificadas por decode_images (en un hilo de arranque) o se decodifican aquí
+        images = images or self.decode_images()
 
         # Cargar texturas individuales
-        self.texture_0 = self.load('frame.png')
-        self.texture_1 = self.load('water.png')
+        self.texture_0 = self.load(*images['frame.png'])
+        self.texture_1 = self.load(*images['water.png'])
         # Cargar el texture array usando el atlas
-        self.texture_array_0 = self.load('tex_array_0.png', is_tex_array=True)
+        self.texture_array_0 = self.load(*images['tex_array_0.png'], is_tex_array=True)
 
         # Asignar unidades de textura
         self.texture_0.use(location=0)
         self.texture_array_0.use(location=1)
         self.texture_1.use(location=2)
 
-    def load(self, file_name, is_tex_array=False):
-        # Cargar la imagen sin voltear (prueba primero sin flip)
-        image = pg.image.load(f'assets/{file_name}').convert_alpha()
+    @staticmethod
+    def decode_images():
+        """
+        Lee y decodifica las imágenes de TEXTURE_FILES en bytes RGBA: archivo -> (tamaño, datos).
+        Solo usa la CPU, así que puede ir en otro hilo mientras el principal crea el contexto de OpenGL.
+        """
+        return {file_name: Textures.decode(file_name, is_tex_array) for file_name, is_tex_array in TEXTURE_FILES.items()}
+
+    @staticmethod
+    def decode(file_name, is_tex_array=False):
+        # Cargar la imagen sin voltear (prueba primero sin flip). tostring ya la pasa a RGBA,
+        # así que no hace falta convert_alpha (que necesita la ventana)
+        image = pg.image.load(f'assets/{file_name}')
         # Si tu asset ya tiene la orientación correcta, no se voltea.
         # Si en cambio la imagen se ve invertida, prueba descomentando la siguiente línea:
         # image = pg.transform.flip(image, False, True)
 
+        if not is_tex_array:
+            return image.get_size(), pg.image.tostring(image, 'RGBA', False)
+
+        width, height = image.get_size()
+        cols = width // ATLAS_TILE_SIZE
+        rows = height // ATLAS_TILE_SIZE
+        num_layers = cols * rows
+
+        # Extraer cada tile: iteramos las filas en orden inverso para asignar la capa 0 a la fila inferior.
+        data = bytearray()
+        for row in range(rows - 1, -1, -1):
+            for col in range(cols):
+                rect = (col * ATLAS_TILE_SIZE, row * ATLAS_TILE_SIZE, ATLAS_TILE_SIZE, ATLAS_TILE_SIZE)
+                sub_image = image.subsurface(rect).copy()  # copy() para asegurar una imagen independiente
+                data.extend(pg.image.tostring(sub_image, 'RGBA'))
+        return (ATLAS_TILE_SIZE, ATLAS_TILE_SIZE, num_layers), bytes(data)
+
+    def load(self, size, data, is_tex_array=False):
         if is_tex_array:
-            width, height = image.get_size()
-            cols = width // ATLAS_TILE_SIZE
-            rows = height // ATLAS_TILE_SIZE
-            num_layers = cols * rows
-
-            # Extraer cada tile: iteramos las filas en orden inverso para asignar la capa 0 a la fila inferior.
-            data = bytearray()
-            for row in range(rows - 1, -1, -1):
-                for col in range(cols):
-                    rect = (col * ATLAS_TILE_SIZE, row * ATLAS_TILE_SIZE, ATLAS_TILE_SIZE, ATLAS_TILE_SIZE)
-                    sub_image = image.subsurface(rect).copy()  # copy() para asegurar una imagen independiente
-                    data.extend(pg.image.tostring(sub_image, 'RGBA'))
-                    
-            texture = self.app.ctx.texture_array(
-                size=(ATLAS_TILE_SIZE, ATLAS_TILE_SIZE, num_layers),
-                components=4,
-                data=bytes(data)
-            )
+            texture = self.ctx.texture_array(size=size, components=4, data=data)
         else:
-            texture = self.ctx.texture(
-                size=image.get_size(),
-                components=4,
-                data=pg.image.tostring(image, 'RGBA', False)
-            )
+            texture = self.ctx.texture(size=size, components=4, data=data)
         texture.anisotropy = 32.0
         texture.build_mipmaps()
         texture.filter = (mgl.NEAREST, mgl.NEAREST)
@@ -1,10 +1,10 @@
 from settings import *
-from meshes.chunk_mesh_builder import get_chunk_index
 
 
 class VoxelHandler:
     def __init__(self, world):
         self.app = world.app
+        self.world = world
         self.chunks = world.chunks
 
         # ray casting result
@@ -17,30 +17,49 @@ class VoxelHandler:
 
         self.interaction_mode = 0  # 0: remove voxel   1: add voxel
         self.new_voxel_id = DIRT
+        # (chunk slot, voxel index, voxel id) of the edit done by the last set_voxel, None if it changed nothing
+        self.last_edit = None
 
     def add_voxel(self):
         if self.voxel_id:
             # check voxel id along normal
-            result = self.get_voxel_id(self.voxel_world_pos + self.voxel_normal)
+            new_voxel_pos = self.voxel_world_pos + self.voxel_normal
+            result = self.get_voxel_id(new_voxel_pos)
 
             # is the new place empty?
             if not result[0]:
-                _, voxel_index, _, chunk = result
-                chunk.voxels[voxel_index] = self.new_voxel_id
-                chunk.mesh.rebuild()
+                _, voxel_index, voxel_local_pos, chunk = result
+                chunk.set_voxel(voxel_index, self.new_voxel_id)
+                self.world.mark_modified(chunk, voxel_index)
+                self.last_edit = (chunk.slot, voxel_index, self.new_voxel_id)
+                self.rebuild_around(chunk, voxel_local_pos, new_voxel_pos)
 
                 # was it an empty chunk
                 if chunk.is_empty:
                     chunk.is_empty = False
 
+    def rebuild_layers(self, chunk, ly):
+        if chunk.mesh is None:
+            # a streamed column not meshed yet: its mesh is requested once its neighbours are loaded
+            # and is built from the voxels of that moment, edit included
+            cx, _, cz = chunk.position
+            self.world.request_column_meshes([(cx, cz)])
+            return
+        # an edit can change the faces and AO of the layers right below and above it
+        chunk.mesh.rebuild_layers(ly - 1, ly + 2)
+
     def rebuild_adj_chunk(self, adj_voxel_pos):
-        index = get_chunk_index(adj_voxel_pos)
-        if index != -1:
-            self.chunks[index].mesh.rebuild()
+        chunk = self.world.get_chunk_at(adj_voxel_pos)
+        if chunk:
+            self.rebuild_layers(chunk, adj_voxel_pos[1] - chunk.position[1] * CHUNK_SIZE)
+
+    def rebuild_around(self, chunk, voxel_local_pos, voxel_world_pos):
+        self.rebuild_layers(chunk, voxel_local_pos[1])
+        self.rebuild_adjacent_chunks(voxel_local_pos, voxel_world_pos)
 
-    def rebuild_adjacent_chunks(self):
-        lx, ly, lz = self.voxel_local_pos
-        wx, wy, wz = self.voxel_world_pos
+    def rebuild_adjacent_chunks(self, voxel_local_pos, voxel_world_pos):
+        lx, ly, lz = voxel_local_pos
+        wx, wy, wz = voxel_world_pos
 
         if lx == 0:
             self.rebuild_adj_chunk((wx - 1, wy, wz))
@@ -59,12 +78,13 @@ class VoxelHandler:
 
     def remove_voxel(self):
         if self.voxel_id:
-            self.chunk.voxels[self.voxel_index] = 0
-
-            self.chunk.mesh.rebuild()
-            self.rebuild_adjacent_chunks()
+            self.chunk.set_voxel(self.voxel_index, 0)
+            self.world.mark_modified(self.chunk, self.voxel_index)
+            self.last_edit = (self.chunk.slot, self.voxel_index, 0)
+            self.rebuild_around(self.chunk, self.voxel_local_pos, self.voxel_world_pos)
 
     def set_voxel(self):
+        self.last_edit = None
         if self.interaction_mode:
             self.add_voxel()
         else:
@@ -74,7 +94,8 @@ class VoxelHandler:
         self.interaction_mode = not self.interaction_mode
 
     def update(self):
-        self.ray_cast()
+        with self.app.profiler.scope('ray_cast'):
+            self.ray_cast()
 
     def ray_cast(self):
         # start point
@@ -135,16 +156,14 @@ class VoxelHandler:
         return False
 
     def get_voxel_id(self, voxel_world_pos):
-        cx, cy, cz = chunk_pos = voxel_world_pos / CHUNK_SIZE
-
-        if 0 <= cx < WORLD_W and 0 <= cy < WORLD_H and 0 <= cz < WORLD_D:
-            chunk_index = cx + WORLD_W * cz + WORLD_AREA * cy
-            chunk = self.chunks[chunk_index]
+        chunk = self.world.get_chunk_at(voxel_world_pos)
 
-            lx, ly, lz = voxel_local_pos = voxel_world_pos - chunk_pos * CHUNK_SIZE
+        if chunk:
+            wx, wy, wz = voxel_world_pos
+            lx, ly, lz = voxel_local_pos = glm.ivec3(wx % CHUNK_SIZE, wy % CHUNK_SIZE, wz % CHUNK_SIZE)
 
             voxel_index = lx + CHUNK_SIZE * lz + CHUNK_AREA * ly
-            voxel_id = chunk.voxels[voxel_index]
+            voxel_id = chunk.get_voxel(voxel_index)
 
             return voxel_id, voxel_index, voxel_local_pos, chunk
         return 0, 0, 0, 0
@@ -0,0 +1,270 @@
+from settings import *
+import collections
+import contextlib
+import threading
+
+# storage kind of a chunk, kept in the 2 low bits of its ref
+UNIFORM = 0  # every voxel has the same id, stored in the ref itself; no voxel array at all
+PALETTE = 1  # a row of the pool with PALETTE_SIZE ids followed by one 4-bit palette index per voxel
+DENSE = 2  # a row of the pool with one byte per voxel
+
+PALETTE_SIZE = 16
+PACKED_SIZE = CHUNK_VOL // 2
+ROW_SIZES = {PALETTE: PALETTE_SIZE + PACKED_SIZE, DENSE: CHUNK_VOL}
+
+
+@njit(cache=True)
+def get_voxel(voxel_refs, voxel_pool, slot, voxel_index):
+    ref = voxel_refs[slot]
+    kind = ref & 3
+    if kind == UNIFORM:
+        return ref >> 2
+    offset = ref >> 2
+    if kind == PALETTE:
+        byte = voxel_pool[offset + PALETTE_SIZE + (voxel_index >> 1)]
+        return voxel_pool[offset + ((byte >> ((voxel_index & 1) << 2)) & 15)]
+    return voxel_pool[offset + voxel_index]
+
+
+@njit(cache=True)
+def get_palette(voxels, palette):
+    """Escribe en palette los ids presentes en voxels, en orden, y devuelve cuántos hay."""
+    seen = np.zeros(256, dtype=np.bool_)
+    for voxel_id in voxels:
+        seen[voxel_id] = True
+
+    size = 0
+    for voxel_id in range(256):
+        if seen[voxel_id]:
+            if size < len(palette):
+                palette[size] = voxel_id
+            size += 1
+    return size
+
+
+@njit(cache=True)
+def pack_voxels(voxels, palette, palette_size, row):
+    lookup = np.zeros(256, dtype=np.uint8)
+    for i in range(palette_size):
+        lookup[palette[i]] = i
+    row[:PALETTE_SIZE] = palette
+    for i in range(PACKED_SIZE):
+        row[PALETTE_SIZE + i] = lookup[voxels[2 * i]] | (lookup[voxels[2 * i + 1]] << 4)
+
+
+@njit(cache=True)
+def unpack_voxels(row, voxels):
+    for i in range(PACKED_SIZE):
+        byte = row[PALETTE_SIZE + i]
+        voxels[2 * i] = row[byte & 15]
+        voxels[2 * i + 1] = row[byte >> 4]
+
+
+class VoxelStore:
+    """
+    Voxeles de todos los slots del almacén de chunks, comprimidos según su contenido.
+
+    Un chunk uniforme (todo aire o todo piedra) solo guarda su id. Un chunk con hasta
+    PALETTE_SIZE ids distintos guarda una paleta y 4 bits por voxel; el resto, un byte por voxel.
+    Cada slot tiene una referencia de 64 bits, (offset << 2) | kind, o (voxel_id << 2) si es
+    uniforme, y las filas comprimidas viven en un único pool de bytes que se reutiliza al
+    descargar chunks. Las mallas leen los voxeles con get_voxel(refs, pool, slot, index).
+
+    Las ediciones solo promocionan el chunk (uniforme -> paleta -> denso); set_chunks lo
+    vuelve a comprimir al máximo.
+
+    Los hilos que leen refs y pool mientras el principal los cambia (las mallas, la red) lo hacen entre
+    begin_read y end_read: una fila liberada no se reutiliza hasta que acaban todas las lecturas que
+    empezaron antes, porque aún pueden llegar a ella con las referencias que copiaron.
+    """
+    def __init__(self, num_slots):
+        self.refs = np.zeros(num_slots, dtype='int64')
+        self.palette_sizes = np.ones(num_slots, dtype='uint8')
+        self.pool = np.empty(0, dtype='uint8')
+        # offsets of the unused rows of each kind
+        self.free_rows = {PALETTE: [], DENSE: []}
+        # generation of the last read begun and how many reads of each generation are still going on
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.readers = collections.Counter()
+        # (generation, kind, offset) of the rows freed while some read was going on, oldest first
+        self.retired = collections.deque()
+
+    @property
+    def nbytes(self):
+        return self.refs.nbytes + self.palette_sizes.nbytes + self.pool.nbytes
+
+    def get_kind(self, slot):
+        return int(self.refs[slot]) & 3
+
+    def get_row(self, slot):
+        offset = int(self.refs[slot]) >> 2
+        return self.pool[offset:offset + ROW_SIZES[self.get_kind(slot)]]
+
+    def is_empty(self, slot):
+        return bool(self.refs[slot] == 0)
+
+    def get_voxel(self, slot, voxel_index):
+        ref = int(self.refs[slot])
+        kind = ref & 3
+        if kind == UNIFORM:
+            return ref >> 2
+        offset = ref >> 2
+        if kind == PALETTE:
+            byte = self.pool[offset + PALETTE_SIZE + (voxel_index >> 1)]
+            return self.pool[offset + ((byte >> ((voxel_index & 1) << 2)) & 15)]
+        return self.pool[offset + voxel_index]
+
+    def set_voxel(self, slot, voxel_index, voxel_id):
+        kind = self.get_kind(slot)
+        if kind == UNIFORM:
+            uniform_id = int(self.refs[slot]) >> 2
+            if voxel_id == uniform_id:
+                return
+            # every voxel points to palette entry 0, the old uniform id
+            offset = self.alloc_rows(PALETTE, 1)[0]
+            self.pool[offset:offset + ROW_SIZES[PALETTE]] = 0
+            self.pool[offset] = uniform_id
+            self.palette_sizes[slot] = 1
+            self.refs[slot] = offset << 2 | PALETTE
+            kind = PALETTE
+
+        row = self.get_row(slot)
+        if kind == PALETTE:
+            size = self.palette_sizes[slot]
+            matches = np.flatnonzero(row[:size] == voxel_id)
+            if len(matches):
+                self.set_packed(row, voxel_index, matches[0])
+                return
+            if size < PALETTE_SIZE:
+                row[size] = voxel_id
+                self.palette_sizes[slot] = size + 1
+                self.set_packed(row, voxel_index, size)
+                return
+            row = self.promote_to_dense(slot)
+        row[voxel_index] = voxel_id
+
+    @staticmethod
+    def set_packed(row, voxel_index, palette_index):
+        shift = (voxel_index & 1) << 2
+        i = PALETTE_SIZE + (voxel_index >> 1)
+        row[i] = (row[i] & (0xF0 >> shift)) | (palette_index << shift)
+
+    def promote_to_dense(self, slot):
+        offset = self.alloc_rows(DENSE, 1)[0]
+        row = self.pool[offset:offset + CHUNK_VOL]
+        old_offset = int(self.refs[slot]) >> 2
+        unpack_voxels(self.get_row(slot), row)
+        # a single store switches the slot, so a mesh worker reading it always finds a valid row
+        self.refs[slot] = offset << 2 | DENSE
+        self.release_row(PALETTE, old_offset)
+        return row
+
+    def get_chunk(self, slot, out=None):
+        """Devuelve los voxeles del slot descomprimidos en un array de CHUNK_VOL bytes."""
+        if out is None:
+            out = np.empty(CHUNK_VOL, dtype='uint8')
+        kind = self.get_kind(slot)
+        if kind == UNIFORM:
+            out[:] = int(self.refs[slot]) >> 2
+        elif kind == PALETTE:
+            unpack_voxels(self.get_row(slot), out)
+        else:
+            out[:] = self.get_row(slot)
+        return out
+
+    def get_chunks(self, slots):
+        voxels = np.empty([len(slots), CHUNK_VOL], dtype='uint8')
+        for i, slot in enumerate(slots):
+            self.get_chunk(slot, voxels[i])
+        return voxels
+
+    def set_chunks(self, slots, voxels):
+        """Comprime voxels[i] en slots[i] con el formato más pequeño posible."""
+        palettes = np.zeros([len(slots), PALETTE_SIZE], dtype='uint8')
+        sizes = np.array([get_palette(voxels[i], palettes[i]) for i in range(len(slots))], dtype='int64')
+        kinds = np.where(sizes == 1, UNIFORM, np.where(sizes <= PALETTE_SIZE, PALETTE, DENSE))
+
+        for slot in slots:
+            self.free(slot)
+        rows = {kind: iter(self.alloc_rows(kind, np.count_nonzero(kinds == kind))) for kind in (PALETTE, DENSE)}
+
+        for i, slot in enumerate(slots):
+            kind = kinds[i]
+            if kind == UNIFORM:
+                self.refs[slot] = int(palettes[i, 0]) << 2
+                continue
+            offset = next(rows[kind])
+            row = self.pool[offset:offset + ROW_SIZES[kind]]
+            if kind == PALETTE:
+                pack_voxels(voxels[i], palettes[i], sizes[i], row)
+                self.palette_sizes[slot] = sizes[i]
+            else:
+                row[:] = voxels[i]
+            self.refs[slot] = offset << 2 | kind
+
+    def free(self, slot):
+        """Devuelve la fila del slot al pool y lo deja vacío (uniforme de aire)."""
+        kind = self.get_kind(slot)
+        offset = int(self.refs[slot]) >> 2
+        self.refs[slot] = 0
+        if kind != UNIFORM:
+            self.release_row(kind, offset)
+
+    def begin_read(self):
+        """Empieza una lectura desde otro hilo; devuelve su generación, que se pasa a end_read al acabar."""
+        with self.lock:
+            self.generation += 1
+            self.readers[self.generation] += 1
+            return self.generation
+
+    def end_read(self, generation):
+        with self.lock:
+            self.readers[generation] -= 1
+            if not self.readers[generation]:
+                del self.readers[generation]
+
+    @contextlib.contextmanager
+    def reading(self):
+        # begin_read and end_read for a read done in a single block of one thread
+        generation = self.begin_read()
+        try:
+            yield
+        finally:
+            self.end_read(generation)
+
+    def release_row(self, kind, offset):
+        with self.lock:
+            if self.readers:
+                # a read begun before this may still reach the row through the refs it copied
+                self.retired.append((self.generation, kind, offset))
+                return
+        self.free_rows[kind].append(offset)
+
+    def recycle(self):
+        """Pasa a las filas libres las liberadas antes de que empezara la lectura más antigua en curso."""
+        with self.lock:
+            oldest = min(self.readers, default=self.generation + 1)
+        while self.retired and self.retired[0][0] < oldest:
+            _, kind, offset = self.retired.popleft()
+            self.free_rows[kind].append(offset)
+
+    def alloc_rows(self, kind, count):
+        self.recycle()
+        free_rows = self.free_rows[kind]
+        missing = count - len(free_rows)
+        if missing > 0:
+            self.grow(kind, max(missing, 8))
+        rows, free_rows[:] = free_rows[:count], free_rows[count:]
+        return rows
+
+    def grow(self, kind, count):
+        """
+        Añade count filas de tipo kind al pool. Las referencias también se copian, así los
+        hilos que siguen generando mallas con el pool anterior nunca apuntan fuera de él.
+        """
+        first_offset = len(self.pool)
+        row_size = ROW_SIZES[kind]
+        self.pool = np.concatenate([self.pool, np.zeros(count * row_size, dtype='uint8')])
+        self.refs = self.refs.copy()
+        self.free_rows[kind].extend(range(first_offset, first_offset + count * row_size, row_size))
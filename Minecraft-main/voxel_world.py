@@ -0,0 +1,261 @@
+from settings import *
+from world_objects.chunk import Chunk
+from terrain_gen import generate_chunks, generate_heightmaps
+from world_storage import WorldStorage
+from chunk_streamer import ChunkStreamer
+from voxel_store import VoxelStore
+import collections
+import itertools
+import threading
+
+# slot_coords / column_coords value of an empty slot
+NO_CHUNK = np.iinfo(np.int32).min
+# chunks decoded or generated at once before being compressed into the voxel store
+LOAD_BATCH = 64
+
+
+class VoxelWorld:
+    """
+    Los voxeles del mundo sin nada de gráficos: los chunks cargados, sus versiones y ediciones, y cómo
+    se cargan, generan y guardan. World le añade las mallas y el render; el servidor dedicado
+    (dedicated_server.py) lo usa tal cual, sin pygame ni OpenGL.
+    """
+    def __init__(self, app=None):
+        self.app = app
+        # chunk store: a ring buffer of chunk columns, see get_slot
+        self.chunks = [None for _ in range(STORE_VOL)]
+        self.voxel_store = VoxelStore(STORE_VOL)
+        self.slot_coords = np.full([STORE_VOL, 3], NO_CHUNK, dtype='int32')
+        # centre of the chunk in every slot for the frustum test, NaN in empty slots
+        self.chunk_centers = np.full([STORE_VOL, 3], np.nan, dtype='float32')
+        # height of the generated terrain, one CHUNK_SIZE x CHUNK_SIZE tile per chunk column
+        self.heightmap = np.empty([STORE_AREA, CHUNK_SIZE, CHUNK_SIZE], dtype='int16')
+        self.column_coords = np.full([STORE_AREA, 2], NO_CHUNK, dtype='int32')
+
+        self.storage = WorldStorage()
+        # chunks edited since the last save
+        self.modified_chunks = set()
+        # the world version goes up with every edit; chunk_versions is the version of the last edit of every slot,
+        # or the one it was loaded at
+        self.version = 0
+        self.chunk_versions = np.zeros(STORE_VOL, dtype='int64')
+        # (version, slot, voxel index) of the last voxel edits, every edit after edit_log_start is in it
+        self.edit_log = collections.deque()
+        self.edit_log_start = 0
+        # edits come from the main thread and the network threads; it also guards modified_chunks
+        self.edit_lock = threading.Lock()
+
+    @staticmethod
+    def get_column_slot(cx, cz):
+        return cx % STORE_W + STORE_W * (cz % STORE_D)
+
+    @staticmethod
+    def get_slot(cx, cy, cz):
+        # in the fixed grid this is the usual chunk index x + WORLD_W * z + WORLD_AREA * y
+        return cx % STORE_W + STORE_W * (cz % STORE_D) + STORE_AREA * cy
+
+    def get_chunk(self, cx, cy, cz):
+        """Chunk cargado en la posición de chunk (cx, cy, cz), o None."""
+        if not (0 <= cy < WORLD_H):
+            return None
+        chunk = self.chunks[self.get_slot(cx, cy, cz)]
+        if chunk is None or chunk.position != (cx, cy, cz):
+            return None
+        return chunk
+
+    def get_chunk_at(self, voxel_world_pos):
+        wx, wy, wz = voxel_world_pos
+        return self.get_chunk(wx // CHUNK_SIZE, wy // CHUNK_SIZE, wz // CHUNK_SIZE)
+
+    def is_column_loaded(self, cx, cz):
+        column_slot = self.get_column_slot(cx, cz)
+        return tuple(self.column_coords[column_slot]) == (cx, cz)
+
+    @staticmethod
+    def is_outside(cx, cz):
+        # the fixed grid has borders, the streamed world goes on forever
+        return not CHUNK_STREAMING and not (0 <= cx < WORLD_W and 0 <= cz < WORLD_D)
+
+    @staticmethod
+    def get_initial_columns(position):
+        """Columnas que se cargan al empezar con el jugador en position."""
+        if CHUNK_STREAMING:
+            return ChunkStreamer.get_columns_around(*ChunkStreamer.get_column(position))
+        return [(x, z) for z in range(WORLD_D) for x in range(WORLD_W)]
+
+    @staticmethod
+    def generate_terrain(columns, with_voxels=True):
+        """
+        Voxeles de las columnas en un almacén nuevo y sus alturas, sin crear el mundo: World(app, terrain)
+        los usa en lugar de cargarlos. Solo usa la CPU, así que puede ir en otro hilo.
+        Sin with_voxels los chunks se quedan vacíos, para un cliente que recibe los voxeles del servidor.
+        """
+        voxel_store = VoxelStore(STORE_VOL)
+        if not with_voxels:
+            return columns, voxel_store, VoxelWorld.generate_heightmap(columns)
+        return columns, voxel_store, VoxelWorld.load_column_voxels(columns, voxel_store, WorldStorage())
+
+    @staticmethod
+    def generate_heightmap(columns):
+        # one CHUNK_SIZE x CHUNK_SIZE tile per column
+        heightmap = np.empty([len(columns), CHUNK_SIZE, CHUNK_SIZE], dtype='int16')
+        generate_heightmaps(heightmap, np.array(columns, dtype='int32'))
+        return heightmap
+
+    def build_chunks(self, terrain=None, position=PLAYER_POS):
+        """Carga las columnas iniciales alrededor de position, o las de terrain si ya se generaron."""
+        if terrain is None:
+            self.load_columns(self.get_initial_columns(position))
+            return
+        columns, self.voxel_store, heightmap = terrain
+        self.load_columns(columns, heightmap)
+
+    def load_columns(self, columns, heightmap=None):
+        """
+        Carga las columnas de chunks indicadas, desde la partida guardada o generándolas.
+        Los chunks que ocupaban sus slots se descargan antes. Si se da heightmap, los voxeles
+        ya están en el almacén (ver generate_terrain) y estas son las alturas de las columnas.
+        Devuelve los slots de los chunks cargados.
+        """
+        self.unload_columns([column for column in columns if self.chunks[self.get_column_slot(*column)]])
+        if heightmap is None:
+            heightmap = self.load_column_voxels(columns, self.voxel_store, self.storage)
+
+        column_slots = [self.get_column_slot(cx, cz) for cx, cz in columns]
+        self.heightmap[column_slots] = heightmap
+        self.column_coords[column_slots] = np.array(columns, dtype='int32')
+
+        positions = [(cx, cy, cz) for cx, cz in columns for cy in range(WORLD_H)]
+        slots = [self.get_slot(*position) for position in positions]
+        for slot, position in zip(slots, positions):
+            chunk = Chunk(self, position=position)
+            chunk.slot = slot
+            chunk.is_empty = self.voxel_store.is_empty(slot)
+            self.chunks[slot] = chunk
+            self.slot_coords[slot] = position
+            self.chunk_centers[slot] = chunk.center
+        # the versions of the chunks that were in the slots do not apply to the new ones: these start at
+        # the current version, so a client behind it gets them and (version, position) tells them apart
+        with self.edit_lock:
+            self.chunk_versions[slots] = self.version
+        return slots
+
+    @staticmethod
+    def load_column_voxels(columns, voxel_store, storage):
+        """
+        Genera las alturas del terreno de las columnas y guarda los voxeles de sus chunks en los slots
+        de voxel_store, desde storage o generándolos. No toca el estado del mundo. Devuelve las alturas,
+        una tabla de CHUNK_SIZE x CHUNK_SIZE por columna.
+        """
+        # the terrain height of each column is shared by all the chunks above it
+        heightmap = VoxelWorld.generate_heightmap(columns)
+
+        positions = [(cx, cy, cz) for cx, cz in columns for cy in range(WORLD_H)]
+        slots = [VoxelWorld.get_slot(*position) for position in positions]
+        chunk_positions = np.array(positions, dtype='int32')
+        # index of the column of every chunk in heightmap
+        column_ids = np.repeat(np.arange(len(columns), dtype='int64'), WORLD_H)
+        for start in range(0, len(slots), LOAD_BATCH):
+            batch = slice(start, start + LOAD_BATCH)
+            VoxelWorld.load_chunk_voxels(
+                chunk_positions[batch], slots[batch], heightmap, column_ids[batch], voxel_store, storage
+            )
+        return heightmap
+
+    @staticmethod
+    def load_chunk_voxels(chunk_positions, slots, heightmap, column_ids, voxel_store, storage):
+        voxels = np.zeros([len(slots), CHUNK_VOL], dtype='uint8')
+        found = np.zeros(len(slots), dtype=np.bool_)
+        if storage.has_world():
+            found = storage.load_chunks(chunk_positions, voxels)
+
+        # chunks missing from the save are generated in parallel
+        missing = np.flatnonzero(~found)
+        if len(missing) == len(slots):
+            VoxelWorld.generate_chunks(chunk_positions, voxels, heightmap, column_ids)
+        elif len(missing):
+            generated = np.zeros([len(missing), CHUNK_VOL], dtype='uint8')
+            VoxelWorld.generate_chunks(chunk_positions[missing], generated, heightmap, column_ids[missing])
+            voxels[missing] = generated
+        voxel_store.set_chunks(slots, voxels)
+
+    @staticmethod
+    def generate_chunks(chunk_positions, voxels, heightmap, column_ids):
+        is_empty = np.empty(len(chunk_positions), dtype=np.bool_)
+        generate_chunks(voxels, chunk_positions, heightmap, column_ids, is_empty)
+        return is_empty
+
+    def unload_columns(self, columns):
+        """Descarga las columnas que ocupan los slots de columns, guardando antes los chunks editados."""
+        evicted = []
+        for cx, cz in columns:
+            self.column_coords[self.get_column_slot(cx, cz)] = NO_CHUNK
+            for cy in range(WORLD_H):
+                slot = self.get_slot(cx, cy, cz)
+                chunk = self.chunks[slot]
+                if chunk is None:
+                    continue
+                evicted.append(chunk)
+                self.chunks[slot] = None
+                self.slot_coords[slot] = NO_CHUNK
+                self.chunk_centers[slot] = np.nan
+
+        with self.edit_lock:
+            modified = [chunk for chunk in evicted if chunk in self.modified_chunks]
+            self.modified_chunks.difference_update(modified)
+        if modified:
+            self.storage.save_chunks([chunk.position for chunk in modified], [chunk.get_voxels() for chunk in modified])
+        for chunk in evicted:
+            self.voxel_store.free(chunk.slot)
+
+    def get_column_heights(self, cx, cz):
+        return self.heightmap[self.get_column_slot(cx, cz)]
+
+    def get_height(self, wx, wz):
+        """Altura del terreno generado en la columna de voxeles (wx, wz); 0 si no está cargada."""
+        cx, cz = wx // CHUNK_SIZE, wz // CHUNK_SIZE
+        if not self.is_column_loaded(cx, cz):
+            return 0
+        return int(self.get_column_heights(cx, cz)[wx % CHUNK_SIZE, wz % CHUNK_SIZE])
+
+    def get_spawn_position(self, x, z):
+        """Posición justo por encima del terreno en (x, z)."""
+        return glm.vec3(x, self.get_height(int(x), int(z)) + 2, z)
+
+    def mark_modified(self, chunk, voxel_index=None):
+        """Marca el chunk como editado: solo el voxel voxel_index o, sin él, todo el chunk."""
+        with self.edit_lock:
+            self.modified_chunks.add(chunk)
+            self.version += 1
+            self.chunk_versions[chunk.slot] = self.version
+            if voxel_index is None:
+                # the log can no longer tell what changed up to here
+                self.edit_log.clear()
+                self.edit_log_start = self.version
+                return
+            if len(self.edit_log) == EDIT_LOG_SIZE:
+                self.edit_log_start = self.edit_log.popleft()[0]
+            self.edit_log.append((self.version, chunk.slot, voxel_index))
+
+    def get_changes(self, version):
+        """
+        Cambios del mundo posteriores a version: (versión actual, [(slot, índice de voxel)] de las ediciones, None)
+        si el registro de ediciones llega hasta version, o (versión actual, None, slots de los chunks cambiados).
+        """
+        with self.edit_lock:
+            if version >= self.edit_log_start:
+                # the log holds the consecutive versions edit_log_start + 1 .. self.version
+                start = len(self.edit_log) - (self.version - version)
+                edits = [(slot, voxel_index) for _, slot, voxel_index in itertools.islice(self.edit_log, start, None)]
+                return self.version, edits, None
+            return self.version, None, np.flatnonzero(self.chunk_versions > version)
+
+    def save(self):
+        """Guarda los chunks modificados, o todos los cargados si todavía no hay partida guardada."""
+        # taken and cleared at once, so an edit made while saving is kept for the next save
+        with self.edit_lock:
+            chunks = list(self.modified_chunks)
+            self.modified_chunks.clear()
+        if not self.storage.has_world():
+            chunks = [chunk for chunk in self.chunks if chunk]
+        self.storage.save_chunks([chunk.position for chunk in chunks], [chunk.get_voxels() for chunk in chunks])
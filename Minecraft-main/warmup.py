@@ -0,0 +1,163 @@
+"""
+Compila, o carga de la caché de numba, todas las funciones jitted antes de empezar: genera y malla una
+columna de chunks con los mismos tipos que el juego, así ningún frame ni ningún hilo de mallas paga la
+compilación. La caché vive en __pycache__/numba (ver JIT_SOURCES en settings.py).
+
+Uso: python warmup.py   (precompila; las siguientes partidas arrancan con la caché caliente)
+     python warmup.py --prune   (además borra las cachés de versiones anteriores del código)
+"""
+from settings import *
+from numba import types
+from numba.core.dispatcher import Dispatcher
+import shutil
+import sys
+import time
+import noise
+import terrain_gen
+import voxel_store
+import occlusion
+import frustum
+from camera import Camera
+from meshes import chunk_mesh_builder
+from meshes.cloud_mesh import CloudMesh
+from voxel_store import VoxelStore, ROW_SIZES, PALETTE
+
+
+def get_dispatchers():
+    modules = (noise, terrain_gen, voxel_store, chunk_mesh_builder, occlusion, frustum)
+    dispatchers = {id(obj): obj for module in modules for obj in vars(module).values() if isinstance(obj, Dispatcher)}
+    dispatchers[id(CloudMesh.gen_clouds)] = CloudMesh.gen_clouds
+    dispatchers[id(CloudMesh.build_mesh)] = CloudMesh.build_mesh
+    return list(dispatchers.values())
+
+
+def prune_jit_cache():
+    """
+    Borra las cachés de numba de versiones anteriores del código: cada cambio en JIT_SOURCES crea una
+    carpeta nueva y las viejas ya no se leen. Solo toca la carpeta por defecto, no una NUMBA_CACHE_DIR
+    elegida por el usuario. No se llama al arrancar el juego ni el servidor: otra copia del código que
+    comparta la carpeta puede estar usando una de esas cachés; solo con python warmup.py --prune.
+    """
+    if os.environ.get('NUMBA_CACHE_DIR') != JIT_CACHE_DIR or not os.path.isdir(JIT_CACHE_ROOT):
+        return
+    for name in os.listdir(JIT_CACHE_ROOT):
+        path = os.path.join(JIT_CACHE_ROOT, name)
+        if path != JIT_CACHE_DIR and os.path.isdir(path):
+            # another process may be removing it too
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def get_cache_stats(dispatchers):
+    """Firmas compiladas y cargadas de la caché hasta ahora por todas las funciones jitted."""
+    misses = sum(sum(dispatcher.stats.cache_misses.values()) for dispatcher in dispatchers)
+    hits = sum(sum(dispatcher.stats.cache_hits.values()) for dispatcher in dispatchers)
+    return misses, hits
+
+
+def warm_terrain(state):
+    column_positions = np.zeros([1, 2], dtype='int32')
+    heightmap = np.empty([1, CHUNK_SIZE, CHUNK_SIZE], dtype='int16')
+    terrain_gen.generate_heightmaps(heightmap, column_positions)
+
+    chunk_positions = np.array([(0, y, 0) for y in range(WORLD_H)], dtype='int32')
+    state['voxels'] = voxels = np.zeros([WORLD_H, CHUNK_VOL], dtype='uint8')
+    column_ids = np.zeros(WORLD_H, dtype='int64')
+    is_empty = np.empty(WORLD_H, dtype=np.bool_)
+    terrain_gen.generate_chunks(voxels, chunk_positions, heightmap, column_ids, is_empty)
+
+
+def warm_voxel_store(state):
+    slots = [STORE_AREA * y for y in range(WORLD_H)]
+    state['store'] = store = VoxelStore(STORE_VOL)
+    store.set_chunks(slots, state['voxels'])
+    voxel_store.unpack_voxels(np.zeros(ROW_SIZES[PALETTE], dtype='uint8'), np.empty(CHUNK_VOL, dtype='uint8'))
+
+    state['slot_coords'] = slot_coords = np.zeros([STORE_VOL, 3], dtype='int32')
+    slot_coords[slots, 1] = range(WORLD_H)
+
+
+def warm_meshes(state):
+    store = state['store']
+    state['padded_voxels'] = padded_voxels = chunk_mesh_builder.build_padded_voxels(
+        chunk_voxels=state['voxels'][0],
+        chunk_pos=(0, 0, 0),
+        voxel_refs=store.refs,
+        voxel_pool=store.pool,
+        slot_coords=state['slot_coords']
+    )
+    # the same calls as ChunkMesh.build_sections
+    builder = chunk_mesh_builder.build_chunk_mesh_greedy if GREEDY_MESHING else chunk_mesh_builder.build_chunk_mesh
+    builder(padded_voxels, y_min=0, y_max=SECTION_HEIGHT)
+
+
+def warm_lod_meshes(state):
+    chunk_mesh_builder.build_chunk_mesh_lod(state['padded_voxels'], 1 << 1)
+
+
+def warm_culling(state):
+    connectivity = np.zeros([STORE_VOL, 6], dtype='uint8')
+    connectivity[0] = occlusion.get_face_connectivity(state['voxels'][0])
+
+    camera = Camera((CHUNK_SIZE / 2, CHUNK_SIZE / 2, CHUNK_SIZE / 2), -90, 0)
+    camera.update()
+    chunk_centers = ((state['slot_coords'] + 0.5) * CHUNK_SIZE).astype('float32')
+    visible = camera.frustum.get_visible(chunk_centers, margin=CULLING_MOVE_THRESHOLD, angle_margin=CULLING_TURN_THRESHOLD)
+    occlusion.get_reachable_chunks(visible, (0, 0, 0), state['slot_coords'], connectivity)
+
+
+def warm_clouds(state):
+    # the cloud layer covers the whole world: compile without running
+    cloud_data = types.Array(types.uint8, 1, 'C')
+    CloudMesh.gen_clouds.compile((cloud_data,))
+    CloudMesh.build_mesh.compile((cloud_data,))
+
+
+STEPS = (
+    ('terreno', warm_terrain),
+    ('almacén de voxeles', warm_voxel_store),
+    ('mallas', warm_meshes),
+    ('mallas LOD', warm_lod_meshes),
+    ('culling', warm_culling),
+    ('nubes', warm_clouds),
+)
+# the dedicated server only generates and stores voxels
+SERVER_STEPS = STEPS[:2]
+
+
+def warmup(steps=STEPS):
+    """
+    Ejecuta los pasos de steps y devuelve, por paso, (nombre, segundos, firmas compiladas, firmas
+    cargadas de la caché). Casi todo el tiempo es de numba: los datos de cada paso son diminutos.
+    """
+    dispatchers = get_dispatchers()
+    report = []
+    state = {}
+    for name, step in steps:
+        misses, hits = get_cache_stats(dispatchers)
+        start = time.perf_counter()
+        step(state)
+        elapsed = time.perf_counter() - start
+        new_misses, new_hits = get_cache_stats(dispatchers)
+        report.append((name, elapsed, new_misses - misses, new_hits - hits))
+    return report
+
+
+def get_summary(report):
+    elapsed = sum(step[1] for step in report)
+    compiled = sum(step[2] for step in report)
+    cached = sum(step[3] for step in report)
+    return f'JIT {elapsed:.2f} s ({compiled} compiladas, {cached} de caché)'
+
+
+def print_report(report):
+    print(f'{"paso":<20}{"s":>8}{"compiladas":>12}{"de caché":>10}')
+    for name, elapsed, compiled, cached in report:
+        print(f'{name:<20}{elapsed:>8.2f}{compiled:>12}{cached:>10}')
+    print(get_summary(report))
+
+
+if __name__ == '__main__':
+    print(f'caché de numba: {os.environ["NUMBA_CACHE_DIR"]}')
+    if '--prune' in sys.argv:
+        prune_jit_cache()
+    print_report(warmup())
@@ -1,39 +1,180 @@
 from settings import *
-from world_objects.chunk import Chunk
+from voxel_world import VoxelWorld, NO_CHUNK
 from voxel_handler import VoxelHandler
+from meshes.mesh_builder_pool import MeshBuilderPool
+from meshes.chunk_arena import ChunkArena
+from chunk_streamer import ChunkStreamer
+from occlusion import get_reachable_chunks, ALL_CONNECTED
 
 
-class World:
-    def __init__(self, app):
-        self.app = app
-        self.chunks = [None for _ in range(WORLD_VOL)]
-        self.voxels = np.empty([WORLD_VOL, CHUNK_VOL], dtype='uint8')
-        self.build_chunks()
+class World(VoxelWorld):
+    def __init__(self, app, terrain=None):
+        # terrain: generate_terrain of the first columns, if it was made in a startup thread
+        super().__init__(app)
+        # faces of every chunk connected through air, see occlusion.py; chunks not meshed yet connect them all
+        self.chunk_connectivity = np.zeros([STORE_VOL, 6], dtype='uint8')
+        # slots that passed the last culling and the camera (position, forward, right, chunk) it was made from
+        self.visible_slots = None
+        self.culling_camera = None
+        # chunks inside the frustum in the last culling, before the occlusion culling (for stats)
+        self.num_frustum_visible = 0
+        # level of detail of every slot and the player position they were picked from
+        self.chunk_lods = np.zeros(STORE_VOL, dtype='int8')
+        self.lod_position = None
+
+        self.mesh_pool = MeshBuilderPool(self)
+        # vertex buffer shared by every chunk mesh
+        self.chunk_arena = ChunkArena(app.ctx, app.shader_program.chunk, STORE_VOL)
+        # chunk columns whose meshes have been requested
+        self.meshed_columns = set()
+
+        self.streamer = ChunkStreamer(self) if CHUNK_STREAMING else None
+        self.build_chunks(terrain, app.player.position)
+        self.place_player()
         self.build_chunk_mesh()
         self.voxel_handler = VoxelHandler(self)
 
     def update(self):
+        if self.app.net_manager:
+            with self.app.profiler.scope('network.message'):
+                self.app.net_manager.update()
+        if self.streamer:
+            self.streamer.update()
         self.voxel_handler.update()
+        self.update_lods()
+        self.mesh_pool.update()
 
-    def build_chunks(self):
-        for x in range(WORLD_W):
-            for y in range(WORLD_H):
-                for z in range(WORLD_D):
-                    chunk = Chunk(self, position=(x, y, z))
+    def load_columns(self, columns, heightmap=None):
+        slots = super().load_columns(columns, heightmap)
+        self.chunk_connectivity[slots] = ALL_CONNECTED
+        self.visible_slots = None
+        self.chunk_lods[slots] = self.get_lods(self.get_chunk_distances(slots))
+        return slots
 
-                    chunk_index = x + WORLD_W * z + WORLD_AREA * y
-                    self.chunks[chunk_index] = chunk
+    def unload_columns(self, columns):
+        # the meshes go before the voxels they were built from
+        for cx, cz in columns:
+            self.meshed_columns.discard(tuple(self.column_coords[self.get_column_slot(cx, cz)]))
+            for cy in range(WORLD_H):
+                chunk = self.chunks[self.get_slot(cx, cy, cz)]
+                if chunk is None:
+                    continue
+                self.mesh_pool.cancel(chunk)
+                if chunk.mesh:
+                    chunk.mesh.release()
+        super().unload_columns(columns)
+        self.visible_slots = None
 
-                    # put the chunk voxels in a separate array
-                    self.voxels[chunk_index] = chunk.build_voxels()
+    def place_player(self):
+        # lift the player out of the ground if the spawn point is inside the terrain
+        player = self.app.player
+        spawn = self.get_spawn_position(player.position.x, player.position.z)
+        player.position.y = max(player.position.y, spawn.y)
 
-                    # get pointer to voxels
-                    chunk.voxels = self.voxels[chunk_index]
+    def is_column_ready(self, cx, cz):
+        # a column can be meshed once every horizontal neighbour is there, so its border faces are right
+        return self.is_column_loaded(cx, cz) and all(
+            self.is_outside(nx, nz) or self.is_column_loaded(nx, nz)
+            for nx, nz in ((cx - 1, cz), (cx + 1, cz), (cx, cz - 1), (cx, cz + 1))
+        )
 
-    def build_chunk_mesh(self):
-        for chunk in self.chunks:
+    def request_column_meshes(self, columns):
+        """Pide la malla de las columnas listas entre columns y sus vecinas que aún no la tengan."""
+        candidates = set()
+        for cx, cz in columns:
+            candidates.update(((cx, cz), (cx - 1, cz), (cx + 1, cz), (cx, cz - 1), (cx, cz + 1)))
+
+        for cx, cz in candidates:
+            if (cx, cz) in self.meshed_columns or not self.is_column_ready(cx, cz):
+                continue
+            self.meshed_columns.add((cx, cz))
+            for cy in range(WORLD_H):
+                self.request_chunk_mesh(self.chunks[self.get_slot(cx, cy, cz)])
+
+    def request_chunk_mesh(self, chunk):
+        if chunk.mesh is None:
             chunk.build_mesh()
+        chunk.is_empty = self.voxel_store.is_empty(chunk.slot)
+        if not chunk.is_empty:
+            self.mesh_pool.request(chunk)
+
+    def build_chunk_mesh(self):
+        # the meshes are generated in the background, nearest chunks first
+        self.meshed_columns.clear()
+        self.request_column_meshes({tuple(coords) for coords in self.column_coords if coords[0] != NO_CHUNK})
+
+    def get_chunk_distances(self, slots=slice(None)):
+        # NaN for empty slots
+        return np.linalg.norm(self.chunk_centers[slots] - np.array(self.app.player.position), axis=1)
+
+    @staticmethod
+    def get_lods(distances, lods=None):
+        """
+        Nivel de detalle para cada distancia. Si se dan los niveles actuales, un chunk solo sube de
+        nivel LOD_HYSTERESIS voxeles después del límite y solo baja LOD_HYSTERESIS voxeles antes.
+        """
+        limits = np.array(LOD_DISTANCES, dtype='float32')
+        if lods is None:
+            return np.searchsorted(limits, distances)
+        return np.clip(lods, np.searchsorted(limits + LOD_HYSTERESIS, distances),
+                       np.searchsorted(limits - LOD_HYSTERESIS, distances))
+
+    def update_lods(self):
+        """Cambia el nivel de detalle de los chunks cuya distancia al jugador ha cruzado un límite."""
+        position = self.app.player.position
+        if self.lod_position is not None and glm.distance(position, self.lod_position) < LOD_UPDATE_DISTANCE:
+            return
+        self.lod_position = glm.vec3(position)
+
+        distances = self.get_chunk_distances()
+        lods = self.get_lods(distances, self.chunk_lods)
+        changed = np.flatnonzero((lods != self.chunk_lods) & ~np.isnan(distances))
+        self.chunk_lods[changed] = lods[changed]
+        for slot in changed:
+            chunk = self.chunks[slot]
+            if chunk.mesh and not chunk.is_empty:
+                chunk.mesh.update_lod()
+
+    def set_connectivity(self, slot, connectivity):
+        if not np.array_equal(self.chunk_connectivity[slot], connectivity):
+            self.chunk_connectivity[slot] = connectivity
+            self.visible_slots = None
+
+    @staticmethod
+    def get_camera_chunk(camera):
+        x, y, z = camera.position
+        return math.floor(x) // CHUNK_SIZE, math.floor(y) // CHUNK_SIZE, math.floor(z) // CHUNK_SIZE
+
+    def get_visible_slots(self):
+        """
+        Slots de los chunks dentro del frustum de la cámara y, con OCCLUSION_CULLING, alcanzables desde el
+        chunk de la cámara a través del aire. Reutiliza el último resultado mientras siga valiendo.
+        """
+        camera = self.app.player
+        if self.visible_slots is None or not self.is_culling_valid(camera):
+            # with forward and right turned less than the threshold, no direction inside the frustum turns
+            # more than about three times that
+            visible = camera.frustum.get_visible(
+                self.chunk_centers, margin=CULLING_MOVE_THRESHOLD, angle_margin=3 * CULLING_TURN_THRESHOLD
+            )
+            self.num_frustum_visible = np.count_nonzero(visible)
+            camera_chunk = self.get_camera_chunk(camera)
+            if OCCLUSION_CULLING:
+                visible = get_reachable_chunks(visible, camera_chunk, self.slot_coords, self.chunk_connectivity)
+            self.visible_slots = np.flatnonzero(visible)
+            self.culling_camera = (
+                glm.vec3(camera.position), glm.vec3(camera.forward), glm.vec3(camera.right), camera_chunk
+            )
+        return self.visible_slots
+
+    def is_culling_valid(self, camera):
+        position, forward, right, camera_chunk = self.culling_camera
+        min_cos = math.cos(CULLING_TURN_THRESHOLD)
+        return (glm.distance(position, camera.position) <= CULLING_MOVE_THRESHOLD
+                and glm.dot(forward, camera.forward) >= min_cos and glm.dot(right, camera.right) >= min_cos
+                # the reachable chunks start from the chunk of the camera
+                and (not OCCLUSION_CULLING or self.get_camera_chunk(camera) == camera_chunk))
 
     def render(self):
-        for chunk in self.chunks:
-            chunk.render()
+        # every visible chunk is drawn from the arena in a single batch, the arena skips chunks without mesh
+        self.chunk_arena.render(self.get_visible_slots())
@@ -1,7 +1,4 @@
 from settings import *
-from meshes.chunk_mesh import ChunkMesh
-import random
-from terrain_gen import *
 
 
 class Chunk:
@@ -9,49 +6,26 @@ class Chunk:
         self.app = world.app
         self.world = world
         self.position = position
-        self.m_model = self.get_model_matrix()
-        self.voxels: np.array = None
-        self.mesh: ChunkMesh = None
+        # index of the chunk in the world chunk store
+        self.slot = None
+        # ChunkMesh, once the chunk is meshed; never on the dedicated server
+        self.mesh = None
         self.is_empty = True
 
         self.center = (glm.vec3(self.position) + 0.5) * CHUNK_SIZE
-        self.is_on_frustum = self.app.player.frustum.is_on_frustum
 
-    def get_model_matrix(self):
-        m_model = glm.translate(glm.mat4(), glm.vec3(self.position) * CHUNK_SIZE)
-        return m_model
+    def get_voxel(self, voxel_index):
+        return self.world.voxel_store.get_voxel(self.slot, voxel_index)
 
-    def set_uniform(self):
-        self.mesh.program['m_model'].write(self.m_model)
+    def set_voxel(self, voxel_index, voxel_id):
+        self.world.voxel_store.set_voxel(self.slot, voxel_index, voxel_id)
+
+    def get_voxels(self):
+        # decompressed copy of the chunk voxels
+        return self.world.voxel_store.get_chunk(self.slot)
 
     def build_mesh(self):
+        # imported here: the meshes need moderngl, which the dedicated server does not load
+        from meshes.chunk_mesh import ChunkMesh
         self.mesh = ChunkMesh(self)
 
-    def render(self):
-        if not self.is_empty and self.is_on_frustum(self):
-            self.set_uniform()
-            self.mesh.render()
-
-    def build_voxels(self):
-        voxels = np.zeros(CHUNK_VOL, dtype='uint8')
-
-        cx, cy, cz = glm.ivec3(self.position) * CHUNK_SIZE
-        self.generate_terrain(voxels, cx, cy, cz)
-
-        if np.any(voxels):
-            self.is_empty = False
-        return voxels
-
-    @staticmethod
-    @njit
-    def generate_terrain(voxels, cx, cy, cz):
-        for x in range(CHUNK_SIZE):
-            wx = x + cx
-            for z in range(CHUNK_SIZE):
-                wz = z + cz
-                world_height = get_height(wx, wz)
-                local_height = min(world_height - cy, CHUNK_SIZE)
-
-                for y in range(local_height):
-                    wy = y + cy
-                    set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height)
@@ -3,9 +3,9 @@ from meshes.cloud_mesh import CloudMesh
 
 
 class Clouds:
-    def __init__(self, app):
+    def __init__(self, app, vertex_data=None):
         self.app = app
-        self.mesh = CloudMesh(app)
+        self.mesh = CloudMesh(app, vertex_data)
 
     def update(self):
         self.mesh.program['u_time'] = self.app.time
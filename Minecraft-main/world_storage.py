@@ -0,0 +1,161 @@
+from settings import *
+import json
+import struct
+import zlib
+
+REGION_AREA = REGION_SIZE * REGION_SIZE
+REGION_VOL = REGION_AREA * REGION_SIZE
+
+# region file: header, index with (offset, length) of every chunk slot, compressed chunks
+REGION_MAGIC = b'MCPR'
+REGION_VERSION = 1
+REGION_HEADER = struct.Struct('<4sHH')
+INDEX_SIZE = REGION_VOL * 8
+DATA_START = REGION_HEADER.size + INDEX_SIZE
+
+# index offsets: 0 means the chunk was never saved, EMPTY_CHUNK that it is all air
+NOT_STORED = 0
+EMPTY_CHUNK = 1
+
+
+def encode_chunk(voxels):
+    return zlib.compress(voxels.tobytes(), ZLIB_LEVEL)
+
+
+def decode_chunk(payload, out):
+    out[:] = np.frombuffer(zlib.decompress(payload), dtype='uint8')
+
+
+class RegionFile:
+    """
+    Archivo con los chunks de un bloque de REGION_SIZE^3 chunks.
+    El índice de la cabecera permite leer un chunk sin descomprimir el resto del archivo.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def get_slot(position):
+        x, y, z = (p % REGION_SIZE for p in position)
+        return x + REGION_SIZE * z + REGION_AREA * y
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @staticmethod
+    def read_index(file):
+        magic, version, region_size = REGION_HEADER.unpack(file.read(REGION_HEADER.size))
+        if magic != REGION_MAGIC or version != REGION_VERSION or region_size != REGION_SIZE:
+            raise ValueError('formato de región no soportado')
+        return np.frombuffer(file.read(INDEX_SIZE), dtype='<u4').reshape(REGION_VOL, 2)
+
+    def read_chunks(self, positions, out):
+        """
+        Lee los chunks de positions en out[i]. Devuelve una lista con True para los chunks
+        encontrados; los que no están guardados no se tocan.
+        """
+        found = [False] * len(positions)
+        if not self.exists():
+            return found
+
+        with open(self.path, 'rb') as file:
+            index = self.read_index(file)
+            for i, position in enumerate(positions):
+                offset, length = index[self.get_slot(position)]
+                if offset == NOT_STORED:
+                    continue
+                if offset == EMPTY_CHUNK:
+                    out[i][:] = 0
+                else:
+                    file.seek(offset)
+                    decode_chunk(file.read(length), out[i])
+                found[i] = True
+        return found
+
+    def write_chunks(self, chunks):
+        """
+        Guarda los chunks de chunks: {posición: voxeles}. Los demás chunks de la región se copian
+        comprimidos tal cual, sin descomprimirlos.
+        """
+        payloads = {}
+        if self.exists():
+            with open(self.path, 'rb') as file:
+                index = self.read_index(file)
+                for slot, (offset, length) in enumerate(index):
+                    if offset == EMPTY_CHUNK:
+                        payloads[slot] = None
+                    elif offset != NOT_STORED:
+                        file.seek(offset)
+                        payloads[slot] = file.read(length)
+
+        for position, voxels in chunks.items():
+            payloads[self.get_slot(position)] = encode_chunk(voxels) if np.any(voxels) else None
+
+        index = np.zeros([REGION_VOL, 2], dtype='<u4')
+        data = bytearray()
+        for slot, payload in sorted(payloads.items()):
+            if payload is None:
+                index[slot] = EMPTY_CHUNK, 0
+            else:
+                index[slot] = DATA_START + len(data), len(payload)
+                data += payload
+
+        # write to a temporary file first so a crash never leaves a half written region
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(REGION_HEADER.pack(REGION_MAGIC, REGION_VERSION, REGION_SIZE))
+            file.write(index.tobytes())
+            file.write(data)
+        os.replace(tmp_path, self.path)
+
+
+class WorldStorage:
+    """
+    Guarda y carga los voxeles del mundo en archivos de región dentro de path.
+    level.json describe el mundo guardado; si no coincide con la configuración actual se ignora.
+    """
+    def __init__(self, path=SAVE_DIR):
+        self.path = path
+
+    @staticmethod
+    def get_level_info():
+        return {
+            'seed': SEED,
+            'chunk_size': CHUNK_SIZE,
+            'world_size': [WORLD_W, WORLD_H, WORLD_D],
+            'region_size': REGION_SIZE,
+        }
+
+    def has_world(self):
+        try:
+            with open(os.path.join(self.path, 'level.json')) as file:
+                return json.load(file) == self.get_level_info()
+        except (OSError, ValueError):
+            return False
+
+    def get_region(self, position):
+        rx, ry, rz = (p // REGION_SIZE for p in position)
+        return RegionFile(os.path.join(self.path, f'r.{rx}.{ry}.{rz}.bin'))
+
+    def group_by_region(self, positions):
+        regions = {}
+        for i, position in enumerate(positions):
+            region = self.get_region(position)
+            regions.setdefault(region.path, (region, []))[1].append(i)
+        return regions.values()
+
+    def load_chunks(self, positions, voxels):
+        """Carga los chunks de positions en voxels[i]. Devuelve un array bool con los encontrados."""
+        found = np.zeros(len(positions), dtype=np.bool_)
+        for region, indices in self.group_by_region(positions):
+            region_found = region.read_chunks([positions[i] for i in indices], [voxels[i] for i in indices])
+            found[indices] = region_found
+        return found
+
+    def save_chunks(self, positions, voxels):
+        os.makedirs(self.path, exist_ok=True)
+        for region, indices in self.group_by_region(positions):
+            region.write_chunks({tuple(positions[i]): voxels[i] for i in indices})
+
+        with open(os.path.join(self.path, 'level.json'), 'w') as file:
+            json.dump(self.get_level_info(), file)